@@ -0,0 +1,49 @@
+# 🧾 app/api/v1/admin_pagos.py - Cola de verificación de pagos (admins)
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.core.security import get_current_admin
+from app.schemas.pago import VerificacionLoteRequest, VerificacionLoteResponse, AccionVerificacion
+from app.services.verificacion_pagos_service import VerificacionPagosService
+
+router = APIRouter()
+
+
+@router.get("/cola")
+async def listar_cola(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    estado: Optional[str] = Query(None, description="pendiente o verificando (por defecto ambos)"),
+    admin=Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """📋 Pagos por verificar, más antiguos primero (paginación por cursor)"""
+    pagina = VerificacionPagosService.cola(db, limit, cursor, estado)
+    return {"success": True, **pagina, "resumen": VerificacionPagosService.resumen(db)}
+
+
+@router.post("/tomar")
+async def tomar_pagos(
+    cantidad: int = Query(20, ge=1, le=100),
+    admin=Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """✋ Reservar los siguientes pagos pendientes (otro admin no los recibirá)"""
+    pagos = VerificacionPagosService.tomar(db, admin.id, cantidad)
+    return {"success": True, "data": pagos, "total": len(pagos)}
+
+
+@router.post("/lote", response_model=VerificacionLoteResponse)
+async def resolver_lote(
+    request: VerificacionLoteRequest,
+    admin=Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """✅ Aprobar o rechazar varios pagos en una transacción (activa las suscripciones)"""
+    resultado = VerificacionPagosService.resolver_lote(
+        db, admin.id, request.pago_ids, request.accion == AccionVerificacion.APROBAR, request.notas
+    )
+    return VerificacionLoteResponse(**resultado)
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, status, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select, update, delete, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.schemas.auth import (
     UserRegister, UserLogin, TokenRefresh, ChangePassword,
     LoginResponse, RegisterResponse, Token, 
@@ -11,38 +14,117 @@ from app.schemas.auth import (
 )
 from app.schemas.profile import ProfileResponse
 from app.services.auth_service import AuthService
-from app.core.security import SecurityService, get_current_user_id, verify_token_dependency, get_current_user
+from app.services.refresh_session_service import RefreshSessionService
+from app.core.security import SecurityService, get_current_user_id, verify_token_dependency, get_current_principal
+from app.core.security import security as bearer_scheme
+from app.core.token_cache import token_cache
 from app.core.config import settings
-from app.core.exceptions import AuthenticationException
+from app.core.exceptions import AuthenticationException, TooManyRequestsException, ValidationException
+from app.core.password_pool import password_pool
+from app.core.usuario_cache import UsuarioSnapshot, usuario_cache
+from app.services.suscripcion_cache import suscripcion_cache
+from app.services.genealogia_cache import genealogia_cache
 from app.models.user import User
+from app.models.profile import Profile
+from app.models.password_reset_token import PasswordResetToken
+from app.models.gallo_simple import Gallo
+from app.models.gallo_ancestro import GalloAncestro
+from app.models.vacuna import Vacuna
+from app.models.tope import Tope
+from app.models.pelea import Pelea
+from app.models.pago_pendiente import PagoPendiente
+from app.models.comprobante_pago import ComprobantePago
+from app.models.notificacion_admin import NotificacionAdmin
+from app.core.latencias import registro_latencias
 from app.models.fcm_token import FCMToken
-from typing import Dict, Any
+from typing import Dict, Any, Set
 from datetime import datetime
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _serializar_usuario(db, user, profile=None):
+    """Convertir a schemas dentro de run_sync: si falta cargar algún atributo, el I/O ocurre en contexto sync"""
+    return UserResponse.from_orm(user), (ProfileResponse.from_orm(profile) if profile else None)
+
+async def _eliminar_datos_usuario(db: AsyncSession, user_id: int) -> Set[int]:
+    """Borrar al usuario y todo lo suyo (sin commit)
+
+    Tablas con ON DELETE CASCADE (perfil, suscripciones, sesiones...) se van con
+    el usuario; el resto no tiene cascada y se borra aquí primero. Devuelve los
+    otros usuarios cuyo pedigrí cambió, para invalidar su grafo tras el commit.
+    """
+    gallos = select(Gallo.id).where(Gallo.user_id == user_id).scalar_subquery()
+
+    # Gallos de otros usuarios que usaban uno de estos como padre/madre
+    # (el UPDATE Core no dispara eventos del mapper: los dueños se recogen antes)
+    afectados = set((await db.execute(
+        select(Gallo.user_id).distinct().where(
+            Gallo.user_id != user_id, or_(Gallo.padre_id.in_(gallos), Gallo.madre_id.in_(gallos))
+        )
+    )).scalars())
+    await db.execute(
+        update(Gallo).where(Gallo.user_id != user_id, Gallo.padre_id.in_(gallos)).values(padre_id=None)
+    )
+    await db.execute(
+        update(Gallo).where(Gallo.user_id != user_id, Gallo.madre_id.in_(gallos)).values(madre_id=None)
+    )
+    await db.execute(delete(Tope).where(or_(Tope.user_id == user_id, Tope.gallo_id.in_(gallos))))
+    await db.execute(delete(Pelea).where(Pelea.user_id == user_id))
+    await db.execute(delete(Vacuna).where(Vacuna.gallo_id.in_(gallos)))
+    await db.execute(delete(GalloAncestro).where(
+        or_(GalloAncestro.ancestro_id.in_(gallos), GalloAncestro.descendiente_id.in_(gallos))
+    ))
+    await db.execute(delete(Gallo).where(Gallo.user_id == user_id))
+
+    await db.execute(delete(ComprobantePago).where(ComprobantePago.user_id == user_id))
+    await db.execute(delete(PagoPendiente).where(PagoPendiente.user_id == user_id))
+    await db.execute(
+        update(PagoPendiente).where(PagoPendiente.verificado_por == user_id).values(verificado_por=None)
+    )
+    await db.execute(delete(NotificacionAdmin).where(NotificacionAdmin.admin_id == user_id))
+    await db.execute(delete(FCMToken).where(FCMToken.user_id == user_id))
+    await db.execute(delete(PasswordResetToken).where(PasswordResetToken.user_id == user_id))
+    await db.execute(delete(Profile).where(Profile.user_id == user_id))
+    await db.execute(delete(User).where(User.id == user_id))
+    return afectados
+
 @router.post("/register", response_model=RegisterResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_async_db)):
     """🔐 Registrar nuevo usuario con respuesta mejorada"""
     
-    # Registrar usuario con perfil
-    user = AuthService.register_user(db, user_data)
+    if (await db.execute(select(User.id).where(User.email == user_data.email))).first():
+        raise ValidationException("El email ya está registrado")
     
-    # Obtener perfil creado
-    profile = AuthService.get_user_profile(db, user.id)
+    # Solo el hash bcrypt va al password_pool; la transacción sigue en la sesión async
+    user = User(email=user_data.email, password_hash=await password_pool.hash(user_data.password))
+    db.add(user)
+    try:
+        await db.flush()
+        profile = Profile(
+            user_id=user.id,
+            nombre_completo=user_data.nombre_completo,
+            telefono=user_data.telefono,
+            nombre_galpon=user_data.nombre_galpon,
+            ciudad=user_data.ciudad,
+            ubigeo=user_data.ubigeo,
+        )
+        db.add(profile)
+        await db.commit()
+    except IntegrityError:
+        # Otro registro con el mismo email ganó la carrera
+        await db.rollback()
+        raise ValidationException("El email ya está registrado")
     
-    # Convertir a response schemas
-    user_response = UserResponse.from_orm(user)
-    profile_response = ProfileResponse.from_orm(profile) if profile else None
+    user_response, profile_response = await db.run_sync(_serializar_usuario, user, profile)
     
     return RegisterResponse(
         user=user_response,
         profile=profile_response,
-        message=f"Usuario {user.email} registrado exitosamente",
+        message=f"Usuario {user_response.email} registrado exitosamente",
         login_credentials={
-            "email": user.email,
+            "email": user_response.email,
             "suggested_login": True,
             "message": "Credenciales listas para login automático"
         },
@@ -50,21 +132,44 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     )
 
 @router.post("/login", response_model=LoginResponse)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
     """🔐 Login de usuario con respuesta mejorada"""
+    with registro_latencias.medir("auth.login"):
+        return await _login(user_data, request, db)
+
+async def _login(user_data: UserLogin, request: Request, db: AsyncSession) -> LoginResponse:
+    """Pipeline de login: 1 SELECT (usuario + perfil) y 1 commit (sesión de refresh + last_login)"""
+    
+    # Usuario y perfil en una sola consulta
+    fila = (await db.execute(
+        select(User, Profile)
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .where(User.email == user_data.email)
+    )).first()
+    if not fila:
+        raise AuthenticationException("Email o contraseña incorrectos")
+    user, profile = fila
     
-    # Autenticar usuario
-    user = AuthService.authenticate_user(db, user_data.email, user_data.password)
+    # Autenticar usuario (bcrypt en el password_pool)
+    valida, nuevo_hash = await password_pool.verificar_y_actualizar(user_data.password, user.password_hash)
+    if not valida:
+        raise AuthenticationException("Email o contraseña incorrectos")
+    if not user.is_active:
+        raise AuthenticationException("Usuario inactivo")
     
-    # Crear tokens JWT
-    access_token = SecurityService.create_access_token(data={"sub": str(user.id)})
-    refresh_token = SecurityService.create_refresh_token(data={"sub": str(user.id)})
+    # Rehash transparente si cambió BCRYPT_ROUNDS
+    if nuevo_hash:
+        user.password_hash = nuevo_hash
     
-    # Guardar refresh token en BD
-    AuthService.update_refresh_token(db, user.id, refresh_token)
+    # Crear tokens JWT (una sesión de refresh por dispositivo; el access token lleva su familia)
+    refresh_token, familia_id = RefreshSessionService.crear(db, user.id, request.headers.get("user-agent"))
+    access_token = SecurityService.create_access_token(
+        data={**SecurityService.claims_usuario(user), "fam": familia_id}
+    )
     
-    # Cargar perfil del usuario
-    profile = AuthService.get_user_profile(db, user.id)
+    # Guardar sesión de refresh y último login en la misma transacción
+    user.last_login = datetime.now()
+    await db.commit()
     
     # Crear responses
     token_response = Token(
@@ -73,8 +178,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
         expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
     
-    user_response = UserResponse.from_orm(user)
-    profile_response = ProfileResponse.from_orm(profile) if profile else None
+    user_response, profile_response = await db.run_sync(_serializar_usuario, user, profile)
     
     return LoginResponse(
         user=user_response,
@@ -86,50 +190,69 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     )
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db)):
-    """🔄 Renovar access token"""
+async def refresh_token(token_data: TokenRefresh, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """🔄 Renovar access token (rota el refresh token: el anterior deja de servir)"""
     
-    # Verificar refresh token
-    payload = SecurityService.verify_token(token_data.refresh_token, "refresh")
-    user_id = int(payload.get("sub"))
+    # Consumir la sesión de refresh y emitir la siguiente de la misma familia
+    user_id, nuevo_refresh, familia_id = await RefreshSessionService.rotar(
+        db, token_data.refresh_token, request.headers.get("user-agent")
+    )
     
-    # Verificar que el refresh token esté en BD
-    user = AuthService.verify_refresh_token(db, token_data.refresh_token)
+    user = await db.get(User, user_id)
+    if not user or not user.is_active:
+        raise AuthenticationException("Usuario inactivo o inexistente")
     
     # Crear nuevo access token
-    access_token = SecurityService.create_access_token(data={"sub": str(user_id)})
+    access_token = SecurityService.create_access_token(
+        data={**SecurityService.claims_usuario(user), "fam": familia_id}
+    )
     
     return Token(
         access_token=access_token,
-        refresh_token=token_data.refresh_token,  # Mantener el mismo refresh token
+        refresh_token=nuevo_refresh,
         expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(
     current_user_id: int = Depends(get_current_user_id), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """👤 Obtener información del usuario actual"""
     
-    user = AuthService.get_user_by_id(db, current_user_id)
-    return UserResponse.from_orm(user)
+    user = await db.run_sync(AuthService.get_user_by_id, current_user_id)
+    user_response, _ = await db.run_sync(_serializar_usuario, user)
+    return user_response
 
 @router.post("/logout", response_model=LogoutResponse)
 async def logout(
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """🚺 Logout del usuario con respuesta mejorada"""
     
-    # Obtener info del usuario para el mensaje personalizado
-    user = AuthService.get_user_by_id(db, current_user_id)
-    profile = AuthService.get_user_profile(db, current_user_id)
+    # Obtener info del usuario para el mensaje personalizado (una sola consulta)
+    fila = (await db.execute(
+        select(User.email, Profile.nombre_completo)
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .where(User.id == int(current_user_id))
+    )).first()
+    if not fila:
+        raise AuthenticationException("Usuario no encontrado")
     
-    # Limpiar refresh token de la BD
-    AuthService.update_refresh_token(db, current_user_id, None)
+    # Cerrar la sesión de refresh de este dispositivo (tokens sin familia: todas)
+    payload = SecurityService.verify_token(credentials.credentials)
+    if payload.get("fam"):
+        await RefreshSessionService.revocar_familia(db, int(current_user_id), payload["fam"])
+    else:
+        await RefreshSessionService.revocar_usuario(db, int(current_user_id))
+    await db.commit()
     
-    nombre_usuario = profile.nombre_completo if profile else user.email
+    # Revocar el access token usado: deja de valer de inmediato aunque esté en caché
+    token_cache.revocar_token(credentials.credentials, payload["exp"])
+    
+    nombre_usuario = fila.nombre_completo or fila.email
     
     return LogoutResponse(
         message=f"Hasta luego, {nombre_usuario}. Sesión cerrada exitosamente",
@@ -142,38 +265,39 @@ async def logout(
 async def change_password(
     password_data: ChangePassword,
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """🔐 Cambiar contraseña del usuario"""
     
-    # Cambiar contraseña usando el servicio
-    success = AuthService.change_password(
-        db, 
-        current_user_id, 
-        password_data.current_password, 
-        password_data.new_password
-    )
+    # Cambiar contraseña (verificación y hash bcrypt en el password_pool)
+    user = await db.get(User, int(current_user_id))
+    if not user:
+        raise AuthenticationException("Usuario no encontrado")
     
-    if success:
-        return MessageResponse(
-            message="Contraseña cambiada exitosamente",
-            success=True
-        )
-    else:
-        return MessageResponse(
-            message="Error cambiando contraseña",
-            success=False
-        )
+    if not await password_pool.verificar(password_data.current_password, user.password_hash):
+        raise AuthenticationException("Contraseña actual incorrecta")
+    
+    user.password_hash = await password_pool.hash(password_data.new_password)
+    await RefreshSessionService.revocar_usuario(db, user.id)
+    await db.commit()
+    
+    # Tokens emitidos antes del cambio dejan de ser válidos
+    token_cache.revocar_usuario(user.id)
+    
+    return MessageResponse(
+        message="Contraseña cambiada exitosamente",
+        success=True
+    )
 
 # 🔐 ENDPOINTS DE RECUPERACIÓN DE CONTRASEÑA
 
 @router.post("/forgot-password", response_model=PasswordResetResponse)
 async def forgot_password(
     request: ForgotPasswordRequest, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """🔐 Solicitar recuperación de contraseña"""
-    success = AuthService.request_password_reset(db, request.email)
+    success = await db.run_sync(AuthService.request_password_reset, request.email)
     
     return PasswordResetResponse(
         message="Si el email existe, recibirás un código de recuperación",
@@ -183,10 +307,10 @@ async def forgot_password(
 @router.post("/verify-reset-code", response_model=PasswordResetResponse)
 async def verify_reset_code(
     request: VerifyResetCodeRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """🔐 Verificar código de recuperación"""
-    is_valid = AuthService.verify_reset_code(db, request.email, request.code)
+    is_valid = await db.run_sync(AuthService.verify_reset_code, request.email, request.code)
     
     if is_valid:
         return PasswordResetResponse(
@@ -200,14 +324,29 @@ async def verify_reset_code(
         )
 
 @router.post("/reset-password", response_model=PasswordResetResponse)
-async def reset_password(
-    request: ResetPasswordRequest,
-    db: Session = Depends(get_db)
-):
+async def reset_password(request: ResetPasswordRequest, db: AsyncSession = Depends(get_async_db)):
     """🔐 Resetear contraseña con código"""
-    success = AuthService.reset_password_with_code(
-        db, request.email, request.code, request.new_password
-    )
+    codigo = (await db.execute(
+        select(PasswordResetToken)
+        .where(
+            PasswordResetToken.email == request.email,
+            PasswordResetToken.token == request.code,
+            PasswordResetToken.used == False,
+        )
+        .order_by(PasswordResetToken.created_at.desc())
+    )).scalars().first()
+    user = await db.get(User, codigo.user_id) if codigo and codigo.is_valid() else None
+    success = user is not None
+    
+    if success:
+        # Solo el hash bcrypt va al password_pool
+        user.password_hash = await password_pool.hash(request.new_password)
+        codigo.used = True
+        
+        # Tokens emitidos antes del cambio dejan de ser válidos
+        await RefreshSessionService.revocar_usuario(db, user.id)
+        await db.commit()
+        token_cache.revocar_usuario(user.id)
     
     if success:
         return PasswordResetResponse(
@@ -226,7 +365,7 @@ async def reset_password(
 async def delete_account(
     delete_request: DeleteAccountRequest,
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     🗑️ Eliminar cuenta de usuario permanentemente
@@ -239,26 +378,39 @@ async def delete_account(
     
     try:
         # Obtener información del usuario antes de eliminar
-        user = AuthService.get_user_by_id(db, current_user_id)
-        profile = AuthService.get_user_profile(db, current_user_id)
-        user_email = user.email
-        user_name = profile.nombre_completo if profile else user_email
+        user_id = int(current_user_id)
+        fila = (await db.execute(
+            select(User, Profile)
+            .outerjoin(Profile, Profile.user_id == User.id)
+            .where(User.id == user_id)
+        )).first()
+        if not fila:
+            raise AuthenticationException("Usuario no encontrado")
+        user, profile = fila
+        user_name = profile.nombre_completo if profile else user.email
         
-        # Eliminar cuenta usando el servicio
-        success = AuthService.delete_user_account(
-            db, 
-            current_user_id, 
-            delete_request.password
-        )
+        # Solo la verificación bcrypt va al password_pool; el borrado sigue en la sesión async
+        if not await password_pool.verificar(delete_request.password, user.password_hash):
+            raise AuthenticationException("Contraseña incorrecta")
         
-        if success:
-            return DeleteAccountResponse(
-                message=f"Cuenta de {user_name} eliminada permanentemente. Lamentamos que te vayas.",
-                success=True,
-                account_deleted=True,
-                redirect_to="login"
-            )
+        afectados = await _eliminar_datos_usuario(db, user_id)
+        await db.commit()
+        
+        token_cache.revocar_usuario(user_id)
+        usuario_cache.invalidar(user_id)
+        suscripcion_cache.invalidar(user_id)
+        for otro_id in afectados:
+            genealogia_cache.invalidar(otro_id)
+        
+        return DeleteAccountResponse(
+            message=f"Cuenta de {user_name} eliminada permanentemente. Lamentamos que te vayas.",
+            success=True,
+            account_deleted=True,
+            redirect_to="login"
+        )
         
+    except TooManyRequestsException:
+        raise
     except AuthenticationException as e:
         # Contraseña incorrecta o usuario no encontrado
         raise HTTPException(
@@ -285,8 +437,8 @@ async def delete_account(
 @router.post("/register-fcm-token")
 async def register_fcm_token(
     token_data: Dict[str, Any],
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UsuarioSnapshot = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """🔔 Registrar token FCM - DIRECTO EN AUTH"""
     
@@ -304,9 +456,9 @@ async def register_fcm_token(
             }
         
         # Buscar si ya existe este token específico
-        existing_token = db.query(FCMToken).filter(
-            FCMToken.fcm_token == fcm_token
-        ).first()
+        existing_token = (await db.execute(
+            select(FCMToken).where(FCMToken.fcm_token == fcm_token)
+        )).scalars().first()
         
         if existing_token:
             # Token ya existe, solo actualizar info
@@ -315,7 +467,7 @@ async def register_fcm_token(
             existing_token.device_info = device_info
             existing_token.is_active = True
             existing_token.updated_at = datetime.now()
-            db.commit()
+            await db.commit()
             
             logger.info(f"✅ Token FCM actualizado para usuario {current_user.id}")
             return {
@@ -326,13 +478,15 @@ async def register_fcm_token(
             }
         
         # Desactivar tokens anteriores del mismo usuario + plataforma (un dispositivo por plataforma)
-        db.query(FCMToken).filter(
-            FCMToken.user_id == current_user.id,
-            FCMToken.platform == platform
-        ).update({
-            "is_active": False,
-            "updated_at": datetime.now()
-        })
+        await db.execute(
+            update(FCMToken).where(
+                FCMToken.user_id == current_user.id,
+                FCMToken.platform == platform
+            ).values(
+                is_active=False,
+                updated_at=datetime.now()
+            )
+        )
         
         # Crear nuevo token activo
         new_token = FCMToken(
@@ -344,8 +498,8 @@ async def register_fcm_token(
         )
         
         db.add(new_token)
-        db.commit()
-        db.refresh(new_token)
+        await db.commit()
+        await db.refresh(new_token)
         
         logger.info(f"✅ Nuevo token FCM registrado para usuario {current_user.id}")
         return {
@@ -357,7 +511,7 @@ async def register_fcm_token(
             
     except Exception as e:
         logger.error(f"❌ Error registrando token FCM: {e}")
-        db.rollback()
+        await db.rollback()
         return {
             "success": False,
             "message": f"Error registrando token: {str(e)}"
@@ -365,15 +519,17 @@ async def register_fcm_token(
 
 @router.get("/my-fcm-tokens")
 async def get_my_fcm_tokens(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UsuarioSnapshot = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """🔔 Ver mis tokens FCM registrados"""
     
-    tokens = db.query(FCMToken).filter(
-        FCMToken.user_id == current_user.id,
-        FCMToken.is_active == True
-    ).all()
+    tokens = (await db.execute(
+        select(FCMToken).where(
+            FCMToken.user_id == current_user.id,
+            FCMToken.is_active == True
+        )
+    )).scalars().all()
     
     return {
         "success": True,
@@ -0,0 +1,66 @@
+# 📊 app/api/v1/cuotas.py - Uso del plan vs. límites de la suscripción
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.database import get_db
+from app.core.security import get_current_user_id
+from app.core.exceptions import ValidationException
+from app.services.cuota_service import CuotaService, LIMITES_POR_RECURSO
+from app.services.suscripcion_cache import plan_vigente
+
+router = APIRouter()
+
+
+@router.get("/plan")
+async def obtener_plan(
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """💳 Plan vigente del usuario: tipo, límites, es_premium y vencimiento"""
+    return {
+        "success": True,
+        "data": plan_vigente(db, int(current_user_id)).to_dict()
+    }
+
+
+@router.get("/uso")
+async def obtener_uso(
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """📊 Gallos usados y topes/peleas/vacunas por gallo frente a los límites del plan"""
+    return {
+        "success": True,
+        "data": CuotaService.snapshot(db, int(current_user_id))
+    }
+
+
+@router.get("/verificar/{recurso}")
+async def verificar_cuota(
+    recurso: str,
+    gallo_id: Optional[int] = Query(None, description="Requerido para topes, peleas y vacunas"),
+    cantidad: int = Query(1, ge=1, le=1000),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """✅ ¿Puedo crear `cantidad` registros más de este recurso?"""
+    if recurso not in LIMITES_POR_RECURSO:
+        raise ValidationException(f"Recurso inválido. Use: {', '.join(LIMITES_POR_RECURSO)}")
+    if recurso != "gallos" and gallo_id is None:
+        raise ValidationException(f"gallo_id es requerido para {recurso}")
+
+    permitido, usados, maximo = CuotaService.puede_crear(
+        db, int(current_user_id), recurso, gallo_id if recurso != "gallos" else None, cantidad
+    )
+    return {
+        "success": True,
+        "data": {
+            "recurso": recurso,
+            "gallo_id": gallo_id,
+            "permitido": permitido,
+            "usados": usados,
+            "maximo": maximo,
+            "disponibles": max(maximo - usados, 0),
+        }
+    }
@@ -0,0 +1,56 @@
+# 🔍 app/api/v1/gallos_busqueda.py - Búsqueda de gallos con paginación por cursor
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.core.security import get_current_user_id
+from app.core.exceptions import ValidationException
+from app.schemas.gallo import GalloSearchParams, GalloBusquedaResponse
+from app.services.gallo_busqueda_service import GalloBusquedaService
+
+router = APIRouter()
+
+
+def _parametros_busqueda(
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    search: Optional[str] = Query(None, min_length=2),
+    raza_id: Optional[int] = None,
+    estado: Optional[str] = None,
+    tiene_foto: Optional[bool] = None,
+    tiene_padres: Optional[bool] = None,
+    created_after: Optional[date] = None,
+    descendiente_de: Optional[int] = None,
+    ancestro_de: Optional[int] = None,
+    sort_by: str = "created_at",
+    sort_order: str = Query("desc", pattern="^(asc|desc)$"),
+    include_genealogy: bool = False,
+    genealogy_depth: int = Query(1, ge=1, le=2),
+    cursor: Optional[str] = None,
+) -> GalloSearchParams:
+    """Construir GalloSearchParams desde la query string (errores → 422)"""
+    try:
+        return GalloSearchParams(
+            page=page, limit=limit, search=search, raza_id=raza_id, estado=estado,
+            tiene_foto=tiene_foto, tiene_padres=tiene_padres, created_after=created_after,
+            descendiente_de=descendiente_de, ancestro_de=ancestro_de,
+            sort_by=sort_by, sort_order=sort_order, include_genealogy=include_genealogy,
+            genealogy_depth=genealogy_depth, cursor=cursor,
+        )
+    except ValidationError as e:
+        raise ValidationException("; ".join(err["msg"] for err in e.errors()))
+
+
+@router.get("/buscar", response_model=GalloBusquedaResponse)
+async def buscar_gallos(
+    params: GalloSearchParams = Depends(_parametros_busqueda),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """🔍 Buscar gallos del usuario; usar `next_cursor` para pedir la siguiente página"""
+    resultado = GalloBusquedaService.buscar(db, int(current_user_id), params)
+    return GalloBusquedaResponse(**resultado)
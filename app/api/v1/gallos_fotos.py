@@ -0,0 +1,64 @@
+# 📸 app/api/v1/gallos_fotos.py - Foto principal de gallos con variantes precalculadas
+from fastapi import APIRouter, Depends, File, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.core.security import get_current_user_id
+from app.core.exceptions import NotFoundException
+from app.models.gallo_simple import Gallo
+from app.schemas.gallo import FotosVariantes
+from app.services.imagen_service import VARIANTES_FOTO
+from app.services.subida_service import SubidaService
+
+router = APIRouter()
+
+
+@router.post("/{gallo_id}/fotos")
+async def subir_foto_principal(
+    gallo_id: int,
+    request: Request,
+    archivo: UploadFile = File(..., description="Foto del gallo (JPG, PNG o WebP)"),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """📸 Subir foto principal: responde al copiarla a staging; variantes WebP y Cloudinary en segundo plano"""
+    user_id = int(current_user_id)
+    gallo = db.execute(
+        select(Gallo).where(Gallo.id == gallo_id, Gallo.user_id == user_id)
+    ).scalars().first()
+    if gallo is None:
+        raise NotFoundException("Gallo no encontrado")
+
+    subida_id, ruta = await run_in_threadpool(
+        SubidaService.guardar_en_staging, archivo.file, archivo.filename, archivo.content_type
+    )
+    url_pendiente = str(request.url_for("archivo_subida", subida_id=subida_id))
+    try:
+        SubidaService.crear(
+            db, subida_id, ruta, user_id, "gallo_foto", gallo.id,
+            carpeta="galloapp/gallos",
+            public_id=f"gallo_{gallo.id}_{subida_id[:12]}",  # nueva URL por foto: sin cachés viejas en la CDN
+            url_pendiente=url_pendiente,
+            variantes=VARIANTES_FOTO,
+        )
+        # Mientras sube, todas las variantes apuntan a la copia local (evento de FotoVariantesService)
+        gallo.foto_principal_url = url_pendiente
+        gallo.url_foto_cloudinary = url_pendiente
+        db.commit()
+    except Exception:
+        db.rollback()
+        SubidaService.descartar_staging(ruta)
+        raise
+    SubidaService.encolar(subida_id)
+
+    return {
+        "success": True,
+        "data": {
+            "gallo_id": gallo.id,
+            "fotos_variantes": FotosVariantes.model_validate(gallo.fotos_variantes).model_dump(),
+            "subida": {"id": subida_id, "estado": "pendiente"},
+        },
+        "message": "Foto recibida, procesando en segundo plano",
+    }
@@ -0,0 +1,47 @@
+# 📥 app/api/v1/gallos_importacion.py - Importación masiva de gallos
+from fastapi import APIRouter, Depends, File, Form, UploadFile
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.core.security import get_current_user_id
+from app.core.exceptions import ValidationException
+from app.schemas.gallo import GalloImportacionRequest, GalloImportacionResponse
+from app.services.gallo_importacion_service import GalloImportacionService
+
+router = APIRouter()
+
+
+@router.post("/importar", response_model=GalloImportacionResponse)
+async def importar_gallos(
+    request: GalloImportacionRequest,
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """📥 Importar un lote de gallos (JSON) con sus padres en una sola transacción"""
+    resultado = GalloImportacionService.importar(
+        db, int(current_user_id), request.gallos, request.todo_o_nada
+    )
+    return GalloImportacionResponse(**resultado)
+
+
+@router.post("/importar/archivo", response_model=GalloImportacionResponse)
+async def importar_gallos_archivo(
+    archivo: UploadFile = File(..., description="CSV con encabezados o NDJSON"),
+    todo_o_nada: bool = Form(False),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """📄 Importar gallos desde un archivo CSV o NDJSON (se lee fila por fila)"""
+    nombre = (archivo.filename or "").lower()
+    if nombre.endswith(".csv") or archivo.content_type == "text/csv":
+        filas = GalloImportacionService.parsear_csv(archivo.file)
+    elif nombre.endswith((".ndjson", ".jsonl")) or archivo.content_type == "application/x-ndjson":
+        filas = GalloImportacionService.parsear_ndjson(archivo.file)
+    else:
+        raise ValidationException("Formato no soportado. Use CSV o NDJSON")
+
+    try:
+        resultado = GalloImportacionService.importar(db, int(current_user_id), filas, todo_o_nada)
+    except UnicodeDecodeError:
+        raise ValidationException("El archivo debe estar codificado en UTF-8")
+    return GalloImportacionResponse(**resultado)
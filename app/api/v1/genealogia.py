@@ -0,0 +1,64 @@
+# 🧬 app/api/v1/genealogia.py - Análisis genealógico (consanguinidad y cruces)
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.core.security import get_current_user_id
+from app.core.exceptions import NotFoundException
+from app.models.gallo_simple import Gallo
+from app.schemas.gallo import GalloResponse
+from app.services.consanguinidad_service import ConsanguinidadService, MAX_GENERACIONES_CONSANGUINIDAD
+
+router = APIRouter()
+
+
+def _obtener_gallo_usuario(db: Session, gallo_id: int, user_id: int) -> Gallo:
+    """Buscar gallo del usuario o lanzar 404"""
+    gallo = db.query(Gallo).filter(Gallo.id == gallo_id, Gallo.user_id == user_id).first()
+    if not gallo:
+        raise NotFoundException(f"Gallo {gallo_id} no encontrado")
+    return gallo
+
+
+@router.get("/gallos/{gallo_id}/consanguinidad", response_model=GalloResponse)
+async def consanguinidad_gallo(
+    gallo_id: int,
+    max_generaciones: int = Query(MAX_GENERACIONES_CONSANGUINIDAD, ge=1, le=12),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """🧬 Coeficiente de consanguinidad y ancestros comunes de un gallo"""
+    gallo = _obtener_gallo_usuario(db, gallo_id, int(current_user_id))
+    resultado = ConsanguinidadService.analizar_gallo(db, gallo, max_generaciones)
+    return GalloResponse(data=resultado, message="Consanguinidad calculada")
+
+
+@router.get("/cruce", response_model=GalloResponse)
+async def simular_cruce(
+    padre_id: int = Query(..., gt=0),
+    madre_id: int = Query(..., gt=0),
+    max_generaciones: int = Query(MAX_GENERACIONES_CONSANGUINIDAD, ge=1, le=12),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """💞 Consanguinidad esperada de la cría de un cruce padre × madre"""
+    user_id = int(current_user_id)
+    _obtener_gallo_usuario(db, padre_id, user_id)
+    _obtener_gallo_usuario(db, madre_id, user_id)
+
+    resultado = ConsanguinidadService.analizar_cruce(db, user_id, padre_id, madre_id, max_generaciones)
+    return GalloResponse(data=resultado, message="Cruce analizado")
+
+
+@router.get("/reporte-consanguinidad", response_model=GalloResponse)
+async def reporte_consanguinidad(
+    max_generaciones: int = Query(MAX_GENERACIONES_CONSANGUINIDAD, ge=1, le=12),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """📊 Reporte de consanguinidad de todo el plantel"""
+    reporte = ConsanguinidadService.reporte_plantel(db, int(current_user_id), max_generaciones)
+    return GalloResponse(
+        data={"gallos": reporte, "total": len(reporte)},
+        message="Reporte de consanguinidad generado"
+    )
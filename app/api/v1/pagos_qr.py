@@ -0,0 +1,181 @@
+# 📱 app/api/v1/pagos_qr.py - Pagos Yape con QR pre-renderizado
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Form, Header, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.core.security import get_current_user_id
+from app.core.exceptions import NotFoundException, ValidationException
+from app.models.pago_pendiente import PagoPendiente, EstadoPago
+from app.schemas.pago import PagoQRCreate, QRYapeResponse
+from app.services.plan_registro import registro_planes
+from app.services.qr_service import QRService
+from app.services.idempotencia_service import IdempotenciaService
+from app.services.comprobante_service import ComprobanteService
+from app.services.subida_service import SubidaService
+
+router = APIRouter()
+
+
+# Un pago pendiente sin comprobante se reutiliza mientras su QR siga vigente (doble toque sin clave)
+MINUTOS_REUTILIZAR_PAGO = QRYapeResponse.model_fields["tiempo_expiracion_minutos"].default
+OPERACION_CREAR_PAGO = "crear_pago_qr"
+
+
+@router.post("", response_model=QRYapeResponse)
+async def crear_pago_qr(
+    pago_data: PagoQRCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """📱 Registrar un pago pendiente y devolver su QR (reintentos con la misma clave no crean otro)"""
+    user_id = int(current_user_id)
+    clave = IdempotenciaService.validar_clave(idempotency_key)
+    huella = IdempotenciaService.huella(pago_data.model_dump(mode="json"))
+    if clave:
+        guardada = IdempotenciaService.obtener(db, user_id, clave, OPERACION_CREAR_PAGO, huella)
+        if guardada is not None:
+            return QRYapeResponse(**guardada)
+
+    if registro_planes.necesita_carga:
+        registro_planes.cargar(db.connection())
+    plan = registro_planes.actual.obtener(pago_data.plan_codigo)
+    if plan is None:
+        raise NotFoundException(f"Plan '{pago_data.plan_codigo}' no encontrado")
+    if plan["precio"] <= 0:
+        raise ValidationException("El plan gratuito no requiere pago")
+
+    monto = Decimal(str(plan["precio"]))
+    pago = db.execute(
+        select(PagoPendiente)
+        .where(
+            PagoPendiente.user_id == user_id,
+            PagoPendiente.plan_codigo == plan["codigo"],
+            PagoPendiente.monto == monto,
+            PagoPendiente.estado == EstadoPago.PENDIENTE.value,
+            PagoPendiente.comprobante_url.is_(None),
+            PagoPendiente.created_at >= datetime.utcnow() - timedelta(minutes=MINUTOS_REUTILIZAR_PAGO),
+        )
+        .order_by(PagoPendiente.id.desc())
+        .limit(1)
+    ).scalars().first()
+
+    if pago is None:
+        contenido = QRService.contenido_pago(plan["codigo"], monto)
+        url_local = str(request.url_for("imagen_qr", clave=QRService.clave(contenido)))
+        qr_url = await QRService.url(contenido, url_local)
+        pago = PagoPendiente(
+            user_id=user_id,
+            plan_codigo=plan["codigo"],
+            monto=monto,
+            metodo_pago=pago_data.metodo_pago.value,
+            qr_data=contenido,
+            qr_url=qr_url,
+            qr_clave=QRService.clave(contenido),
+            estado=EstadoPago.PENDIENTE.value,
+            ip_address=request.client.host if request.client else None,
+            user_agent=request.headers.get("user-agent"),
+        )
+        db.add(pago)
+        db.flush()
+
+    respuesta = QRYapeResponse(
+        pago_id=pago.id,
+        qr_data=pago.qr_data,
+        qr_url=pago.qr_url,
+        monto=monto,
+        plan_nombre=plan["nombre"],
+    )
+    if clave:
+        IdempotenciaService.registrar(
+            db, user_id, clave, OPERACION_CREAR_PAGO, huella, respuesta.model_dump(mode="json")
+        )
+    try:
+        db.commit()
+    except IntegrityError:
+        # Petición simultánea con la misma clave: gana la primera, esta devuelve su respuesta
+        db.rollback()
+        guardada = IdempotenciaService.obtener(db, user_id, clave, OPERACION_CREAR_PAGO, huella) if clave else None
+        if guardada is None:
+            raise
+        return QRYapeResponse(**guardada)
+    return respuesta
+
+
+@router.post("/{pago_id}/comprobante")
+async def subir_comprobante(
+    pago_id: int,
+    request: Request,
+    archivo: UploadFile = File(..., description="Captura del pago Yape"),
+    referencia_yape: Optional[str] = Form(None, max_length=100),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """🧾 Adjuntar comprobante y número de operación (duplicados rechazados, reintentos sin efecto)
+
+    La imagen se sube en segundo plano: `comprobante_url` apunta a una URL pendiente
+    que sirve la copia local hasta que la subida termina.
+    """
+    user_id = int(current_user_id)
+    contenido = await archivo.read()
+    datos = await run_in_threadpool(
+        ComprobanteService.preparar, db, user_id, pago_id, contenido, referencia_yape
+    )
+    pago = datos["pago"]
+    if datos["reintento"]:
+        return {"success": True, "duplicado": True, "data": pago.to_dict()}
+
+    subida_id, ruta = await run_in_threadpool(
+        SubidaService.guardar_en_staging, contenido, archivo.filename, archivo.content_type
+    )
+    url_pendiente = str(request.url_for("archivo_subida", subida_id=subida_id))
+    try:
+        SubidaService.crear(
+            db, subida_id, ruta, user_id, "comprobante", pago.id,
+            carpeta="galloapp/comprobantes",
+            public_id=f"pago_{pago.id}_{datos['dhash']}",
+            url_pendiente=url_pendiente,
+            opciones={"overwrite": False},
+        )
+        pago = ComprobanteService.registrar(
+            db, pago, datos["dhash"], datos["referencia"], url_pendiente,
+            sha256=datos["sha256"], similar_a=datos["similar_a"],
+        )
+    except Exception:
+        SubidaService.descartar_staging(ruta)
+        raise
+    SubidaService.encolar(subida_id)
+    return {
+        "success": True,
+        "duplicado": False,
+        "data": pago.to_dict(),
+        "similar_a_pago_id": datos["similar_a"],
+        "subida": {"id": subida_id, "estado": "pendiente"},
+    }
+
+
+@router.get("/imagen/{clave}.png", name="imagen_qr")
+async def imagen_qr(clave: str, request: Request, db: Session = Depends(get_db)):
+    """🖼️ PNG del QR (direccionado por contenido: se puede cachear para siempre)"""
+    etag = f'"{clave}"'
+    cabeceras = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cabeceras)
+    if len(clave) != 32 or not all(c in "0123456789abcdef" for c in clave):
+        raise NotFoundException("QR no encontrado")
+    png = await run_in_threadpool(QRService.png_por_clave, clave)
+    if png is None:
+        # Fuera de memoria y disco (LRU, redeploy): la URL es immutable, así que se re-renderiza
+        contenido = await run_in_threadpool(QRService.contenido_por_clave, db, clave)
+        if contenido is None:
+            raise NotFoundException("QR no encontrado")
+        png = await QRService.png(contenido)
+    return Response(content=png, media_type="image/png", headers=cabeceras)
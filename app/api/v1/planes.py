@@ -0,0 +1,43 @@
+# 📋 app/api/v1/planes.py - Catálogo de planes servido desde memoria
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.core.exceptions import NotFoundException
+from app.services.plan_registro import registro_planes
+
+router = APIRouter()
+
+CACHE_CONTROL = "public, max-age=60"
+
+
+def _respuesta(request: Request, contenido: bytes, etag: str) -> Response:
+    """200 con el JSON ya serializado, o 304 si el cliente tiene la misma versión"""
+    cabeceras = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cabeceras)
+    return Response(content=contenido, media_type="application/json", headers=cabeceras)
+
+
+def _catalogo(db: Session):
+    # Solo si el arranque no pudo cargarlo o un cambio desde una AsyncSession lo dejó obsoleto
+    if registro_planes.necesita_carga:
+        registro_planes.cargar(db.connection())
+    return registro_planes.actual
+
+
+@router.get("")
+async def listar_planes(request: Request, db: Session = Depends(get_db)):
+    """📋 Planes activos ordenados por `orden` (con ETag)"""
+    catalogo = _catalogo(db)
+    return _respuesta(request, catalogo.json, catalogo.etag)
+
+
+@router.get("/{codigo}")
+async def obtener_plan(codigo: str, request: Request, db: Session = Depends(get_db)):
+    """📄 Un plan activo por código (con ETag)"""
+    catalogo = _catalogo(db)
+    contenido = catalogo.json_plan(codigo)
+    if contenido is None:
+        raise NotFoundException(f"Plan '{codigo}' no encontrado")
+    return _respuesta(request, contenido, catalogo.etag_plan(codigo))
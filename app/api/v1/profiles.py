@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, status, UploadFile, File
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, Request, status, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.schemas.profile import ProfileResponse, ProfileUpdate, AvatarUpload, ProfileWithUser
 from app.schemas.auth import MessageResponse
 from app.services.profile_service import ProfileService
+from app.services.subida_service import SubidaService
+from app.services.imagen_service import VARIANTES_AVATAR
 from app.core.security import get_current_user_id
 import cloudinary
 import cloudinary.uploader
@@ -18,82 +21,103 @@ cloudinary.config(
     api_secret=settings.CLOUDINARY_API_SECRET
 )
 
+def _serializar_perfil(db, profile):
+    """Convertir a schema dentro de run_sync (atributos pendientes se cargan en contexto sync)"""
+    return ProfileResponse.from_orm(profile)
+
+def _perfil_completo(db, profile):
+    """Perfil + usuario; `profile.user` puede requerir lazy load, por eso corre dentro de run_sync"""
+    return {
+        "id": profile.user.id,
+        "email": profile.user.email,
+        "is_premium": profile.user.is_premium,
+        "profile": ProfileResponse.from_orm(profile)
+    }
+
+def _registrar_avatar_pendiente(db, user_id, subida_id, ruta, url_pendiente):
+    """Subida + avatar apuntando a la URL pendiente, en la misma transacción"""
+    SubidaService.crear(
+        db, subida_id, ruta, user_id, "avatar", user_id,
+        carpeta="galloapp/avatars",
+        public_id=f"avatar_user_{user_id}",
+        url_pendiente=url_pendiente,
+        variantes=VARIANTES_AVATAR,  # WebP 200x200 generado aquí: Cloudinary ya no transforma
+    )
+    return ProfileService.update_avatar(db, user_id, url_pendiente)
+
 @router.get("/me", response_model=ProfileResponse)
 async def get_my_profile(
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """👤 Obtener mi perfil"""
     
-    profile = ProfileService.get_profile_by_user_id(db, current_user_id)
-    return ProfileResponse.from_orm(profile)
+    profile = await db.run_sync(ProfileService.get_profile_by_user_id, current_user_id)
+    return await db.run_sync(_serializar_perfil, profile)
 
 @router.put("/me", response_model=ProfileResponse)
 async def update_my_profile(
     profile_data: ProfileUpdate,
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """✏️ Actualizar mi perfil"""
     
-    profile = ProfileService.update_profile(db, current_user_id, profile_data)
-    return ProfileResponse.from_orm(profile)
+    profile = await db.run_sync(ProfileService.update_profile, current_user_id, profile_data)
+    return await db.run_sync(_serializar_perfil, profile)
 
 @router.post("/avatar", response_model=ProfileResponse)
 async def upload_avatar(
+    request: Request,
     file: UploadFile = File(...),
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """📸 Subir avatar del usuario"""
+    """📸 Subir avatar del usuario (responde al copiar a staging; WebP + Cloudinary en segundo plano)"""
     
+    user_id = int(current_user_id)
     try:
-        # Subir a Cloudinary con transformación automática
-        upload_result = cloudinary.uploader.upload(
-            file.file,
-            folder="galloapp/avatars",
-            public_id=f"avatar_user_{current_user_id}",
-            overwrite=True,
-            transformation=[
-                {"width": 200, "height": 200, "crop": "fill", "quality": "auto", "format": "webp"}
-            ]
+        # Copiar a staging en bloques (en threadpool: la escritura es bloqueante)
+        subida_id, ruta = await run_in_threadpool(
+            SubidaService.guardar_en_staging, file.file, file.filename, file.content_type
         )
-        
-        # Actualizar avatar en perfil
-        avatar_url = upload_result["secure_url"]
-        profile = ProfileService.update_avatar(db, current_user_id, avatar_url)
-        
-        return ProfileResponse.from_orm(profile)
-        
     except Exception as e:
         from app.core.exceptions import ValidationException
         raise ValidationException(f"Error subiendo avatar: {str(e)}")
+    
+    # El avatar apunta a la URL pendiente hasta que el worker lo reemplaza por la definitiva
+    url_pendiente = str(request.url_for("archivo_subida", subida_id=subida_id))
+    try:
+        profile = await db.run_sync(
+            _registrar_avatar_pendiente, user_id, subida_id, ruta, url_pendiente
+        )
+    except Exception:
+        SubidaService.descartar_staging(ruta)
+        raise
+    SubidaService.encolar(subida_id)
+    
+    return await db.run_sync(_serializar_perfil, profile)
 
 @router.get("/me/complete", response_model=ProfileWithUser)
 async def get_complete_profile(
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """📋 Obtener perfil completo con datos de usuario"""
     
-    profile = ProfileService.get_profile_with_user(db, current_user_id)
+    profile = await db.run_sync(ProfileService.get_profile_with_user, current_user_id)
     
     # Construir respuesta manual porque es join
-    return {
-        "id": profile.user.id,
-        "email": profile.user.email,
-        "is_premium": profile.user.is_premium,
-        "profile": ProfileResponse.from_orm(profile)
-    }
+    return await db.run_sync(_perfil_completo, profile)
 
 @router.delete("/avatar", response_model=MessageResponse)
 async def remove_avatar(
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """🗑️ Eliminar avatar del usuario"""
     
     # Remover avatar (poner None)
-    ProfileService.update_avatar(db, current_user_id, None)
+    await db.run_sync(ProfileService.update_avatar, current_user_id, None)
     
     return MessageResponse(message="Avatar eliminado exitosamente")
\ No newline at end of file
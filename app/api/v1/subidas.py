@@ -0,0 +1,43 @@
+# 📤 app/api/v1/subidas.py - URLs pendientes de archivos subidos en segundo plano
+import os
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import FileResponse, RedirectResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.core.security import get_current_user_id
+from app.core.exceptions import NotFoundException
+from app.models.subida import EstadoSubida
+from app.services.subida_service import SubidaService
+
+router = APIRouter()
+
+
+@router.get("/{subida_id}", name="archivo_subida")
+async def archivo_subida(subida_id: str, db: Session = Depends(get_db)):
+    """🖼️ Archivo de una subida: redirige a la URL definitiva o sirve la copia local mientras sube"""
+    subida = SubidaService.obtener(db, subida_id)
+    if subida.estado == EstadoSubida.COMPLETADA and subida.url_final:
+        return RedirectResponse(subida.url_final, status_code=307)
+    if not os.path.exists(subida.ruta_staging):
+        raise NotFoundException("Archivo no encontrado")
+    return FileResponse(
+        subida.ruta_staging,
+        media_type=SubidaService.tipo_contenido(subida.ruta_staging),
+        headers={
+            "Cache-Control": "no-store",  # cambia a la URL definitiva al terminar
+            "X-Content-Type-Options": "nosniff",
+        },
+    )
+
+
+@router.get("/{subida_id}/estado")
+async def estado_subida(
+    subida_id: str,
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """📊 Estado de una subida propia (pendiente, subiendo, completada, fallida, descartada)"""
+    subida = SubidaService.obtener(db, subida_id, int(current_user_id))
+    return {"success": True, "data": subida.to_dict()}
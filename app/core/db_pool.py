@@ -0,0 +1,107 @@
+# 🏊 app/core/db_pool.py - Pools de conexiones con métricas de espera
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.config import settings
+
+
+class _MetricasEspera:
+    """Acumula cuánto esperan los checkouts por una conexión libre"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.espera_total = 0.0
+            self.espera_max = 0.0
+
+    def registrar(self, segundos: float, timeout: bool = False):
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+
+    def resumen(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "espera_total_ms": round(self.espera_total * 1000, 2),
+                "espera_promedio_ms": round(self.espera_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "espera_max_ms": round(self.espera_max * 1000, 2),
+            }
+
+
+class _PoolMedidoMixin:
+    """Mide el tiempo de `_do_get` (incluye la espera cuando el pool está agotado)"""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except PoolTimeoutError:
+            self.metricas.registrar(time.perf_counter() - inicio, timeout=True)
+            raise
+        self.metricas.registrar(time.perf_counter() - inicio)
+        return conexion
+
+    def recreate(self):
+        # recreate() se usa tras invalidar el pool: conservar las métricas acumuladas
+        nuevo = super().recreate()
+        nuevo.metricas = self.metricas
+        return nuevo
+
+
+class QueuePoolMedido(_PoolMedidoMixin, QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas = _MetricasEspera()
+
+
+class AsyncQueuePoolMedido(_PoolMedidoMixin, AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas = _MetricasEspera()
+
+
+def opciones_pool(database_url: str, asincrono: bool = False) -> Dict[str, Any]:
+    """kwargs de create_engine según Settings (SQLite conserva su pool por defecto)"""
+    if make_url(database_url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": AsyncQueuePoolMedido if asincrono else QueuePoolMedido,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def estadisticas_pool(pool) -> Dict[str, Any]:
+    """Conexiones en uso / libres / overflow y tiempos de espera de un pool"""
+    datos: Dict[str, Any] = {"tipo": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        datos.update({
+            "tamano": pool.size(),
+            "en_uso": pool.checkedout(),
+            "libres": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+        })
+    metricas = getattr(pool, "metricas", None)
+    if metricas is not None:
+        datos["espera"] = metricas.resumen()
+    return datos
@@ -47,4 +47,23 @@ class NotFoundException(CustomException):
             message=message,
             detail=detail,
             error_code="NOT_FOUND"
-        )
\ No newline at end of file
+        )
+class TooManyRequestsException(CustomException):
+    """Servidor saturado: el cliente debe reintentar más tarde"""
+    def __init__(self, message: str = "Too many requests", detail: str = None):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            message=message,
+            detail=detail,
+            error_code="TOO_MANY_REQUESTS"
+        )
+
+class ConflictException(CustomException):
+    """El recurso ya existe o choca con otro (duplicados)"""
+    def __init__(self, message: str = "Conflict", detail: str = None):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            message=message,
+            detail=detail,
+            error_code="CONFLICT"
+        )
@@ -0,0 +1,59 @@
+# ⏱️ app/core/latencias.py - Latencias recientes por operación (p50/p95/p99)
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict
+
+MUESTRAS_POR_OPERACION = 2048
+
+
+class RegistroLatencias:
+    """Ventana deslizante de duraciones por operación para calcular percentiles"""
+
+    def __init__(self, max_muestras: int = MUESTRAS_POR_OPERACION):
+        self.max_muestras = max_muestras
+        self._muestras: Dict[str, Deque[float]] = {}
+        self._totales: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, operacion: str, segundos: float):
+        with self._lock:
+            muestras = self._muestras.get(operacion)
+            if muestras is None:
+                muestras = self._muestras[operacion] = deque(maxlen=self.max_muestras)
+            muestras.append(segundos)
+            self._totales[operacion] = self._totales.get(operacion, 0) + 1
+
+    @contextmanager
+    def medir(self, operacion: str):
+        """`with registro_latencias.medir("login"): ...` (también alrededor de awaits)"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(operacion, time.perf_counter() - inicio)
+
+    @staticmethod
+    def _percentil(ordenadas, p: float) -> float:
+        indice = min(len(ordenadas) - 1, max(0, int(round(p / 100 * len(ordenadas) + 0.5)) - 1))
+        return ordenadas[indice]
+
+    def resumen(self) -> Dict[str, dict]:
+        with self._lock:
+            copia = {op: sorted(m) for op, m in self._muestras.items()}
+            totales = dict(self._totales)
+        return {
+            op: {
+                "total": totales[op],
+                "muestras": len(ordenadas),
+                "p50_ms": round(self._percentil(ordenadas, 50) * 1000, 2),
+                "p95_ms": round(self._percentil(ordenadas, 95) * 1000, 2),
+                "p99_ms": round(self._percentil(ordenadas, 99) * 1000, 2),
+                "max_ms": round(ordenadas[-1] * 1000, 2),
+            }
+            for op, ordenadas in copia.items() if ordenadas
+        }
+
+
+registro_latencias = RegistroLatencias()
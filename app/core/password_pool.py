@@ -0,0 +1,82 @@
+# 🔑 app/core/password_pool.py - Pool acotado para bcrypt (fuera del event loop)
+"""
+bcrypt tarda ~250 ms por operación: ejecutarlo dentro de un `async def`
+congela el event loop. Este pool corre esas operaciones en hilos dedicados
+(bcrypt libera el GIL) con un límite de trabajos pendientes; al superarlo la
+petición recibe 429 en lugar de encolarse indefinidamente.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, Tuple
+
+from app.core.config import settings
+from app.core.exceptions import TooManyRequestsException
+from app.core.security import SecurityService
+
+
+class PasswordPool:
+    """🧵 ThreadPoolExecutor con contrapresión por cantidad de trabajos pendientes"""
+
+    def __init__(self, workers: int, max_pendientes: int):
+        self.workers = max(workers, 1)
+        self.max_pendientes = max(max_pendientes, self.workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self.rechazados = 0
+        self.completados = 0
+
+    def _obtener_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+        return self._executor
+
+    async def ejecutar(self, funcion: Callable[..., Any], *args, **kwargs) -> Any:
+        """Ejecutar `funcion` en el pool; 429 si ya hay demasiados trabajos esperando"""
+        with self._lock:
+            if self._pendientes >= self.max_pendientes:
+                self.rechazados += 1
+                raise TooManyRequestsException(
+                    "Servidor ocupado, intenta de nuevo en unos segundos",
+                    detail=f"{self._pendientes} operaciones de contraseña en curso"
+                )
+            self._pendientes += 1
+            executor = self._obtener_executor()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, partial(funcion, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._pendientes -= 1
+                self.completados += 1
+
+    async def hash(self, password: str) -> str:
+        return await self.ejecutar(SecurityService.get_password_hash, password)
+
+    async def verificar(self, password: str, hashed: str) -> bool:
+        return await self.ejecutar(SecurityService.verify_password, password, hashed)
+
+    async def verificar_y_actualizar(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(válida, hash nuevo si el costo configurado cambió)"""
+        return await self.ejecutar(SecurityService.verify_and_update_password, password, hashed)
+
+    def apagar(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pendientes": self.max_pendientes,
+                "pendientes": self._pendientes,
+                "completados": self.completados,
+                "rechazados": self.rechazados,
+            }
+
+
+password_pool = PasswordPool(settings.PASSWORD_POOL_WORKERS, settings.PASSWORD_POOL_MAX_PENDIENTES)
@@ -1,15 +1,24 @@
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
-from app.database import get_db
+from app.database import get_db, get_async_db
 
 # 🔐 Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max = rounds: un hash con otro costo "necesita actualización" y se rehashea al hacer login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 # 🔑 JWT Bearer scheme
 security = HTTPBearer()
@@ -25,6 +34,11 @@ class SecurityService:
         """Generar hash de password"""
         return pwd_context.hash(password)
     
+    @staticmethod
+    def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verificar password; si el hash usa otro costo devuelve también el hash nuevo"""
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
         """Crear JWT access token"""
@@ -34,22 +48,46 @@ class SecurityService:
         else:
             expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         
-        to_encode.update({"exp": expire, "type": "access"})
+        # iat con fracción de segundo: el corte por usuario (token_cache) no deja pasar tokens del mismo segundo
+        to_encode.update({"exp": expire, "iat": time.time(), "type": "access"})
         encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
         return encoded_jwt
     
+    @staticmethod
+    def claims_usuario(user) -> dict:
+        """Claims del access token: sub + flags de la cuenta al momento de emitirlo"""
+        return {
+            "sub": str(user.id),
+            "is_active": bool(user.is_active),
+            "es_admin": bool(user.es_admin),
+            "is_premium": bool(user.is_premium),
+        }
+    
     @staticmethod
     def create_refresh_token(data: dict) -> str:
         """Crear JWT refresh token"""
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-        to_encode.update({"exp": expire, "type": "refresh"})
+        to_encode.update({"exp": expire, "iat": time.time(), "type": "refresh"})
         encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
         return encoded_jwt
     
     @staticmethod
     def verify_token(token: str, token_type: str = "access") -> dict:
-        """Verificar y decodificar JWT token"""
+        """Verificar y decodificar JWT token (payload en caché hasta su exp; revocaciones siempre)"""
+        from app.core.token_cache import token_cache, hash_token
+        
+        clave = hash_token(token)
+        payload = token_cache.obtener(clave)
+        if payload is not None:
+            if payload.get("type") != token_type:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid token type"
+                )
+            SecurityService._verificar_no_revocado(clave, payload)
+            return payload
+        
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
             
@@ -68,6 +106,8 @@ class SecurityService:
                     detail="Token expired"
                 )
             
+            token_cache.guardar(clave, payload)
+            SecurityService._verificar_no_revocado(clave, payload)
             return payload
             
         except JWTError:
@@ -75,6 +115,17 @@ class SecurityService:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials"
             )
+    
+    @staticmethod
+    def _verificar_no_revocado(clave: str, payload: dict):
+        """Rechazar tokens revocados por logout o por cambio de contraseña"""
+        from app.core.token_cache import token_cache
+        
+        if token_cache.esta_revocado(clave, payload):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token revoked"
+            )
 
 # 🔒 Dependency para obtener usuario actual desde token
 async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> int:
@@ -121,4 +172,74 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="User not found"
         )
     
-    return user
\ No newline at end of file
+    return user
+
+# ⚡ Dependency async para obtener usuario completo (sin bloquear el event loop)
+async def get_current_user_async(
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Obtener objeto User completo desde JWT token usando la sesión async"""
+    from app.models.user import User  # Import local para evitar circular imports
+
+    user = await db.get(User, int(current_user_id))
+
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+
+    return user
+
+# ⚡ Dependency para obtener el principal autenticado (caché en memoria, BD solo si falla)
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Snapshot del usuario actual: usa la caché de usuarios y consulta la BD solo en un miss"""
+    from app.models.user import User  # Import local para evitar circular imports
+    from app.core.usuario_cache import usuario_cache
+
+    payload = SecurityService.verify_token(credentials.credentials)
+    user_id = payload.get("sub")
+
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials"
+        )
+
+    # Token emitido para una cuenta desactivada: rechazar sin tocar la BD
+    if payload.get("is_active") is False:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user"
+        )
+
+    principal, generacion = usuario_cache.obtener(int(user_id))
+    if principal is None:
+        user = await db.get(User, int(user_id))
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        principal = usuario_cache.guardar(user, generacion)
+
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user"
+        )
+
+    return principal
+
+# 🛡️ Dependency para rutas de administración
+async def get_current_admin(principal=Depends(get_current_principal)):
+    """Principal autenticado con es_admin; 403 si no es administrador"""
+    from app.core.exceptions import AuthorizationException
+
+    if not principal.es_admin:
+        raise AuthorizationException("Se requieren permisos de administrador")
+    return principal
@@ -0,0 +1,118 @@
+# 🎟️ app/core/token_cache.py - Caché de tokens JWT verificados y revocaciones
+"""
+Evita repetir la verificación de firma de un mismo bearer token en cada
+request: guarda el payload decodificado (por hash SHA-256 del token) hasta su
+`exp`. Las revocaciones se consultan SIEMPRE, también en un acierto de caché:
+
+- por token: `/auth/logout` revoca el access token usado;
+- por usuario: cambiar/restablecer la contraseña invalida todos los tokens
+  emitidos antes (`iat` anterior al corte).
+
+⚠️ Caché y revocaciones son por proceso (igual que las demás cachés en memoria).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCache:
+    """🗃️ LRU de payloads verificados + conjuntos de revocación con expiración"""
+
+    def __init__(self, max_entradas: int, retencion_usuarios: int):
+        self.max_entradas = max_entradas
+        self.retencion_usuarios = retencion_usuarios  # segundos que se recuerda un corte por usuario
+        self._payloads: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._tokens_revocados: Dict[str, float] = {}  # hash → exp
+        self._cortes_usuario: Dict[str, Tuple[float, float]] = {}  # sub → (corte, olvidar_en)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obtener(self, clave: str) -> Optional[dict]:
+        """Payload ya verificado si el token sigue vigente"""
+        with self._lock:
+            entrada = self._payloads.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+            exp, payload = entrada
+            if exp <= time.time():
+                del self._payloads[clave]
+                self.misses += 1
+                return None
+            self._payloads.move_to_end(clave)
+            self.hits += 1
+            return payload
+
+    def guardar(self, clave: str, payload: dict):
+        exp = payload.get("exp")
+        if not exp or self.max_entradas <= 0:
+            return
+        with self._lock:
+            self._payloads[clave] = (float(exp), payload)
+            self._payloads.move_to_end(clave)
+            while len(self._payloads) > self.max_entradas:
+                self._payloads.popitem(last=False)
+
+    # ========================
+    # 🚫 REVOCACIÓN
+    # ========================
+
+    def revocar_token(self, token: str, exp: float):
+        """Revocar un token concreto hasta que expire por sí solo"""
+        clave = hash_token(token)
+        with self._lock:
+            self._purgar()
+            self._tokens_revocados[clave] = float(exp)
+            self._payloads.pop(clave, None)
+
+    def revocar_usuario(self, user_id: int):
+        """Revocar todos los tokens del usuario emitidos hasta ahora"""
+        ahora = time.time()
+        with self._lock:
+            self._purgar()
+            # Corte con fracción de segundo: los tokens llevan iat sub-segundo (SecurityService)
+            self._cortes_usuario[str(user_id)] = (ahora, ahora + self.retencion_usuarios)
+
+    def esta_revocado(self, clave: str, payload: dict) -> bool:
+        with self._lock:
+            if clave in self._tokens_revocados:
+                return True
+            corte = self._cortes_usuario.get(str(payload.get("sub")))
+            if corte is None:
+                return False
+            # Tokens sin iat son anteriores a los cortes por usuario: también se rechazan
+            return payload.get("iat", 0) < corte[0]
+
+    def _purgar(self):
+        ahora = time.time()
+        for clave in [c for c, exp in self._tokens_revocados.items() if exp <= ahora]:
+            del self._tokens_revocados[clave]
+        for sub in [s for s, (_, olvidar) in self._cortes_usuario.items() if olvidar <= ahora]:
+            del self._cortes_usuario[sub]
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "tokens": len(self._payloads),
+                "max_entradas": self.max_entradas,
+                "tokens_revocados": len(self._tokens_revocados),
+                "usuarios_revocados": len(self._cortes_usuario),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_MAX,
+    # Un corte por usuario solo importa mientras viva el token más largo (refresh)
+    settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600,
+)
@@ -0,0 +1,139 @@
+# 👤 app/core/usuario_cache.py - Caché en memoria de usuarios autenticados
+"""
+Guarda por `user_id` una foto inmutable del usuario (id, email y flags) para
+que las dependencias de autenticación no consulten `users` en cada request.
+
+Las entradas expiran tras `USUARIO_CACHE_TTL` segundos y se invalidan con los
+eventos de SQLAlchemy sobre `User` (también al confirmar la transacción).
+
+⚠️ La caché es por proceso (igual que la del grafo genealógico).
+⚠️ Los `query(User).update()` masivos no disparan eventos de mapper: quien los
+use debe llamar `usuario_cache.invalidar(user_id)` o `usuario_cache.limpiar()`.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.user import User
+
+
+class UsuarioSnapshot(NamedTuple):
+    """Principal autenticado: lo mínimo que necesitan las rutas protegidas"""
+    id: int
+    email: str
+    is_active: bool
+    is_verified: bool
+    is_premium: bool
+    es_admin: bool
+
+    @classmethod
+    def desde_usuario(cls, user: User) -> "UsuarioSnapshot":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=bool(user.is_active),
+            is_verified=bool(user.is_verified),
+            is_premium=bool(user.is_premium),
+            es_admin=bool(user.es_admin),
+        )
+
+
+class UsuarioCache:
+    """🗃️ LRU con TTL de snapshots de usuario"""
+
+    def __init__(self, ttl_segundos: int, max_entradas: int):
+        self.ttl = ttl_segundos
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[int, Tuple[float, UsuarioSnapshot]]" = OrderedDict()
+        self._generacion = 0  # Cambia con cada invalidación (evita guardar cargas obsoletas)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def habilitado(self) -> bool:
+        return self.ttl > 0 and self.max_entradas > 0
+
+    def obtener(self, user_id: int) -> Tuple[Optional[UsuarioSnapshot], int]:
+        """(snapshot vigente o None, generación a pasar a `guardar` tras leer la BD)"""
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is not None:
+                expira, snapshot = entrada
+                if expira > time.monotonic():
+                    self._entradas.move_to_end(user_id)
+                    self.hits += 1
+                    return snapshot, self._generacion
+                del self._entradas[user_id]
+            self.misses += 1
+            return None, self._generacion
+
+    def guardar(self, user: User, generacion: int) -> UsuarioSnapshot:
+        """Crear el snapshot y guardarlo si nadie invalidó mientras se leía la BD"""
+        snapshot = UsuarioSnapshot.desde_usuario(user)
+        if not self.habilitado:
+            return snapshot
+        with self._lock:
+            if generacion == self._generacion:
+                self._entradas[snapshot.id] = (time.monotonic() + self.ttl, snapshot)
+                self._entradas.move_to_end(snapshot.id)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+        return snapshot
+
+    def invalidar(self, user_id: int):
+        with self._lock:
+            self._generacion += 1
+            self._entradas.pop(user_id, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self._entradas.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "usuarios": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+usuario_cache = UsuarioCache(settings.USUARIO_CACHE_TTL, settings.USUARIO_CACHE_MAX)
+
+
+# ========================
+# 🔔 INVALIDACIÓN POR EVENTOS
+# ========================
+
+def _invalidar_por_escritura(mapper, connection, target):
+    usuario_cache.invalidar(target.id)
+
+    # Repetir al confirmar: otra petición pudo recargar el usuario antes del commit
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("usuarios_invalidar", set()).add(target.id)
+
+
+def _invalidar_al_terminar(session):
+    for user_id in session.info.pop("usuarios_invalidar", ()):
+        usuario_cache.invalidar(user_id)
+
+
+def _invalidar_al_revertir(session, previous_transaction):
+    _invalidar_al_terminar(session)
+
+
+for _evento in ("after_update", "after_delete"):
+    event.listen(User, _evento, _invalidar_por_escritura)
+
+event.listen(Session, "after_commit", _invalidar_al_terminar)
+event.listen(Session, "after_soft_rollback", _invalidar_al_revertir)
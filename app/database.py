@@ -1,14 +1,39 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.db_pool import opciones_pool
 
-# Crear engine de base de datos
-engine = create_engine(settings.DATABASE_URL)
+# Crear engine de base de datos (pool configurable desde Settings)
+engine = create_engine(settings.DATABASE_URL, **opciones_pool(settings.DATABASE_URL))
 
 # Crear SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# ⚡ Engine asíncrono (asyncpg en producción, aiosqlite en local)
+def _url_asincrona(database_url: str):
+    """Convertir DATABASE_URL al driver async equivalente"""
+    url = make_url(database_url.replace("postgres://", "postgresql://", 1))
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+        # asyncpg usa `ssl` en lugar de `sslmode`
+        if "sslmode" in url.query:
+            url = url.update_query_dict({"ssl": url.query["sslmode"]}).difference_update_query(["sslmode"])
+    elif backend == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url
+
+async_engine = create_async_engine(
+    _url_asincrona(settings.DATABASE_URL),
+    **opciones_pool(settings.DATABASE_URL, asincrono=True)
+)
+
+# expire_on_commit=False: los objetos siguen legibles tras commit sin I/O implícito
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Crear Base class para modelos
 Base = declarative_base()
 
@@ -19,4 +44,10 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# ⚡ Dependency para obtener sesión asíncrona de BD
+async def get_async_db():
+    """Obtener sesión asíncrona de base de datos"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,10 +1,10 @@
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-import psycopg2
 import cloudinary
 import cloudinary.uploader
 import os
+import asyncio
 import ssl
 import urllib3
 from decouple import config
@@ -30,6 +30,30 @@ except ImportError as e:
     fotos_router = None
     razas_router = None
 
+# 📥 Cargar importación masiva de gallos
+try:
+    from app.api.v1.gallos_importacion import router as gallos_importacion_router
+    print("   - ✅ Importación masiva de gallos")
+except ImportError as e:
+    print(f"⚠️ Importación masiva no disponible: {e}")
+    gallos_importacion_router = None
+
+# 📸 Cargar fotos de gallos con variantes precalculadas
+try:
+    from app.api.v1.gallos_fotos import router as gallos_fotos_router
+    print("   - ✅ Fotos de gallos con variantes precalculadas")
+except ImportError as e:
+    print(f"⚠️ Fotos con variantes no disponibles: {e}")
+    gallos_fotos_router = None
+
+# 🔍 Cargar búsqueda de gallos
+try:
+    from app.api.v1.gallos_busqueda import router as gallos_busqueda_router
+    print("   - ✅ Búsqueda de gallos con cursor")
+except ImportError as e:
+    print(f"⚠️ Búsqueda de gallos no disponible: {e}")
+    gallos_busqueda_router = None
+
 # Cargar vacunas
 try:
     from app.api.v1.vacunas import router as vacunas_router
@@ -68,6 +92,54 @@ except ImportError as e:
     pagos_router = None
     admin_router = None
 
+# 📱 Cargar pagos con QR pre-renderizado
+try:
+    from app.api.v1.pagos_qr import router as pagos_qr_router
+    print("   - ✅ QR de pago cacheados")
+except ImportError as e:
+    print(f"⚠️ QR de pago no disponible: {e}")
+    pagos_qr_router = None
+
+# 🧾 Cargar cola de verificación de pagos (admins)
+try:
+    from app.api.v1.admin_pagos import router as admin_pagos_router
+    print("   - ✅ Cola de verificación de pagos")
+except ImportError as e:
+    print(f"⚠️ Cola de verificación no disponible: {e}")
+    admin_pagos_router = None
+
+# 📤 Cargar subidas en segundo plano
+try:
+    from app.api.v1.subidas import router as subidas_router
+    print("   - ✅ Subidas en segundo plano")
+except ImportError as e:
+    print(f"⚠️ Subidas en segundo plano no disponibles: {e}")
+    subidas_router = None
+
+# 📋 Cargar catálogo de planes (en memoria)
+try:
+    from app.api.v1.planes import router as planes_router
+    print("   - ✅ Catálogo de planes en memoria")
+except ImportError as e:
+    print(f"⚠️ Catálogo de planes no disponible: {e}")
+    planes_router = None
+
+# 📊 Cargar cuotas del plan
+try:
+    from app.api.v1.cuotas import router as cuotas_router
+    print("   - ✅ Cuotas y uso del plan")
+except ImportError as e:
+    print(f"⚠️ Cuotas del plan no disponible: {e}")
+    cuotas_router = None
+
+# 🧬 Cargar análisis genealógico
+try:
+    from app.api.v1.genealogia import router as genealogia_router
+    print("   - ✅ Análisis genealógico y consanguinidad")
+except ImportError as e:
+    print(f"⚠️ Análisis genealógico no disponible: {e}")
+    genealogia_router = None
+
 # 💰 Cargar módulo inversiones
 try:
     from app.api.v1.inversiones import router as inversiones_router
@@ -107,9 +179,12 @@ except ImportError as e:
     print(f"   - ❌ Error cargando FCM: {e}")
     fcm_router = None
     
+from sqlalchemy import text
 from app.core.config import settings
 from app.core.exceptions import CustomException
-from app.core.security import get_current_user_id
+from app.core.db_pool import estadisticas_pool
+from app.database import engine, async_engine
+from app.core.security import get_current_user_id, get_current_admin
 
 # 🔧 Deshabilitar verificación SSL para desarrollo
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -170,11 +245,241 @@ async def custom_exception_handler(request: Request, exc: CustomException):
         }
     )
 
+# 📸 Columna gallos.fotos_variantes (primero: los demás arranques ya consultan Gallo)
+@app.on_event("startup")
+async def inicializar_fotos_variantes():
+    try:
+        from app.services.foto_variantes_service import FotoVariantesService
+        FotoVariantesService.asegurar_columna(engine)
+        print("✅ Variantes de fotos precalculadas activas")
+    except Exception as e:
+        print(f"⚠️ Variantes de fotos no disponibles: {e}")
+
+# 🧬 Tabla de cierre genealógico (mantenimiento incremental de ancestros)
+@app.on_event("startup")
+async def inicializar_cierre_genealogico():
+    try:
+        from app.services.cierre_genealogico_service import CierreGenealogicoService
+        CierreGenealogicoService.inicializar(engine)
+        print("✅ Cierre genealógico activo")
+    except Exception as e:
+        print(f"⚠️ Cierre genealógico no disponible: {e}")
+
+# 🔄 Sesiones de refresh token (tabla + limpieza periódica por lotes)
+@app.on_event("startup")
+async def inicializar_refresh_sessions():
+    try:
+        from app.services.refresh_session_service import RefreshSessionService
+        from app.database import AsyncSessionLocal
+        RefreshSessionService.inicializar(engine)
+
+        async def limpiar_periodicamente():
+            while True:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        eliminadas = await RefreshSessionService.purgar_expiradas(db)
+                    if eliminadas:
+                        print(f"🧹 Sesiones de refresh eliminadas: {eliminadas}")
+                except Exception as e:
+                    print(f"⚠️ Error limpiando sesiones de refresh: {e}")
+                await asyncio.sleep(3600)
+
+        asyncio.create_task(limpiar_periodicamente())
+        print("✅ Sesiones de refresh activas")
+    except Exception as e:
+        print(f"⚠️ Sesiones de refresh no disponibles: {e}")
+
+# 📊 Contadores de cuota (tabla + recuento inicial)
+@app.on_event("startup")
+async def inicializar_cuotas():
+    try:
+        from app.services.cuota_service import CuotaService
+        CuotaService.inicializar(engine)
+        print("✅ Contadores de cuota activos")
+    except Exception as e:
+        print(f"⚠️ Contadores de cuota no disponibles: {e}")
+
+# 📋 Catálogo de planes en memoria (carga inicial + sondeo de versión)
+@app.on_event("startup")
+async def inicializar_catalogo_planes():
+    try:
+        from fastapi.concurrency import run_in_threadpool
+        from app.services.plan_registro import registro_planes
+        registro_planes.inicializar(engine)
+
+        def verificar_version():
+            with engine.connect() as conn:
+                return registro_planes.recargar_si_cambio(conn)
+
+        async def sondear_version():
+            while True:
+                await asyncio.sleep(settings.PLANES_VERIFICAR_SEG)
+                try:
+                    if await run_in_threadpool(verificar_version):
+                        print(f"📋 Catálogo de planes recargado: {registro_planes.estadisticas()}")
+                except Exception as e:
+                    print(f"⚠️ Error verificando el catálogo de planes: {e}")
+
+        if settings.PLANES_VERIFICAR_SEG > 0:
+            asyncio.create_task(sondear_version())
+        print(f"✅ Catálogo de planes cargado: {len(registro_planes.actual.planes)} planes")
+    except Exception as e:
+        print(f"⚠️ Catálogo de planes no disponible: {e}")
+
+# 💳 Índice parcial de suscripciones activas (fallos de la caché de planes)
+@app.on_event("startup")
+async def inicializar_indices_suscripciones():
+    try:
+        from app.services.suscripcion_cache import asegurar_indices
+        asegurar_indices(engine)
+        print("✅ Índice de suscripciones activas listo")
+    except Exception as e:
+        print(f"⚠️ Índice de suscripciones no disponible: {e}")
+
+# ⏰ Barrido periódico de suscripciones vencidas
+@app.on_event("startup")
+async def inicializar_barrido_vencimientos():
+    if settings.VENCIMIENTO_INTERVALO_MIN <= 0:
+        print("⚠️ Barrido de vencimientos deshabilitado")
+        return
+    try:
+        from fastapi.concurrency import run_in_threadpool
+        from app.services.vencimiento_service import VencimientoService
+        from app.database import SessionLocal
+
+        def barrer():
+            db = SessionLocal()
+            try:
+                return VencimientoService.barrer(db)
+            finally:
+                db.close()
+
+        async def barrer_periodicamente():
+            while True:
+                try:
+                    reporte = await run_in_threadpool(barrer)
+                    if reporte["suscripciones_vencidas"]:
+                        print(f"⏰ Suscripciones vencidas: {reporte}")
+                except Exception as e:
+                    print(f"⚠️ Error en el barrido de vencimientos: {e}")
+                await asyncio.sleep(settings.VENCIMIENTO_INTERVALO_MIN * 60)
+
+        asyncio.create_task(barrer_periodicamente())
+        print("✅ Barrido de vencimientos activo")
+    except Exception as e:
+        print(f"⚠️ Barrido de vencimientos no disponible: {e}")
+
+# 🧾 Índice parcial de la cola de verificación de pagos
+@app.on_event("startup")
+async def inicializar_indices_pagos():
+    try:
+        from app.services.verificacion_pagos_service import VerificacionPagosService
+        VerificacionPagosService.asegurar_indices(engine)
+        print("✅ Índice de la cola de pagos listo")
+    except Exception as e:
+        print(f"⚠️ Índice de la cola de pagos no disponible: {e}")
+
+# 🔁 Pagos sin duplicados: claves de idempotencia (con purga periódica) y huellas de comprobantes
+@app.on_event("startup")
+async def inicializar_pagos_idempotentes():
+    try:
+        from fastapi.concurrency import run_in_threadpool
+        from app.services.idempotencia_service import IdempotenciaService
+        from app.services.comprobante_service import ComprobanteService
+        from app.database import SessionLocal
+        IdempotenciaService.inicializar(engine)
+        ComprobanteService.inicializar(engine)
+
+        def purgar():
+            db = SessionLocal()
+            try:
+                return IdempotenciaService.purgar_expiradas(db)
+            finally:
+                db.close()
+
+        async def purgar_periodicamente():
+            while True:
+                try:
+                    eliminadas = await run_in_threadpool(purgar)
+                    if eliminadas:
+                        print(f"🧹 Claves de idempotencia eliminadas: {eliminadas}")
+                except Exception as e:
+                    print(f"⚠️ Error limpiando claves de idempotencia: {e}")
+                await asyncio.sleep(3600)
+
+        asyncio.create_task(purgar_periodicamente())
+        print("✅ Pagos idempotentes activos")
+    except Exception as e:
+        print(f"⚠️ Pagos idempotentes no disponibles: {e}")
+
+# 📤 Subidas en segundo plano: tabla, pendientes de un arranque anterior y workers
+@app.on_event("startup")
+async def inicializar_subidas():
+    try:
+        from fastapi.concurrency import run_in_threadpool
+        from app.services.subida_service import SubidaService
+        retomadas = await run_in_threadpool(SubidaService.inicializar, engine)
+        print(f"✅ Subidas en segundo plano activas ({retomadas} retomadas)")
+    except Exception as e:
+        print(f"⚠️ Subidas en segundo plano no disponibles: {e}")
+
+@app.on_event("shutdown")
+async def apagar_subidas():
+    try:
+        from app.services.subida_service import SubidaService
+        SubidaService.apagar()
+    except Exception as e:
+        print(f"⚠️ Error cerrando el pool de subidas: {e}")
+
+# 📱 Pool de procesos de QR: cerrarlo con la app
+@app.on_event("shutdown")
+async def apagar_pool_qr():
+    try:
+        from app.services.qr_service import QRService
+        QRService.apagar()
+    except Exception as e:
+        print(f"⚠️ Error cerrando el pool de QR: {e}")
+
+# 🔍 Índices de búsqueda de gallos (keyset + trigrama)
+@app.on_event("startup")
+async def inicializar_indices_busqueda():
+    try:
+        from app.services.gallo_busqueda_service import GalloBusquedaService
+        GalloBusquedaService.asegurar_indices(engine)
+        print("✅ Índices de búsqueda de gallos listos")
+    except Exception as e:
+        print(f"⚠️ Índices de búsqueda no disponibles: {e}")
+
 # 🌐 Incluir routers de API
 app.include_router(auth.router, prefix="/auth", tags=["🔐 Autenticación"])
 app.include_router(profiles.router, prefix="/profiles", tags=["👤 Perfiles"])
 
 # 🔥 ENDPOINTS LIMPIOS PRINCIPALES
+# Importación y búsqueda antes que pedigrí para que /importar y /buscar no choquen con /{gallo_id}
+if gallos_importacion_router:
+    app.include_router(
+        gallos_importacion_router,
+        prefix="/api/v1/gallos",
+        tags=["📥 Importación de Gallos"]
+    )
+    print("✅ Router de importación de gallos activado")
+
+if gallos_fotos_router:
+    app.include_router(
+        gallos_fotos_router,
+        prefix="/api/v1/gallos",
+        tags=["📸 Fotos de Gallos"]
+    )
+    print("✅ Router de fotos con variantes activado")
+
+if gallos_busqueda_router:
+    app.include_router(
+        gallos_busqueda_router,
+        prefix="/api/v1/gallos",
+        tags=["🔍 Búsqueda de Gallos"]
+    )
+    print("✅ Router de búsqueda de gallos activado")
+
 if gallos_pedigri_router:
     app.include_router(
         gallos_pedigri_router, 
@@ -232,6 +537,15 @@ if suscripciones_router:
     )
     print("✅ Router de suscripciones activado")
 
+# Antes que pagos para que /pagos/qr no choque con rutas /pagos/{id}
+if pagos_qr_router:
+    app.include_router(
+        pagos_qr_router,
+        prefix="/api/v1/pagos/qr",
+        tags=["📱 Pagos QR"]
+    )
+    print("✅ Router de pagos QR activado")
+
 if pagos_router:
     app.include_router(
         pagos_router,
@@ -240,6 +554,15 @@ if pagos_router:
     )
     print("✅ Router de pagos activado")
 
+# Antes que admin para que /admin/pagos/* no choque con rutas genéricas de admin
+if admin_pagos_router:
+    app.include_router(
+        admin_pagos_router,
+        prefix="/api/v1/admin/pagos",
+        tags=["🧾 Verificación de Pagos"]
+    )
+    print("✅ Router de verificación de pagos activado")
+
 if admin_router:
     app.include_router(
         admin_router,
@@ -248,6 +571,44 @@ if admin_router:
     )
     print("✅ Router de admin activado")
 
+if subidas_router:
+    app.include_router(
+        subidas_router,
+        prefix="/api/v1/subidas",
+        tags=["📤 Subidas"]
+    )
+    print("✅ Router de subidas activado")
+
+# 🗄️ Backend local: servir los archivos "subidos" (desarrollo y pruebas)
+if settings.ALMACENAMIENTO_BACKEND == "local":
+    from fastapi.staticfiles import StaticFiles
+    os.makedirs(settings.SUBIDAS_LOCAL_DIR, exist_ok=True)
+    app.mount(settings.SUBIDAS_LOCAL_URL, StaticFiles(directory=settings.SUBIDAS_LOCAL_DIR), name="archivos")
+
+if planes_router:
+    app.include_router(
+        planes_router,
+        prefix="/api/v1/planes",
+        tags=["📋 Planes"]
+    )
+    print("✅ Router de planes activado")
+
+if cuotas_router:
+    app.include_router(
+        cuotas_router,
+        prefix="/api/v1/cuotas",
+        tags=["📊 Cuotas del Plan"]
+    )
+    print("✅ Router de cuotas activado")
+
+if genealogia_router:
+    app.include_router(
+        genealogia_router,
+        prefix="/api/v1/genealogia",
+        tags=["🧬 Genealogía"]
+    )
+    print("✅ Router de genealogía activado")
+
 if inversiones_router:
     app.include_router(
         inversiones_router,
@@ -329,7 +690,10 @@ async def root():
             "reportes": "/api/v1/reportes" if reportes_router else "NO DISPONIBLE",
             "test_db": "/test-db",
             "test_cloudinary": "/test-cloudinary",
-            "test_full": "/test-full"
+            "test_full": "/test-full",
+            "metrics_db": "/metrics/db",
+            "metrics_latencias": "/metrics/latencias",
+            "metrics_vencimientos": "/metrics/vencimientos"
         },
         "tecnica_epica": {
             "descripcion": "Sistema genealógico recursivo infinito",
@@ -369,23 +733,16 @@ async def health_check():
 async def test_database():
     \"\"\"🗄️ Test PostgreSQL Connection\"\"\"
     try:
-        # Conectar a PostgreSQL
-        conn = psycopg2.connect(settings.DATABASE_URL)
-        cursor = conn.cursor()
-        
-        # Test query
-        cursor.execute("SELECT version();")
-        db_version = cursor.fetchone()[0]
-        
-        # Test tabla usuarios si existe
-        try:
-            cursor.execute("SELECT COUNT(*) FROM users;")
-            user_count = cursor.fetchone()[0]
-        except:
-            user_count = "Tabla no existe aún"
-        
-        cursor.close()
-        conn.close()
+        # Reutilizar el pool async (no abrir una conexión nueva por request)
+        async with async_engine.connect() as conn:
+            # Test query
+            db_version = (await conn.execute(text("SELECT version();"))).scalar()
+            
+            # Test tabla usuarios si existe
+            try:
+                user_count = (await conn.execute(text("SELECT COUNT(*) FROM users;"))).scalar()
+            except Exception:
+                user_count = "Tabla no existe aún"
         
         return {
             "status": "✅ PostgreSQL CONECTADO",
@@ -400,6 +757,38 @@ async def test_database():
             detail=f"❌ Error conectando a PostgreSQL: {str(e)}"
         )
 
+# 📊 Métricas internas: solo administradores
+
+@app.get("/metrics/latencias")
+async def metricas_latencias(admin=Depends(get_current_admin)):
+    """⏱️ p50/p95/p99 recientes de operaciones instrumentadas (login, etc.)"""
+    from app.core.latencias import registro_latencias
+    return registro_latencias.resumen()
+
+@app.get("/metrics/vencimientos")
+async def metricas_vencimientos(admin=Depends(get_current_admin)):
+    """⏰ Resultado del último barrido de suscripciones vencidas"""
+    from app.services.vencimiento_service import VencimientoService
+    return {
+        "intervalo_minutos": settings.VENCIMIENTO_INTERVALO_MIN,
+        "ultimo_barrido": VencimientoService.ultimo_reporte
+    }
+
+@app.get("/metrics/db")
+async def metricas_pool_db(admin=Depends(get_current_admin)):
+    """🏊 Estado de los pools de conexiones (en uso, libres, overflow, espera)"""
+    return {
+        "sync": estadisticas_pool(engine.pool),
+        "async": estadisticas_pool(async_engine.pool),
+        "config": {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING
+        }
+    }
+
 @app.get("/test-cloudinary")
 async def test_cloudinary():
     \"\"\"📸 Test Cloudinary Connection\"\"\"
@@ -451,11 +840,8 @@ async def test_full_system():
     
     # Test PostgreSQL
     try:
-        conn = psycopg2.connect(settings.DATABASE_URL)
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1;")
-        cursor.close()
-        conn.close()
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1;"))
         results["tests"]["postgresql"] = "✅ CONECTADO"
     except:
         results["tests"]["postgresql"] = "❌ ERROR"
@@ -3,9 +3,16 @@ from app.models.user import User
 from app.models.profile import Profile
 from app.models.raza_simple import Raza
 from app.models.gallo_simple import Gallo
+from app.models.gallo_ancestro import GalloAncestro
+from app.models.refresh_session import RefreshSession
 from app.models.suscripcion import Suscripcion
+from app.models.uso_cuota import UsoCuota
 from app.models.plan_catalogo import PlanCatalogo
+from app.models.catalogo_version import CatalogoVersion
 from app.models.pago_pendiente import PagoPendiente
+from app.models.comprobante_pago import ComprobantePago
+from app.models.clave_idempotencia import ClaveIdempotencia
+from app.models.subida import Subida
 from app.models.notificacion_admin import NotificacionAdmin
 from app.models.tope import Tope
 from app.models.pelea import Pelea
@@ -13,7 +20,8 @@ from app.models.vacuna import Vacuna
 from app.models.inversion import Inversion
 
 __all__ = [
-    "User", "Profile", "Raza", "Gallo", 
-    "Suscripcion", "PlanCatalogo", "PagoPendiente", "NotificacionAdmin",
-    "Tope", "Pelea", "Vacuna", "Inversion"
+    "User", "Profile", "RefreshSession", "Raza", "Gallo", "GalloAncestro",
+    "Suscripcion", "UsoCuota", "PlanCatalogo", "CatalogoVersion", "PagoPendiente",
+    "ComprobantePago", "ClaveIdempotencia", "Subida", "NotificacionAdmin", "Tope", "Pelea",
+    "Vacuna", "Inversion"
 ]
\ No newline at end of file
@@ -0,0 +1,18 @@
+# 🔢 app/models/catalogo_version.py - Versión de catálogos cacheados en memoria
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class CatalogoVersion(Base):
+    """Contador por catálogo: cada cambio lo incrementa y los procesos recargan su copia
+
+    Hoy solo existe la clave 'planes' (ver app/services/plan_registro.py).
+    """
+    __tablename__ = "catalogo_versiones"
+
+    clave = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<CatalogoVersion(clave='{self.clave}', version={self.version})>"
@@ -0,0 +1,26 @@
+# 🔁 app/models/clave_idempotencia.py - Respuestas guardadas por Idempotency-Key
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ClaveIdempotencia(Base):
+    """Primera respuesta de una petición con `Idempotency-Key`; los reintentos la reciben tal cual
+
+    Vive `IDEMPOTENCIA_TTL_HORAS`; la limpieza está en app/services/idempotencia_service.py.
+    """
+    __tablename__ = "claves_idempotencia"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    clave = Column(String(100), primary_key=True)
+    operacion = Column(String(50), nullable=False)  # p. ej. "crear_pago_qr"
+    huella = Column(String(64), nullable=False)  # sha256 del cuerpo: misma clave con otro cuerpo = error
+    respuesta = Column(JSON, nullable=False)
+    expira_en = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_claves_idempotencia_expira_en", "expira_en"),
+    )
+
+    def __repr__(self):
+        return f"<ClaveIdempotencia(user_id={self.user_id}, clave='{self.clave}', operacion='{self.operacion}')>"
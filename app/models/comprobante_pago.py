@@ -0,0 +1,28 @@
+# 🧾 app/models/comprobante_pago.py - Huella perceptual de capturas de pago
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ComprobantePago(Base):
+    """Huellas del comprobante subido para un pago
+
+    - `sha256`: bytes exactos. El mismo archivo en otro pago es un duplicado seguro.
+    - `dhash` (64 bits, 4 bandas de 16): solo para señalar capturas PARECIDAS a un
+      admin (`similar_a_pago_id`). Todas las capturas Yape usan la misma plantilla y
+      el mismo monto por plan: un dHash 9x8 no distingue el texto y no basta para rechazar.
+    """
+    __tablename__ = "comprobantes_pago"
+
+    pago_id = Column(Integer, ForeignKey("pagos_pendientes.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    sha256 = Column(String(64), nullable=True, index=True)  # NULL en comprobantes anteriores
+    dhash = Column(String(16), nullable=False)  # 64 bits en hexadecimal
+    banda_0 = Column(Integer, nullable=False, index=True)
+    banda_1 = Column(Integer, nullable=False, index=True)
+    banda_2 = Column(Integer, nullable=False, index=True)
+    banda_3 = Column(Integer, nullable=False, index=True)
+    similar_a_pago_id = Column(Integer, nullable=True)  # otro pago con captura parecida (revisar a mano)
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __repr__(self):
+        return f"<ComprobantePago(pago_id={self.pago_id}, dhash='{self.dhash}')>"
@@ -0,0 +1,23 @@
+# 🧬 app/models/gallo_ancestro.py - Tabla de cierre (closure) de ancestros
+from sqlalchemy import Column, Integer, ForeignKey, Index
+from app.database import Base
+
+class GalloAncestro(Base):
+    """Relación materializada ancestro → descendiente con su distancia en generaciones
+
+    Cada gallo tiene su propia fila (ancestro = descendiente, profundidad 0).
+    Si un ancestro llega por varias líneas a distinta profundidad, hay una fila por profundidad.
+    Se mantiene desde app/services/cierre_genealogico_service.py.
+    """
+    __tablename__ = "gallo_ancestros"
+
+    ancestro_id = Column(Integer, ForeignKey("gallos.id", ondelete="CASCADE"), primary_key=True)
+    descendiente_id = Column(Integer, ForeignKey("gallos.id", ondelete="CASCADE"), primary_key=True)
+    profundidad = Column(Integer, primary_key=True)  # 0 = el mismo gallo, 1 = padre/madre, 2 = abuelo...
+
+    __table_args__ = (
+        Index("ix_gallo_ancestros_descendiente", "descendiente_id", "ancestro_id"),
+    )
+
+    def __repr__(self):
+        return f"<GalloAncestro(ancestro={self.ancestro_id}, descendiente={self.descendiente_id}, profundidad={self.profundidad})>"
@@ -1,5 +1,5 @@
 # 🔥 app/models/gallo_simple.py - Modelo ÉPICO con Técnica Recursiva Genealógica
-from sqlalchemy import Column, Integer, String, Date, Numeric, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Date, Numeric, Text, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -41,6 +41,7 @@ class Gallo(Base):
     foto_principal_url = Column(Text, nullable=True)  # URL original
     url_foto_cloudinary = Column(Text, nullable=True)  # URL optimizada Cloudinary
     fotos_adicionales = Column(JSON, nullable=True)  # Array de URLs adicionales
+    fotos_variantes = Column(JSON, nullable=True)  # {"principal": PhotoUrls, "adicionales": [...]} precalculadas
     
     # ========================
     # 📋 CAMPOS ADICIONALES DETALLADOS
@@ -97,68 +98,36 @@ class Gallo(Base):
         overlaps="madre"
     )
     
+    # ========================
+    # 🔍 ÍNDICES DE BÚSQUEDA (keyset por usuario)
+    # ========================
+    __table_args__ = (
+        Index("ix_gallos_user_created", "user_id", "created_at", "id"),
+        Index("ix_gallos_user_nombre", "user_id", "nombre", "id"),
+        Index("ix_gallos_user_codigo", "user_id", "codigo_identificacion", "id"),
+    )
+    
     # ========================
     # 🛠️ MÉTODOS HELPER ÉPICOS
     # ========================
     
     def get_familia_completa(self, session):
         """🔥 Obtener toda la familia por id_gallo_genealogico"""
-        if not self.id_gallo_genealogico:
-            return [self]
-        
-        return session.query(Gallo).filter(
-            Gallo.id_gallo_genealogico == self.id_gallo_genealogico
-        ).all()
+        from app.services.genealogia_service import GenealogiaService  # Import local para evitar circular imports
+
+        return GenealogiaService.get_familia_completa(session, self)
     
     def get_ancestros(self, session, max_depth=5):
         """🌳 Obtener árbol genealógico hacia arriba (ancestros)"""
-        ancestros = []
-        nivel = 0
-        
-        def obtener_padres_recursivo(gallo, nivel_actual):
-            if nivel_actual >= max_depth:
-                return
-            
-            if gallo.padre:
-                ancestros.append({
-                    'gallo': gallo.padre,
-                    'relacion': 'padre',
-                    'nivel': nivel_actual + 1
-                })
-                obtener_padres_recursivo(gallo.padre, nivel_actual + 1)
-            
-            if gallo.madre:
-                ancestros.append({
-                    'gallo': gallo.madre,
-                    'relacion': 'madre', 
-                    'nivel': nivel_actual + 1
-                })
-                obtener_padres_recursivo(gallo.madre, nivel_actual + 1)
-        
-        obtener_padres_recursivo(self, nivel)
-        return ancestros
-    
-    def get_descendientes(self, session):
-        """👶 Obtener todos los descendientes (hijos)"""
-        descendientes = []
-        
-        # Hijos donde este gallo es padre
-        hijos_padre = session.query(Gallo).filter(Gallo.padre_id == self.id).all()
-        for hijo in hijos_padre:
-            descendientes.append({
-                'gallo': hijo,
-                'relacion': 'hijo_como_padre'
-            })
-        
-        # Hijos donde este gallo es madre
-        hijos_madre = session.query(Gallo).filter(Gallo.madre_id == self.id).all()
-        for hijo in hijos_madre:
-            descendientes.append({
-                'gallo': hijo,
-                'relacion': 'hijo_como_madre'
-            })
-        
-        return descendientes
+        from app.services.genealogia_service import GenealogiaService  # Import local para evitar circular imports
+
+        return GenealogiaService.get_ancestros(session, self, max_depth=max_depth)
+    
+    def get_descendientes(self, session, max_depth=1):
+        """👶 Obtener descendientes (por defecto solo hijos; max_depth=None = todas las generaciones)"""
+        from app.services.genealogia_service import GenealogiaService  # Import local para evitar circular imports
+
+        return GenealogiaService.get_descendientes(session, self, max_depth=max_depth)
     
     def __repr__(self):
         return f"<Gallo(id={self.id}, nombre='{self.nombre}', codigo='{self.codigo_identificacion}', genealogico={self.id_gallo_genealogico})>"
\ No newline at end of file
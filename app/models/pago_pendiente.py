@@ -1,5 +1,5 @@
 # 💳 Modelo de Pagos Pendientes - Sistema Yape
-from sqlalchemy import Column, Integer, String, DECIMAL, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DECIMAL, DateTime, Text, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -36,6 +36,7 @@ class PagoPendiente(Base):
     # QR y comprobantes
     qr_data = Column(Text)  # Data del QR generado
     qr_url = Column(Text)   # URL imagen QR en Cloudinary
+    qr_clave = Column(String(32), index=True)  # QRService.clave(qr_data): re-render de /qr/imagen/{clave}.png
     comprobante_url = Column(Text)  # Screenshot del pago
     
     # Estados y verificación
@@ -43,6 +44,7 @@ class PagoPendiente(Base):
     fecha_pago_usuario = Column(DateTime)  # Cuando user dice que pagó
     fecha_verificacion = Column(DateTime)  # Cuando admin verifica
     verificado_por = Column(Integer, ForeignKey("users.id"))
+    tomado_at = Column(DateTime)  # Cuando un admin lo reservó (la reserva vence, ver VerificacionPagosService)
     notas_admin = Column(Text)  # Comentarios del admin
     
     # Seguridad y tracking
@@ -58,6 +60,21 @@ class PagoPendiente(Base):
     usuario = relationship("User", foreign_keys=[user_id])
     verificador = relationship("User", foreign_keys=[verificado_por])
     
+    # Índice parcial: la cola de verificación solo recorre pagos por revisar, en orden de llegada
+    __table_args__ = (
+        Index(
+            "ix_pagos_pendientes_cola", "created_at", "id",
+            postgresql_where=text("estado IN ('pendiente', 'verificando')"),
+            sqlite_where=text("estado IN ('pendiente', 'verificando')"),
+        ),
+        # referencia_yape se guarda normalizada (ver ComprobanteService.normalizar_referencia)
+        Index(
+            "ux_pagos_pendientes_referencia_yape", "referencia_yape", unique=True,
+            postgresql_where=text("referencia_yape IS NOT NULL"),
+            sqlite_where=text("referencia_yape IS NOT NULL"),
+        ),
+    )
+    
     def __repr__(self):
         return f"<PagoPendiente(id={self.id}, user_id={self.user_id}, monto={self.monto}, estado='{self.estado}')>"
     
@@ -125,6 +142,7 @@ class PagoPendiente(Base):
             'fecha_pago_usuario': self.fecha_pago_usuario.isoformat() if self.fecha_pago_usuario else None,
             'fecha_verificacion': self.fecha_verificacion.isoformat() if self.fecha_verificacion else None,
             'verificado_por': self.verificado_por,
+            'tomado_at': self.tomado_at.isoformat() if self.tomado_at else None,
             'notas_admin': self.notas_admin,
             'intentos': self.intentos or 0,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -0,0 +1,33 @@
+# 🔄 app/models/refresh_session.py - Sesiones de refresh token (una por dispositivo)
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class RefreshSession(Base):
+    """Refresh token rotativo: cada uso crea una sesión nueva de la misma familia
+
+    Solo se guarda el SHA-256 del token. Si una sesión ya usada o revocada vuelve
+    a presentarse se asume robo y se revoca toda la familia (el dispositivo).
+    """
+    __tablename__ = "refresh_sessions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    familia_id = Column(String(36), nullable=False, index=True)  # uuid4, estable entre rotaciones
+    dispositivo = Column(String(255), nullable=True)
+    expira_en = Column(DateTime, nullable=False, index=True)
+    usado_en = Column(DateTime, nullable=True)  # rotada: ya no se acepta
+    revocado_en = Column(DateTime, nullable=True)  # logout, cambio de contraseña o reutilización
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ix_refresh_sessions_user_activas", "user_id", "revocado_en"),
+    )
+
+    @property
+    def vigente(self) -> bool:
+        return self.usado_en is None and self.revocado_en is None
+
+    def __repr__(self):
+        return f"<RefreshSession(id={self.id}, user_id={self.user_id}, familia={self.familia_id})>"
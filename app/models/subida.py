@@ -0,0 +1,63 @@
+# 📤 app/models/subida.py - Subidas de archivos en segundo plano
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+class EstadoSubida:
+    PENDIENTE = "pendiente"
+    SUBIENDO = "subiendo"
+    COMPLETADA = "completada"
+    FALLIDA = "fallida"
+    DESCARTADA = "descartada"  # el destino ya apunta a otro archivo (p. ej. un avatar más nuevo)
+
+class Subida(Base):
+    """Archivo en staging local esperando subirse al almacenamiento definitivo
+
+    Mientras no termina, `url_pendiente` (servida por /api/v1/subidas/{id}) devuelve
+    el archivo local; al completarse redirige a `url_final` y el destino
+    (`objetivo`/`objetivo_id`) se actualiza. Ver app/services/subida_service.py.
+    """
+    __tablename__ = "subidas"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    objetivo = Column(String(30), nullable=False)  # avatar, comprobante, ...
+    objetivo_id = Column(Integer, nullable=False)
+    carpeta = Column(String(100), nullable=False)
+    public_id = Column(String(150), nullable=False)
+    opciones = Column(JSON)  # parámetros extra para el backend (p. ej. transformaciones)
+    variantes = Column(JSON)  # ["large", "medium", ...]: se suben WebP redimensionados en vez del original
+    urls_variantes = Column(JSON)  # {"large": url, ...} al completarse
+    ruta_staging = Column(Text, nullable=False)
+    content_type = Column(String(100))  # según la extensión validada, nunca el enviado por el cliente
+    url_pendiente = Column(Text, nullable=False)
+    valores_anteriores = Column(JSON)  # {columna: valor} del destino antes de la subida: se restaura si falla
+    url_final = Column(Text)
+    estado = Column(String(20), nullable=False, default=EstadoSubida.PENDIENTE)
+    intentos = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_subidas_estado", "estado"),
+    )
+
+    def __repr__(self):
+        return f"<Subida(id='{self.id}', objetivo='{self.objetivo}', estado='{self.estado}')>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "objetivo": self.objetivo,
+            "objetivo_id": self.objetivo_id,
+            "estado": self.estado,
+            "url_pendiente": self.url_pendiente,
+            "url_final": self.url_final,
+            "urls_variantes": self.urls_variantes,
+            "intentos": self.intentos,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
@@ -1,5 +1,5 @@
 # 📋 Modelo de Suscripciones - Sistema Premium
-from sqlalchemy import Column, Integer, String, Date, DateTime, Numeric, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Numeric, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -38,6 +38,15 @@ class Suscripcion(Base):
     # Relaciones
     user = relationship("User", back_populates="suscripciones")
     
+    # Índice parcial: resolver el plan vigente solo recorre suscripciones activas
+    __table_args__ = (
+        Index(
+            "ix_suscripciones_user_activas", "user_id", "created_at",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+    )
+    
     def __repr__(self):
         return f"<Suscripcion(id={self.id}, user_id={self.user_id}, plan={self.plan_type}, status={self.status})>"
     
@@ -0,0 +1,24 @@
+# 📊 app/models/uso_cuota.py - Contadores de uso para los límites del plan
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+# gallo_id = 0 → contador a nivel usuario (gallos); > 0 → contador por gallo (topes, peleas, vacunas)
+NIVEL_USUARIO = 0
+
+class UsoCuota(Base):
+    """Cantidad de registros por usuario/recurso/gallo, mantenida en la misma transacción que los inserts
+
+    Se actualiza desde app/services/cuota_service.py y se puede recalcular completo
+    con `python -m app.services.cuota_service`.
+    """
+    __tablename__ = "uso_cuotas"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    recurso = Column(String(20), primary_key=True)  # gallos, topes, peleas, vacunas
+    gallo_id = Column(Integer, primary_key=True, default=NIVEL_USUARIO)
+    cantidad = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<UsoCuota(user_id={self.user_id}, recurso={self.recurso}, gallo_id={self.gallo_id}, cantidad={self.cantidad})>"
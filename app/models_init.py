@@ -11,10 +11,12 @@ from app.database import Base
 from app.models.user import User
 from app.models.raza_simple import Raza
 from app.models.fcm_token import FCMToken
+from app.models.refresh_session import RefreshSession
 
 # Importar modelos que dependen de otros (después)
 from app.models.profile import Profile
 from app.models.gallo_simple import Gallo
+from app.models.gallo_ancestro import GalloAncestro
 # from app.models.vacuna import Vacuna  # TEMPORALMENTE COMENTADO
 from app.models.pelea import Pelea
 from app.models.tope import Tope
@@ -26,7 +28,9 @@ __all__ = [
     "Profile",
     "Raza",
     "Gallo",
+    "GalloAncestro",
     "FCMToken",
+    "RefreshSession",
     # "Vacuna"  # TEMPORALMENTE COMENTADO
     "Pelea",
     "Tope"
@@ -44,7 +48,9 @@ def get_all_models():
         'Profile': Profile, 
         'Raza': Raza,
         'Gallo': Gallo,
+        'GalloAncestro': GalloAncestro,
         'FCMToken': FCMToken,
+        'RefreshSession': RefreshSession,
         # 'Vacuna': Vacuna  # TEMPORALMENTE COMENTADO
         'Pelea': Pelea,
         'Tope': Tope
@@ -36,6 +36,11 @@ class PhotoUrls(BaseModel):
     large: Optional[str] = None
     optimized: Optional[str] = None
 
+class FotosVariantes(BaseModel):
+    """📸 Variantes precalculadas al subir/guardar (Gallo.fotos_variantes)"""
+    principal: Optional[PhotoUrls] = None
+    adicionales: List[PhotoUrls] = []
+
 # ========================
 # 🐓 SCHEMAS DE GALLO
 # ========================
@@ -135,15 +140,27 @@ class GalloSimple(BaseModel):
     estado: str
     foto_principal_url: Optional[str] = None
     url_foto_cloudinary: Optional[str] = None
+    fotos_variantes: Optional[FotosVariantes] = None
     tipo_registro: str
     id_gallo_genealogico: Optional[int] = None
     padre_id: Optional[int] = None
     madre_id: Optional[int] = None
-    created_at: datetime
+    created_at: Optional[datetime] = None  # filas antiguas sin fecha
     
     class Config:
         from_attributes = True
 
+class GalloResumen(BaseModel):
+    """🧬 Resumen compacto de un progenitor (padre, madre o abuelos)"""
+    id: int
+    nombre: str
+    codigo_identificacion: str
+    color: Optional[str] = None
+    estado: Optional[str] = None
+    foto_principal_url: Optional[str] = None
+    padre: Optional["GalloResumen"] = None
+    madre: Optional["GalloResumen"] = None
+
 class GalloResponse(BaseModel):
     """📋 Schema de respuesta para gallo"""
     success: bool = True
@@ -176,9 +193,28 @@ class GalloSearchParams(BaseModel):
     tiene_foto: Optional[bool] = None
     tiene_padres: Optional[bool] = None
     created_after: Optional[date] = None
+    descendiente_de: Optional[int] = Field(None, description="Solo gallos que descienden de este gallo")
+    ancestro_de: Optional[int] = Field(None, description="Solo gallos que son ancestros de este gallo")
     sort_by: str = Field(default="created_at")
     sort_order: str = Field(default="desc", pattern="^(asc|desc)$")
     include_genealogy: bool = Field(default=False)
+    genealogy_depth: int = Field(default=1, ge=1, le=2, description="1 = padres, 2 = padres y abuelos")
+    cursor: Optional[str] = Field(None, description="Cursor opaco devuelto como next_cursor")
+
+    @validator('sort_by')
+    def validate_sort_by(cls, v):
+        campos_validos = ['created_at', 'nombre', 'codigo_identificacion', 'id']
+        if v not in campos_validos:
+            raise ValueError(f"sort_by debe ser uno de: {', '.join(campos_validos)}")
+        return v
+
+class GalloBusquedaResponse(BaseModel):
+    """🔍 Página de resultados con cursor para la siguiente"""
+    success: bool = True
+    data: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+    message: str = "Búsqueda completada"
 
 # ========================
 # ✅ SCHEMAS DE RESPUESTA
@@ -195,4 +231,28 @@ class ErrorResponse(BaseModel):
     success: bool = False
     error: str
     detail: Optional[str] = None
-    error_code: Optional[str] = None
\ No newline at end of file
+    error_code: Optional[str] = None
+# ========================
+# 📥 SCHEMAS DE IMPORTACIÓN MASIVA
+# ========================
+
+class GalloImportacionRequest(BaseModel):
+    """📥 Importación masiva de gallos (cada fila se valida como GalloCreate)"""
+    gallos: List[Dict[str, Any]] = Field(..., min_length=1, max_length=1000)
+    todo_o_nada: bool = Field(default=False, description="Si hay errores no se importa ninguna fila")
+
+class ErrorFilaImportacion(BaseModel):
+    """❌ Error de una fila de la importación"""
+    fila: int
+    codigo_identificacion: Optional[str] = None
+    error: str
+
+class GalloImportacionResponse(BaseModel):
+    """📥 Resultado de la importación masiva"""
+    success: bool = True
+    total_filas: int
+    creados: int
+    padres_generados: int = 0
+    errores: List[ErrorFilaImportacion] = []
+    gallos: List[Dict[str, Any]] = []
+    message: str = "Importación completada"
@@ -36,6 +36,11 @@ class PagoCreate(PagoBase):
     """Schema para crear pago"""
     referencia_yape: Optional[str] = Field(None, max_length=100, description="Número de operación Yape")
     
+class PagoQRCreate(BaseModel):
+    """Schema para iniciar un pago con QR (el monto sale del catálogo de planes)"""
+    plan_codigo: str = Field(..., min_length=3, max_length=20, description="Código del plan")
+    metodo_pago: MetodoPago = Field(default=MetodoPago.YAPE, description="Método de pago")
+
 class PagoResponse(PagoBase):
     """Schema de respuesta para pago"""
     id: int
@@ -90,4 +95,22 @@ class QRYapeResponse(BaseModel):
     class Config:
         json_encoders = {
             Decimal: float
-        }
\ No newline at end of file
+        }
+class AccionVerificacion(str, Enum):
+    """Acciones de la verificación por lotes"""
+    APROBAR = "aprobar"
+    RECHAZAR = "rechazar"
+
+class VerificacionLoteRequest(BaseModel):
+    """Schema para aprobar/rechazar varios pagos a la vez"""
+    pago_ids: List[int] = Field(..., min_items=1, max_items=500, description="IDs de pagos a resolver")
+    accion: AccionVerificacion
+    notas: Optional[str] = Field(None, max_length=1000, description="Comentario del admin para todos los pagos")
+
+class VerificacionLoteResponse(BaseModel):
+    """Schema de respuesta de la verificación por lotes"""
+    success: bool = True
+    procesados: List[int]
+    omitidos: List[int] = Field(default_factory=list, description="Ya resueltos o reservados por otro admin")
+    sin_plan: List[int] = Field(default_factory=list, description="Plan fuera del catálogo: siguen en la cola")
+    suscripciones_activadas: int = 0
@@ -0,0 +1,86 @@
+# 🗄️ app/services/almacenamiento.py - Backends de almacenamiento de archivos subidos
+"""
+El pipeline de subidas (app/services/subida_service.py) no conoce Cloudinary:
+llama `obtener_almacenamiento().subir(...)`.
+
+- `cloudinary` (producción): sube con el SDK (bloqueante; corre en los workers).
+- `local` (desarrollo/pruebas): copia a `SUBIDAS_LOCAL_DIR` y sirve desde
+  `SUBIDAS_LOCAL_URL` (main.py monta ese directorio como estático).
+
+Se elige con `ALMACENAMIENTO_BACKEND`.
+"""
+import os
+import shutil
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+class Almacenamiento:
+    """Interfaz: guardar un archivo local con (carpeta, public_id) y devolver su URL pública"""
+
+    nombre = "base"
+
+    def subir(self, ruta: str, carpeta: str, public_id: str, opciones: Optional[Dict[str, Any]] = None) -> str:
+        raise NotImplementedError
+
+
+class AlmacenamientoCloudinary(Almacenamiento):
+    nombre = "cloudinary"
+
+    def __init__(self):
+        import cloudinary
+
+        cloudinary.config(
+            cloud_name=settings.CLOUDINARY_CLOUD_NAME,
+            api_key=settings.CLOUDINARY_API_KEY,
+            api_secret=settings.CLOUDINARY_API_SECRET
+        )
+
+    def subir(self, ruta: str, carpeta: str, public_id: str, opciones: Optional[Dict[str, Any]] = None) -> str:
+        import cloudinary.uploader
+
+        parametros = {"overwrite": True, **(opciones or {})}
+        resultado = cloudinary.uploader.upload(ruta, folder=carpeta, public_id=public_id, **parametros)
+        return resultado["secure_url"]
+
+
+class AlmacenamientoLocal(Almacenamiento):
+    nombre = "local"
+
+    def __init__(self, directorio: str, url_base: str):
+        self.directorio = directorio
+        self.url_base = url_base.rstrip("/")
+
+    def subir(self, ruta: str, carpeta: str, public_id: str, opciones: Optional[Dict[str, Any]] = None) -> str:
+        extension = os.path.splitext(ruta)[1]
+        relativa = os.path.join(carpeta, f"{public_id}{extension}")
+        destino = os.path.join(self.directorio, relativa)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporal = f"{destino}.{os.getpid()}.tmp"
+        shutil.copyfile(ruta, temporal)
+        os.replace(temporal, destino)
+        return f"{self.url_base}/{relativa.replace(os.sep, '/')}"
+
+
+_BACKENDS = {
+    "cloudinary": lambda: AlmacenamientoCloudinary(),
+    "local": lambda: AlmacenamientoLocal(settings.SUBIDAS_LOCAL_DIR, settings.SUBIDAS_LOCAL_URL),
+}
+_actual: Optional[Almacenamiento] = None
+
+
+def obtener_almacenamiento() -> Almacenamiento:
+    global _actual
+    if _actual is None:
+        fabrica = _BACKENDS.get(settings.ALMACENAMIENTO_BACKEND)
+        if fabrica is None:
+            raise ValueError(f"ALMACENAMIENTO_BACKEND desconocido: {settings.ALMACENAMIENTO_BACKEND}")
+        _actual = fabrica()
+    return _actual
+
+
+def configurar_almacenamiento(almacenamiento: Almacenamiento):
+    """Reemplazar el backend (p. ej. un directorio temporal en pruebas)"""
+    global _actual
+    _actual = almacenamiento
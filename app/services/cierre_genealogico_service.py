@@ -0,0 +1,245 @@
+# 🧬 app/services/cierre_genealogico_service.py - Mantenimiento de la tabla de cierre de ancestros
+"""
+Mantiene `gallo_ancestros` (ancestro_id, descendiente_id, profundidad) en
+sincronía con padre_id/madre_id para que "¿es X ancestro de Y?" o "todos los
+descendientes de X" sean un JOIN indexado en lugar de un recorrido recursivo.
+
+- Incremental: al hacer flush de un Gallo nuevo, eliminado o con padre/madre
+  cambiados se recalcula solo ese gallo y su subárbol.
+- Reconstrucción completa: `python -m app.services.cierre_genealogico_service`
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, select, insert, delete, union, literal, or_, inspect, func, Integer
+from sqlalchemy.orm import Session, aliased
+
+from app.models.gallo_simple import Gallo
+from app.models.gallo_ancestro import GalloAncestro
+from app.services.genealogia_service import MAX_GENERACIONES
+
+cierre = GalloAncestro.__table__
+
+_ATRIBUTOS_GENEALOGICOS = ("padre_id", "madre_id", "padre", "madre")
+
+
+class CierreGenealogicoService:
+    # Se activa en el arranque una vez verificada la tabla (ver inicializar)
+    activo = False
+
+    # ========================
+    # 🔍 CONSULTAS DE LINAJE
+    # ========================
+
+    @staticmethod
+    def filtro_descendientes_de(ancestro_id: int):
+        """Condición para filtrar gallos que descienden de `ancestro_id`"""
+        return Gallo.id.in_(
+            select(cierre.c.descendiente_id).where(
+                cierre.c.ancestro_id == ancestro_id,
+                cierre.c.profundidad > 0,
+            )
+        )
+
+    @staticmethod
+    def filtro_ancestros_de(descendiente_id: int):
+        """Condición para filtrar gallos que son ancestros de `descendiente_id`"""
+        return Gallo.id.in_(
+            select(cierre.c.ancestro_id).where(
+                cierre.c.descendiente_id == descendiente_id,
+                cierre.c.profundidad > 0,
+            )
+        )
+
+    # ========================
+    # 🔄 MANTENIMIENTO INCREMENTAL
+    # ========================
+
+    @staticmethod
+    def hijos_de(conn, gallo_ids: Iterable[int]) -> set:
+        """Hijos directos según el cierre (consultar ANTES de borrar: el FK en cascada se lleva las filas)"""
+        gallo_ids = set(gallo_ids)
+        if not gallo_ids:
+            return set()
+        return set(conn.execute(
+            select(cierre.c.descendiente_id).where(
+                cierre.c.ancestro_id.in_(gallo_ids),
+                cierre.c.profundidad == 1,
+            )
+        ).scalars())
+
+    @staticmethod
+    def aplicar_cambios(conn, raices: Iterable[int], eliminados: Iterable[int] = ()):
+        """Recalcular el cierre de `raices` y sus descendientes; borrar el de `eliminados`
+
+        Con gallos ya borrados, `raices` debe incluir sus hijos (`hijos_de` antes del DELETE).
+        """
+        raices = set(raices)
+        eliminados = set(eliminados)
+
+        if eliminados:
+            # Los hijos de un gallo eliminado pierden esa línea de ancestros
+            raices.update(CierreGenealogicoService.hijos_de(conn, eliminados))
+            conn.execute(delete(cierre).where(or_(
+                cierre.c.ancestro_id.in_(eliminados),
+                cierre.c.descendiente_id.in_(eliminados),
+            )))
+
+        raices -= eliminados
+        if not raices:
+            return
+
+        afectados = set(raices)
+        afectados.update(conn.execute(
+            select(cierre.c.descendiente_id).where(
+                cierre.c.ancestro_id.in_(raices),
+                cierre.c.profundidad > 0,
+            ).distinct()
+        ).scalars())
+        afectados -= eliminados
+
+        filas = conn.execute(
+            select(Gallo.id, Gallo.padre_id, Gallo.madre_id).where(Gallo.id.in_(afectados))
+        ).all()
+
+        conn.execute(delete(cierre).where(cierre.c.descendiente_id.in_(afectados)))
+        for gallo_id, padre_id, madre_id in CierreGenealogicoService._orden_topologico(filas):
+            CierreGenealogicoService._insertar_gallo(conn, gallo_id, padre_id, madre_id)
+
+    @staticmethod
+    def _orden_topologico(filas: List[Tuple[int, Optional[int], Optional[int]]]):
+        """Padres antes que hijos (los gallos en un ciclo se omiten)"""
+        por_id = {f[0]: f for f in filas}
+        pendientes: Dict[int, int] = {}
+        hijos: Dict[int, List[int]] = {}
+        for gallo_id, padre_id, madre_id in filas:
+            progenitores = {p for p in (padre_id, madre_id) if p in por_id}
+            pendientes[gallo_id] = len(progenitores)
+            for progenitor_id in progenitores:
+                hijos.setdefault(progenitor_id, []).append(gallo_id)
+
+        listos = [g for g, n in pendientes.items() if n == 0]
+        while listos:
+            gallo_id = listos.pop()
+            yield por_id[gallo_id]
+            for hijo_id in hijos.get(gallo_id, ()):
+                pendientes[hijo_id] -= 1
+                if pendientes[hijo_id] == 0:
+                    listos.append(hijo_id)
+
+    @staticmethod
+    def _insertar_gallo(conn, gallo_id: int, padre_id: Optional[int], madre_id: Optional[int]):
+        """Fila propia + ancestros de padre y madre desplazados una generación"""
+        propia = select(
+            literal(gallo_id, Integer), literal(gallo_id, Integer), literal(0, Integer)
+        )
+        progenitores = [p for p in (padre_id, madre_id) if p is not None]
+        if progenitores:
+            heredadas = select(
+                cierre.c.ancestro_id, literal(gallo_id, Integer), cierre.c.profundidad + 1
+            ).where(
+                cierre.c.descendiente_id.in_(progenitores),
+                cierre.c.profundidad < MAX_GENERACIONES,
+            )
+            origen = union(propia, heredadas)
+        else:
+            origen = propia
+
+        conn.execute(
+            insert(cierre).from_select(["ancestro_id", "descendiente_id", "profundidad"], origen)
+        )
+
+    # ========================
+    # 🏗️ RECONSTRUCCIÓN COMPLETA
+    # ========================
+
+    @staticmethod
+    def reconstruir(conn) -> int:
+        """Regenerar toda la tabla con una sola consulta recursiva; devuelve filas creadas"""
+        cierre.create(bind=conn, checkfirst=True)
+        conn.execute(delete(cierre))
+
+        recorrido = select(
+            Gallo.id.label("ancestro_id"),
+            Gallo.id.label("descendiente_id"),
+            literal(0, Integer).label("profundidad"),
+        ).cte("recorrido", recursive=True)
+
+        hijo = aliased(Gallo, name="hijo")
+        recorrido = recorrido.union(
+            select(recorrido.c.ancestro_id, hijo.id, recorrido.c.profundidad + 1)
+            .join(hijo, or_(
+                hijo.padre_id == recorrido.c.descendiente_id,
+                hijo.madre_id == recorrido.c.descendiente_id,
+            ))
+            .where(recorrido.c.profundidad < MAX_GENERACIONES)
+        )
+
+        conn.execute(insert(cierre).from_select(
+            ["ancestro_id", "descendiente_id", "profundidad"],
+            select(recorrido.c.ancestro_id, recorrido.c.descendiente_id, recorrido.c.profundidad),
+        ))
+        return conn.execute(select(func.count()).select_from(cierre)).scalar()
+
+    @staticmethod
+    def inicializar(engine):
+        """Crear la tabla si falta (reconstruyéndola) y activar el mantenimiento incremental"""
+        with engine.begin() as conn:
+            if not inspect(conn).has_table(cierre.name):
+                total = CierreGenealogicoService.reconstruir(conn)
+                print(f"✅ Tabla {cierre.name} creada con {total} filas")
+        CierreGenealogicoService.activo = True
+
+
+# ========================
+# 🔔 EVENTOS DE SESIÓN
+# ========================
+
+def _cambio_genealogico(gallo: Gallo) -> bool:
+    estado = inspect(gallo)
+    return any(estado.attrs[attr].history.has_changes() for attr in _ATRIBUTOS_GENEALOGICOS)
+
+
+def _registrar_pendientes(session, flush_context, instances):
+    if not CierreGenealogicoService.activo:
+        return
+    pendientes = session.info.setdefault(
+        "cierre_pendientes", {"recalcular": set(), "eliminados": set(), "hijos": set()}
+    )
+    for obj in session.new:
+        if isinstance(obj, Gallo):
+            pendientes["recalcular"].add(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Gallo) and _cambio_genealogico(obj):
+            pendientes["recalcular"].add(obj)
+    eliminados = {obj.id for obj in session.deleted if isinstance(obj, Gallo) and obj.id is not None}
+    if eliminados:
+        pendientes["eliminados"].update(eliminados)
+        # Ahora, mientras existen: en after_flush el ON DELETE CASCADE ya borró esas filas del cierre
+        pendientes["hijos"].update(CierreGenealogicoService.hijos_de(session.connection(), eliminados))
+
+
+def _aplicar_pendientes(session, flush_context):
+    pendientes = session.info.pop("cierre_pendientes", None)
+    if not pendientes or not CierreGenealogicoService.activo:
+        return
+    # Los ids y los padre_id de post_update ya están en la BD en este punto
+    raices = {obj.id for obj in pendientes["recalcular"] if obj.id is not None} | pendientes["hijos"]
+    CierreGenealogicoService.aplicar_cambios(session.connection(), raices, pendientes["eliminados"])
+
+
+def _descartar_pendientes(session, previous_transaction):
+    session.info.pop("cierre_pendientes", None)
+
+
+event.listen(Session, "before_flush", _registrar_pendientes)
+event.listen(Session, "after_flush", _aplicar_pendientes)
+event.listen(Session, "after_soft_rollback", _descartar_pendientes)
+
+
+if __name__ == "__main__":
+    from app.database import engine
+    import app.models  # noqa: F401 - registrar todos los modelos
+
+    with engine.begin() as conn:
+        total = CierreGenealogicoService.reconstruir(conn)
+    print(f"✅ Tabla de cierre genealógico reconstruida: {total} filas")
@@ -0,0 +1,260 @@
+# 🧾 app/services/comprobante_service.py - Comprobantes de pago sin duplicados
+"""
+Evita que un mismo pago Yape entre dos veces a la cola de verificación:
+
+- `referencia_yape` se guarda normalizada (solo dígitos/letras, en mayúsculas)
+  y un índice único parcial impide repetirla entre pagos.
+- El mismo archivo (sha256) en OTRO pago se rechaza; en el mismo pago es un
+  reintento sin efecto.
+- Una captura parecida (dHash) a la de otro pago NO se rechaza: las capturas Yape
+  comparten plantilla y monto, y pagadores distintos dan distancia 0. Solo se
+  marca `similar_a_pago_id` para que el admin lo revise en la cola.
+"""
+import hashlib
+import io
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy import select, update, bindparam, or_, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.exceptions import ConflictException, NotFoundException, ValidationException
+from app.models.pago_pendiente import PagoPendiente, EstadoPago
+from app.models.comprobante_pago import ComprobantePago
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9A-Za-z]")
+ESTADOS_EDITABLES = (EstadoPago.PENDIENTE.value,)
+
+
+class ComprobanteService:
+
+    # ========================
+    # 🔢 REFERENCIA YAPE
+    # ========================
+
+    @staticmethod
+    def normalizar_referencia(referencia: Optional[str]) -> Optional[str]:
+        """'  0012-345 678 ' → '0012345678' (None si queda vacía)"""
+        if referencia is None:
+            return None
+        normalizada = _NO_ALFANUMERICO.sub("", referencia).upper()
+        return normalizada or None
+
+    # ========================
+    # 🖼️ HUELLA PERCEPTUAL
+    # ========================
+
+    @staticmethod
+    def dhash(contenido: bytes) -> int:
+        """dHash de 64 bits: compara cada píxel con su vecino derecho en una miniatura 9x8 gris"""
+        try:
+            imagen = Image.open(io.BytesIO(contenido))
+            imagen.draft("L", (64, 64))  # JPEG: decodificar directo a baja resolución
+            miniatura = imagen.convert("L").resize((9, 8), Image.LANCZOS)
+        except (UnidentifiedImageError, OSError):
+            raise ValidationException("El comprobante debe ser una imagen (JPG, PNG o WebP)")
+        pixeles = list(miniatura.getdata())
+        valor = 0
+        for fila in range(8):
+            for columna in range(8):
+                izquierda = pixeles[fila * 9 + columna]
+                derecha = pixeles[fila * 9 + columna + 1]
+                valor = (valor << 1) | (1 if izquierda > derecha else 0)
+        return valor
+
+    @staticmethod
+    def bandas(valor: int) -> Tuple[int, int, int, int]:
+        return tuple((valor >> (16 * i)) & 0xFFFF for i in range(4))
+
+    @staticmethod
+    def buscar_similar(db: Session, valor: int, excluir_pago_id: int) -> Optional[Tuple[int, int]]:
+        """(pago_id, distancia) del comprobante más parecido de otro pago (solo aviso, no rechazo)"""
+        b0, b1, b2, b3 = ComprobanteService.bandas(valor)
+        candidatos = db.execute(
+            select(ComprobantePago.pago_id, ComprobantePago.dhash).where(
+                or_(
+                    ComprobantePago.banda_0 == b0,
+                    ComprobantePago.banda_1 == b1,
+                    ComprobantePago.banda_2 == b2,
+                    ComprobantePago.banda_3 == b3,
+                ),
+                ComprobantePago.pago_id != excluir_pago_id,
+            )
+        ).all()
+        mejor = None
+        for pago_id, huella in candidatos:
+            distancia = bin(valor ^ int(huella, 16)).count("1")
+            if distancia <= settings.COMPROBANTE_DISTANCIA_MAX and (mejor is None or distancia < mejor[1]):
+                mejor = (pago_id, distancia)
+        return mejor
+
+    # ========================
+    # 📤 REGISTRO DEL COMPROBANTE
+    # ========================
+
+    @staticmethod
+    def preparar(db: Session, user_id: int, pago_id: int, contenido: bytes,
+                 referencia: Optional[str]) -> Dict[str, Any]:
+        """Validar pago, referencia y duplicados ANTES de subir la imagen
+
+        Devuelve {"pago", "sha256", "dhash", "referencia", "reintento", "similar_a"};
+        `reintento` indica que este mismo archivo ya está registrado para este pago
+        (no hay que subir nada).
+        """
+        if len(contenido) > settings.COMPROBANTE_MAX_MB * 1024 * 1024:
+            raise ValidationException(f"El comprobante no puede superar {settings.COMPROBANTE_MAX_MB} MB")
+
+        pago = db.execute(
+            select(PagoPendiente).where(PagoPendiente.id == pago_id, PagoPendiente.user_id == user_id)
+        ).scalars().first()
+        if pago is None:
+            raise NotFoundException("Pago no encontrado")
+
+        referencia = ComprobanteService.normalizar_referencia(referencia)
+        if referencia and referencia != pago.referencia_yape:
+            otro = db.execute(
+                select(PagoPendiente.id).where(
+                    PagoPendiente.referencia_yape == referencia, PagoPendiente.id != pago.id
+                )
+            ).scalar()
+            if otro is not None:
+                raise ConflictException("Ese número de operación Yape ya fue registrado en otro pago")
+
+        exacta = hashlib.sha256(contenido).hexdigest()
+        valor = ComprobanteService.dhash(contenido)
+        huella = f"{valor:016x}"
+        datos = {"pago": pago, "sha256": exacta, "dhash": huella, "referencia": referencia,
+                 "reintento": False, "similar_a": None}
+
+        actual = db.get(ComprobantePago, pago.id)
+        if actual is None:
+            mismo_archivo = False
+        elif actual.sha256:
+            mismo_archivo = actual.sha256 == exacta
+        else:
+            mismo_archivo = actual.dhash == huella  # comprobantes anteriores, sin sha256
+        if mismo_archivo and (referencia is None or referencia == pago.referencia_yape):
+            return {**datos, "reintento": True}
+
+        if pago.estado not in ESTADOS_EDITABLES:
+            raise ValidationException(f"El pago ya está en estado '{pago.estado}'")
+
+        otro = db.execute(
+            select(ComprobantePago.pago_id).where(
+                ComprobantePago.sha256 == exacta, ComprobantePago.pago_id != pago.id
+            ).limit(1)
+        ).scalar()
+        if otro is not None:
+            raise ConflictException("Este comprobante ya fue enviado para otro pago", detail=f"pago_id={otro}")
+
+        similar = ComprobanteService.buscar_similar(db, valor, pago.id)
+        datos["similar_a"] = similar[0] if similar else None
+        return datos
+
+    @staticmethod
+    def registrar(db: Session, pago: PagoPendiente, huella: str, referencia: Optional[str],
+                  comprobante_url: str, sha256: Optional[str] = None,
+                  similar_a: Optional[int] = None) -> PagoPendiente:
+        """Guardar URL, referencia y huellas del comprobante en una transacción"""
+        valor = int(huella, 16)
+        b0, b1, b2, b3 = ComprobanteService.bandas(valor)
+
+        pago.comprobante_url = comprobante_url
+        if referencia:
+            pago.referencia_yape = referencia
+        pago.fecha_pago_usuario = datetime.utcnow()
+        pago.intentos = (pago.intentos or 0) + 1
+        db.merge(ComprobantePago(
+            pago_id=pago.id, user_id=pago.user_id, sha256=sha256, dhash=huella,
+            banda_0=b0, banda_1=b1, banda_2=b2, banda_3=b3, similar_a_pago_id=similar_a,
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otra petición registró la misma referencia entre la validación y el commit
+            db.rollback()
+            raise ConflictException("Ese número de operación Yape ya fue registrado en otro pago")
+        db.refresh(pago)
+        return pago
+
+    # ========================
+    # 🏗️ TABLAS E ÍNDICES
+    # ========================
+
+    @staticmethod
+    def _agregar_columnas_faltantes(conn):
+        """Sin migraciones: columnas nuevas (todas admiten NULL) con ALTER TABLE, más sus índices"""
+        tabla = ComprobantePago.__table__
+        existentes = {c["name"] for c in inspect(conn).get_columns(tabla.name)}
+        for columna in tabla.columns:
+            if columna.name not in existentes:
+                tipo = columna.type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}"))
+                print(f"✅ Columna {tabla.name}.{columna.name} agregada")
+        for indice in tabla.indexes:
+            indice.create(bind=conn, checkfirst=True)
+
+    @staticmethod
+    def normalizar_existentes(conn) -> Dict[str, List[int]]:
+        """Normalizar `referencia_yape` de pagos anteriores → {referencia: [pago_ids]} que chocan
+
+        Los que al normalizarse coinciden con otro pago se dejan como están (un admin
+        decide): así el índice único se construye sobre valores normalizados.
+        """
+        filas = conn.execute(
+            select(PagoPendiente.id, PagoPendiente.referencia_yape)
+            .where(PagoPendiente.referencia_yape.isnot(None))
+        ).all()
+        grupos: Dict[Optional[str], List[Tuple[int, str]]] = {}
+        for pago_id, referencia in filas:
+            grupos.setdefault(ComprobanteService.normalizar_referencia(referencia), []).append((pago_id, referencia))
+
+        cambios = [
+            {"b_id": pago_id, "b_referencia": normalizada}
+            for normalizada, pagos in grupos.items() if len(pagos) == 1
+            for pago_id, referencia in pagos if referencia != normalizada
+        ]
+        if cambios:
+            tabla = PagoPendiente.__table__
+            conn.execute(
+                update(tabla).where(tabla.c.id == bindparam("b_id")).values(referencia_yape=bindparam("b_referencia")),
+                cambios,
+            )
+            print(f"✅ Referencias Yape normalizadas: {len(cambios)}")
+        return {
+            normalizada: [pago_id for pago_id, _ in pagos]
+            for normalizada, pagos in grupos.items() if len(pagos) > 1 and normalizada is not None
+        }
+
+    @staticmethod
+    def inicializar(engine):
+        """Crear la tabla de huellas, normalizar referencias y crear su índice único (si los datos lo permiten)"""
+        with engine.begin() as conn:
+            if not inspect(conn).has_table(ComprobantePago.__tablename__):
+                ComprobantePago.__table__.create(bind=conn)
+                print(f"✅ Tabla {ComprobantePago.__tablename__} creada")
+            else:
+                ComprobanteService._agregar_columnas_faltantes(conn)
+
+        with engine.begin() as conn:
+            repetidas = ComprobanteService.normalizar_existentes(conn)
+        if repetidas:
+            print(f"⚠️ Referencias Yape repetidas tras normalizar (pago_ids): {dict(list(repetidas.items())[:20])}")
+
+        for indice in PagoPendiente.__table__.indexes:
+            if not indice.unique:
+                continue
+            try:
+                with engine.begin() as conn:
+                    indice.create(bind=conn, checkfirst=True)
+            except Exception:
+                with engine.connect() as conn:
+                    repetidas = conn.execute(text(
+                        "SELECT referencia_yape, COUNT(*) FROM pagos_pendientes "
+                        "WHERE referencia_yape IS NOT NULL GROUP BY referencia_yape HAVING COUNT(*) > 1 LIMIT 20"
+                    )).all()
+                print(f"⚠️ No se pudo crear {indice.name}: referencias repetidas {repetidas}")
@@ -0,0 +1,176 @@
+# 🧬 app/services/consanguinidad_service.py - Coeficiente de consanguinidad de Wright
+"""
+Calcula el coeficiente de consanguinidad (Wright) y los ancestros comunes de un
+gallo o de un cruce propuesto padre × madre, enumerando caminos sobre el grafo
+genealógico precargado del usuario (`genealogia_cache`). Los caminos y los
+coeficientes de cada ancestro se memoizan, así un reporte de todo el plantel
+no vuelve a tocar la BD por cada camino.
+
+F_X = Σ (1/2)^(n1 + n2 + 1) · (1 + F_A)
+
+sumando sobre cada ancestro común A y cada par de caminos padre→A / madre→A
+que no comparten otro gallo salvo A.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.gallo_simple import Gallo
+from app.services.genealogia_cache import genealogia_cache, GrafoGenealogico
+
+# Generaciones que se recorren hacia arriba (5 = tatarabuelos de los padres)
+MAX_GENERACIONES_CONSANGUINIDAD = 6
+
+Camino = Tuple[int, ...]
+
+
+class AnalizadorConsanguinidad:
+    """🧮 Cálculo memoizado sobre un grafo genealógico en memoria"""
+
+    def __init__(self, grafo: GrafoGenealogico, max_generaciones: int = MAX_GENERACIONES_CONSANGUINIDAD):
+        self.grafo = grafo
+        self.max_generaciones = max_generaciones
+        self._caminos: Dict[Tuple[int, int], Dict[int, List[Camino]]] = {}
+        self._coeficientes: Dict[int, float] = {}
+
+    def caminos(self, gallo_id: int, generaciones: Optional[int] = None) -> Dict[int, List[Camino]]:
+        """{ancestro_id: [caminos]} desde el gallo (incluido) hasta cada ancestro"""
+        if generaciones is None:
+            generaciones = self.max_generaciones
+        clave = (gallo_id, generaciones)
+        if clave in self._caminos:
+            return self._caminos[clave]
+
+        resultado: Dict[int, List[Camino]] = {gallo_id: [(gallo_id,)]}
+        if generaciones > 0:
+            for progenitor_id in self.grafo.padres_de(gallo_id):
+                if progenitor_id is None:
+                    continue
+                for ancestro_id, caminos in self.caminos(progenitor_id, generaciones - 1).items():
+                    resultado.setdefault(ancestro_id, []).extend(
+                        (gallo_id,) + camino for camino in caminos
+                        if gallo_id not in camino  # Protección ante ciclos en datos corruptos
+                    )
+
+        self._caminos[clave] = resultado
+        return resultado
+
+    def coeficiente_gallo(self, gallo_id: int) -> float:
+        """F de un gallo existente (memoizado)"""
+        if gallo_id in self._coeficientes:
+            return self._coeficientes[gallo_id]
+
+        self._coeficientes[gallo_id] = 0.0  # Marca anti-ciclos mientras se calcula
+        padre_id, madre_id = self.grafo.padres_de(gallo_id)
+        coeficiente, _ = self.analizar_cruce(padre_id, madre_id)
+        self._coeficientes[gallo_id] = coeficiente
+        return coeficiente
+
+    def analizar_cruce(self, padre_id: Optional[int], madre_id: Optional[int]) -> Tuple[float, List[Dict]]:
+        """(F de la cría, ancestros comunes con su contribución)"""
+        if padre_id is None or madre_id is None:
+            return 0.0, []
+
+        generaciones = self.max_generaciones - 1
+        caminos_padre = self.caminos(padre_id, generaciones)
+        caminos_madre = self.caminos(madre_id, generaciones)
+
+        contribuciones = defaultdict(float)
+        pares = defaultdict(int)
+        generacion_minima = {}
+
+        for ancestro_id in caminos_padre.keys() & caminos_madre.keys():
+            f_ancestro = None
+            for camino_p in caminos_padre[ancestro_id]:
+                nodos_p = set(camino_p)
+                for camino_m in caminos_madre[ancestro_id]:
+                    if len(nodos_p.intersection(camino_m)) != 1:
+                        continue  # Los caminos se cruzan antes del ancestro común
+                    if f_ancestro is None:
+                        f_ancestro = self.coeficiente_gallo(ancestro_id)
+                    n1, n2 = len(camino_p) - 1, len(camino_m) - 1
+                    contribuciones[ancestro_id] += 0.5 ** (n1 + n2 + 1) * (1 + f_ancestro)
+                    pares[ancestro_id] += 1
+                    generacion_minima[ancestro_id] = min(
+                        generacion_minima.get(ancestro_id, n1 + n2), n1 + n2
+                    )
+
+        ancestros_comunes = sorted(
+            (
+                {
+                    'gallo_id': ancestro_id,
+                    'contribucion': contribucion,
+                    'caminos': pares[ancestro_id],
+                    'generaciones': generacion_minima[ancestro_id],
+                }
+                for ancestro_id, contribucion in contribuciones.items()
+            ),
+            key=lambda a: (-a['contribucion'], a['gallo_id']),
+        )
+        return sum(contribuciones.values()), ancestros_comunes
+
+
+class ConsanguinidadService:
+
+    @staticmethod
+    def _resultado(db: Session, coeficiente: float, ancestros_comunes: List[Dict], **extra) -> Dict:
+        """Completar ancestros comunes con nombre y código (una sola consulta IN)"""
+        ids = [a['gallo_id'] for a in ancestros_comunes]
+        gallos = {}
+        if ids:
+            gallos = {
+                g.id: g for g in db.query(Gallo.id, Gallo.nombre, Gallo.codigo_identificacion)
+                .filter(Gallo.id.in_(ids)).all()
+            }
+        for ancestro in ancestros_comunes:
+            gallo = gallos.get(ancestro['gallo_id'])
+            ancestro['nombre'] = gallo.nombre if gallo else None
+            ancestro['codigo_identificacion'] = gallo.codigo_identificacion if gallo else None
+            ancestro['contribucion'] = round(ancestro['contribucion'], 6)
+
+        return {
+            **extra,
+            'coeficiente': round(coeficiente, 6),
+            'porcentaje': round(coeficiente * 100, 2),
+            'ancestros_comunes': ancestros_comunes,
+        }
+
+    @staticmethod
+    def analizar_gallo(db: Session, gallo: Gallo, max_generaciones: int = MAX_GENERACIONES_CONSANGUINIDAD) -> Dict:
+        """🐓 Consanguinidad de un gallo existente"""
+        analizador = AnalizadorConsanguinidad(genealogia_cache.obtener(db, gallo.user_id), max_generaciones)
+        coeficiente, ancestros_comunes = analizador.analizar_cruce(gallo.padre_id, gallo.madre_id)
+        return ConsanguinidadService._resultado(db, coeficiente, ancestros_comunes, gallo_id=gallo.id)
+
+    @staticmethod
+    def analizar_cruce(
+        db: Session,
+        user_id: int,
+        padre_id: int,
+        madre_id: int,
+        max_generaciones: int = MAX_GENERACIONES_CONSANGUINIDAD,
+    ) -> Dict:
+        """💞 Consanguinidad esperada de la cría de un cruce propuesto"""
+        analizador = AnalizadorConsanguinidad(genealogia_cache.obtener(db, user_id), max_generaciones)
+        coeficiente, ancestros_comunes = analizador.analizar_cruce(padre_id, madre_id)
+        return ConsanguinidadService._resultado(
+            db, coeficiente, ancestros_comunes, padre_id=padre_id, madre_id=madre_id
+        )
+
+    @staticmethod
+    def reporte_plantel(db: Session, user_id: int, max_generaciones: int = MAX_GENERACIONES_CONSANGUINIDAD) -> List[Dict]:
+        """📊 Coeficiente de todos los gallos del usuario (una sola carga del grafo)"""
+        grafo = genealogia_cache.obtener(db, user_id)
+        analizador = AnalizadorConsanguinidad(grafo, max_generaciones)
+
+        reporte = []
+        for gallo_id in grafo.ids:
+            coeficiente = analizador.coeficiente_gallo(gallo_id)
+            reporte.append({
+                'gallo_id': gallo_id,
+                'coeficiente': round(coeficiente, 6),
+                'porcentaje': round(coeficiente * 100, 2),
+            })
+        reporte.sort(key=lambda r: (-r['coeficiente'], r['gallo_id']))
+        return reporte
@@ -0,0 +1,320 @@
+# 📊 app/services/cuota_service.py - Límites del plan con contadores precalculados
+"""
+Responde "¿puede crear otro gallo / tope / pelea / vacuna?" leyendo un contador
+por clave primaria en `uso_cuotas` en lugar de contar filas en cada alta.
+
+- Los contadores se ajustan con eventos de mapper en la MISMA transacción que
+  el insert/delete (si se revierte, el contador también).
+- Las escrituras masivas (insert()/update()/delete() de Core) no disparan
+  eventos: quien las use debe llamar `CuotaService.ajustar(conn, ...)`.
+- `reconciliar` recuenta todo desde las tablas reales (al arrancar si la tabla
+  es nueva, o manualmente: `python -m app.services.cuota_service`).
+"""
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event, select, update, delete, func, literal, inspect, Integer, String
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.exceptions import AuthorizationException, ValidationException
+from app.models.gallo_simple import Gallo
+from app.models.tope import Tope
+from app.models.pelea import Pelea
+from app.models.vacuna import Vacuna
+from app.models.uso_cuota import UsoCuota, NIVEL_USUARIO
+from app.services.suscripcion_cache import plan_vigente
+
+uso = UsoCuota.__table__
+
+# recurso → campo de Suscripcion / PlanVigente con su límite
+LIMITES_POR_RECURSO = {
+    "gallos": "gallos_maximo",
+    "topes": "topes_por_gallo",
+    "peleas": "peleas_por_gallo",
+    "vacunas": "vacunas_por_gallo",
+}
+
+# Solo los gallos "principal" cuentan para gallos_maximo (los padres generados no)
+TIPO_GALLO_CONTADO = "principal"
+
+
+class CuotaService:
+    # Se activa en el arranque una vez verificada la tabla (ver inicializar)
+    activo = False
+
+    # ========================
+    # 📏 LÍMITES DEL PLAN
+    # ========================
+
+    @staticmethod
+    def limites(db: Session, user_id: int) -> Dict[str, Any]:
+        """Límites del plan vigente (de la caché de suscripciones)"""
+        plan = plan_vigente(db, user_id)
+        return {
+            "plan_type": plan.plan_type,
+            **{recurso: getattr(plan, campo) for recurso, campo in LIMITES_POR_RECURSO.items()},
+        }
+
+    # ========================
+    # 🔢 CONSULTA DE USO (O(1) por clave primaria)
+    # ========================
+
+    @staticmethod
+    def usado(db: Session, user_id: int, recurso: str, gallo_id: Optional[int] = None) -> int:
+        if not CuotaService.activo:
+            return CuotaService._contar(db, user_id, recurso, gallo_id)
+        cantidad = db.execute(
+            select(uso.c.cantidad).where(
+                uso.c.user_id == user_id,
+                uso.c.recurso == recurso,
+                uso.c.gallo_id == (gallo_id or NIVEL_USUARIO),
+            )
+        ).scalar()
+        return cantidad or 0
+
+    @staticmethod
+    def _contar(db: Session, user_id: int, recurso: str, gallo_id: Optional[int]) -> int:
+        """COUNT directo sobre la tabla real (solo si los contadores no están activos)"""
+        if recurso == "gallos":
+            condicion = [Gallo.user_id == user_id, Gallo.tipo_registro == TIPO_GALLO_CONTADO]
+            return db.query(func.count(Gallo.id)).filter(*condicion).scalar()
+        if recurso == "vacunas":
+            return db.query(func.count(Vacuna.id)).filter(Vacuna.gallo_id == gallo_id).scalar()
+        modelo = Tope if recurso == "topes" else Pelea
+        return db.query(func.count(modelo.id)).filter(
+            modelo.user_id == user_id, modelo.gallo_id == gallo_id
+        ).scalar()
+
+    @staticmethod
+    def puede_crear(db: Session, user_id: int, recurso: str, gallo_id: Optional[int] = None,
+                    cantidad: int = 1) -> Tuple[bool, int, int]:
+        """(permitido, usado, máximo) para crear `cantidad` registros más"""
+        maximo = CuotaService.limites(db, user_id)[recurso]
+        usado = CuotaService.usado(db, user_id, recurso, gallo_id)
+        return usado + cantidad <= maximo, usado, maximo
+
+    @staticmethod
+    def verificar(db: Session, user_id: int, recurso: str, gallo_id: Optional[int] = None, cantidad: int = 1):
+        """Lanzar AuthorizationException si el alta supera el límite del plan"""
+        permitido, usado, maximo = CuotaService.puede_crear(db, user_id, recurso, gallo_id, cantidad)
+        if not permitido:
+            destino = " para este gallo" if gallo_id else ""
+            raise AuthorizationException(
+                f"Límite del plan alcanzado: {usado}/{maximo} {recurso}{destino}"
+                + (f", intentas agregar {cantidad}" if cantidad > 1 else "")
+            )
+
+    @staticmethod
+    def snapshot(db: Session, user_id: int) -> Dict[str, Any]:
+        """Uso actual vs. límites del plan (gallos total + topes/peleas/vacunas por gallo)"""
+        if not CuotaService.activo:
+            raise ValidationException("Los contadores de cuota no están disponibles")
+        limites = CuotaService.limites(db, user_id)
+        filas = db.execute(
+            select(uso.c.recurso, uso.c.gallo_id, uso.c.cantidad).where(uso.c.user_id == user_id)
+        ).all()
+
+        por_gallo: Dict[int, Dict[str, int]] = {}
+        gallos_usados = 0
+        for recurso, gallo_id, cantidad in filas:
+            if gallo_id == NIVEL_USUARIO:
+                if recurso == "gallos":
+                    gallos_usados = cantidad
+            elif cantidad:
+                por_gallo.setdefault(gallo_id, {})[recurso] = cantidad
+
+        return {
+            "plan_type": limites["plan_type"],
+            "gallos": {
+                "usados": gallos_usados,
+                "maximo": limites["gallos"],
+                "disponibles": max(limites["gallos"] - gallos_usados, 0),
+            },
+            "limites_por_gallo": {r: limites[r] for r in ("topes", "peleas", "vacunas")},
+            "por_gallo": [
+                {
+                    "gallo_id": gallo_id,
+                    **{
+                        recurso: {"usados": usados.get(recurso, 0), "maximo": limites[recurso]}
+                        for recurso in ("topes", "peleas", "vacunas")
+                    },
+                }
+                for gallo_id, usados in sorted(por_gallo.items())
+            ],
+        }
+
+    # ========================
+    # ✏️ MANTENIMIENTO DE CONTADORES
+    # ========================
+
+    @staticmethod
+    def ajustar(conn, user_id: Optional[int], recurso: str, gallo_id: Optional[int], delta: int):
+        """Sumar `delta` al contador (upsert atómico en la transacción de `conn`)"""
+        if not CuotaService.activo or user_id is None or delta == 0:
+            return
+        valores = {
+            "user_id": user_id,
+            "recurso": recurso,
+            "gallo_id": gallo_id or NIVEL_USUARIO,
+            "cantidad": max(delta, 0),
+            "updated_at": func.now(),
+        }
+        dialecto = {"postgresql": postgresql, "sqlite": sqlite}.get(conn.dialect.name)
+        if dialecto is not None:
+            # Nunca por debajo de 0 (un delete de datos anteriores a la tabla no debe dejar negativos)
+            piso = func.greatest if conn.dialect.name == "postgresql" else func.max
+            sentencia = dialecto.insert(uso).values(**valores)
+            conn.execute(sentencia.on_conflict_do_update(
+                index_elements=[uso.c.user_id, uso.c.recurso, uso.c.gallo_id],
+                set_={"cantidad": piso(uso.c.cantidad + delta, 0), "updated_at": func.now()},
+            ))
+            return
+        # Otros motores: UPDATE y, si no había fila, INSERT
+        resultado = conn.execute(
+            update(uso)
+            .where(uso.c.user_id == user_id, uso.c.recurso == recurso, uso.c.gallo_id == valores["gallo_id"])
+            .values(cantidad=uso.c.cantidad + delta, updated_at=func.now())
+        )
+        if resultado.rowcount == 0:
+            conn.execute(uso.insert().values(**valores))
+
+    # ========================
+    # 🔁 RECONCILIACIÓN
+    # ========================
+
+    @staticmethod
+    def _consultas_recuento():
+        """SELECTs (user_id, recurso, gallo_id, cantidad) desde las tablas reales"""
+        gallos = select(
+            Gallo.user_id, literal("gallos", String), literal(NIVEL_USUARIO, Integer), func.count()
+        ).where(Gallo.tipo_registro == TIPO_GALLO_CONTADO).group_by(Gallo.user_id)
+
+        topes = select(
+            Tope.user_id, literal("topes", String), Tope.gallo_id, func.count()
+        ).where(Tope.user_id.isnot(None), Tope.gallo_id.isnot(None)).group_by(Tope.user_id, Tope.gallo_id)
+
+        peleas = select(
+            Pelea.user_id, literal("peleas", String), Pelea.gallo_id, func.count()
+        ).where(Pelea.user_id.isnot(None), Pelea.gallo_id.isnot(None)).group_by(Pelea.user_id, Pelea.gallo_id)
+
+        vacunas = select(
+            Gallo.user_id, literal("vacunas", String), Vacuna.gallo_id, func.count()
+        ).join(Gallo, Gallo.id == Vacuna.gallo_id).group_by(Gallo.user_id, Vacuna.gallo_id)
+
+        return gallos, topes, peleas, vacunas
+
+    @staticmethod
+    def reconciliar(conn, user_id: Optional[int] = None) -> int:
+        """Recontar todo (o un usuario) y reescribir sus contadores; devuelve filas escritas"""
+        borrar = delete(uso)
+        if user_id is not None:
+            borrar = borrar.where(uso.c.user_id == user_id)
+        conn.execute(borrar)
+
+        total = 0
+        columnas = ["user_id", "recurso", "gallo_id", "cantidad"]
+        for consulta in CuotaService._consultas_recuento():
+            if user_id is not None:
+                consulta = consulta.having(consulta.selected_columns[0] == user_id)
+            total += conn.execute(uso.insert().from_select(columnas, consulta)).rowcount
+        return total
+
+    @staticmethod
+    def inicializar(engine):
+        """Crear la tabla si falta (con un recuento completo) y activar los contadores"""
+        with engine.begin() as conn:
+            if not inspect(conn).has_table(uso.name):
+                uso.create(bind=conn)
+                total = CuotaService.reconciliar(conn)
+                print(f"✅ Tabla {uso.name} creada con {total} contadores")
+        CuotaService.activo = True
+
+
+# ========================
+# 🔔 EVENTOS DE MAPPER
+# ========================
+
+def _valor_anterior(target, atributo):
+    historial = inspect(target).attrs[atributo].history
+    if historial.deleted:
+        return historial.deleted[0]
+    return getattr(target, atributo)
+
+
+def _clave_gallo(target, anterior=False) -> Optional[Tuple[int, str, int]]:
+    obtener = (lambda a: _valor_anterior(target, a)) if anterior else (lambda a: getattr(target, a))
+    if obtener("tipo_registro") != TIPO_GALLO_CONTADO:
+        return None
+    return obtener("user_id"), "gallos", NIVEL_USUARIO
+
+
+def _clave_por_gallo(recurso):
+    def clave(target, anterior=False):
+        obtener = (lambda a: _valor_anterior(target, a)) if anterior else (lambda a: getattr(target, a))
+        user_id, gallo_id = obtener("user_id"), obtener("gallo_id")
+        if user_id is None or gallo_id is None:
+            return None
+        return user_id, recurso, gallo_id
+    return clave
+
+
+def _clave_vacuna(connection, target, anterior=False):
+    gallo_id = _valor_anterior(target, "gallo_id") if anterior else target.gallo_id
+    if gallo_id is None:
+        return None
+    user_id = connection.execute(select(Gallo.user_id).where(Gallo.id == gallo_id)).scalar()
+    return (user_id, "vacunas", gallo_id) if user_id is not None else None
+
+
+def _registrar_modelo(modelo, clave):
+    def al_insertar(mapper, connection, target):
+        if not CuotaService.activo:
+            return
+        k = clave(connection, target)
+        if k:
+            CuotaService.ajustar(connection, *k, 1)
+
+    def al_eliminar(mapper, connection, target):
+        if not CuotaService.activo:
+            return
+        k = clave(connection, target, anterior=True)
+        if k:
+            CuotaService.ajustar(connection, *k, -1)
+
+    def al_actualizar(mapper, connection, target):
+        if not CuotaService.activo:
+            return
+        antes, ahora = clave(connection, target, anterior=True), clave(connection, target)
+        if antes != ahora:
+            if antes:
+                CuotaService.ajustar(connection, *antes, -1)
+            if ahora:
+                CuotaService.ajustar(connection, *ahora, 1)
+
+    event.listen(modelo, "after_insert", al_insertar)
+    event.listen(modelo, "after_delete", al_eliminar)
+    event.listen(modelo, "after_update", al_actualizar)
+
+
+_registrar_modelo(Gallo, lambda conn, t, anterior=False: _clave_gallo(t, anterior))
+_registrar_modelo(Tope, lambda conn, t, anterior=False: _clave_por_gallo("topes")(t, anterior))
+_registrar_modelo(Pelea, lambda conn, t, anterior=False: _clave_por_gallo("peleas")(t, anterior))
+_registrar_modelo(Vacuna, _clave_vacuna)
+
+
+@event.listens_for(Gallo, "after_delete")
+def _borrar_contadores_del_gallo(mapper, connection, target):
+    """Los contadores por gallo desaparecen con el gallo"""
+    if not CuotaService.activo:
+        return
+    connection.execute(delete(uso).where(uso.c.gallo_id == target.id, uso.c.gallo_id != NIVEL_USUARIO))
+
+
+if __name__ == "__main__":
+    from app.database import engine
+    import app.models  # noqa: F401 - registrar todos los modelos
+
+    with engine.begin() as conn:
+        uso.create(bind=conn, checkfirst=True)
+        total = CuotaService.reconciliar(conn)
+    print(f"✅ Contadores de cuota recalculados: {total} filas")
@@ -0,0 +1,239 @@
+# 📸 app/services/foto_variantes_service.py - URLs de variantes de fotos precalculadas
+"""
+Los listados devolvían solo `url_foto_cloudinary` y el cliente (o el servidor,
+ver /test-cloudinary) armaba cada variante con `CloudinaryImage(...).build_url`:
+cinco URLs por gallo en cada página. Ahora se calculan UNA vez al escribir la
+foto y se guardan en `Gallo.fotos_variantes`:
+
+    {"principal": PhotoUrls, "adicionales": [PhotoUrls, ...]}
+
+- Fotos subidas por el pipeline (`subida_service`): URLs de los WebP ya
+  redimensionados (`urls_variantes`).
+- Fotos de Cloudinary escritas por otras rutas: transformaciones equivalentes
+  construidas desde el public_id de la URL.
+- Cualquier otra URL: todas las variantes apuntan a la misma.
+
+Escrituras ORM recalculan solo la parte que cambió (evento before_insert/update).
+UPDATE/INSERT por conjunto no disparan eventos: para filas existentes o cargadas
+por lotes, `backfill` (python -m app.services.foto_variantes_service).
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update, bindparam, event, inspect, text, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from app.models.gallo_simple import Gallo
+from app.services.imagen_service import VARIANTES
+
+# https://res.cloudinary.com/<cloud>/image/upload/[transformaciones/][v123/]<public_id>.<formato>
+_URL_CLOUDINARY = re.compile(
+    r"^https?://res\.cloudinary\.com/(?P<cloud>[^/]+)/image/upload/"
+    r"(?:(?:[a-z]{1,3}_[^/]+)/)*(?:v(?P<version>\d+)/)?(?P<public_id>.+?)(?:\.(?P<formato>[a-z0-9]+))?$"
+)
+COLUMNAS_PRINCIPAL = ("url_foto_cloudinary", "foto_principal_url")
+
+
+def _transformacion(nombre: str) -> Dict[str, Any]:
+    """Misma geometría que las variantes WebP generadas localmente (imagen_service.VARIANTES)"""
+    ancho, alto, recortar = VARIANTES[nombre]
+    return {"width": ancho, "height": alto, "crop": "fill" if recortar else "limit",
+            "quality": "auto", "format": "webp"}
+
+
+class FotoVariantesService:
+
+    # ========================
+    # 🔗 CÁLCULO DE URLS
+    # ========================
+
+    @staticmethod
+    def desde_url(url: Optional[str]) -> Optional[Dict[str, str]]:
+        """PhotoUrls de una URL: transformaciones de Cloudinary o la misma URL para todo"""
+        if not url:
+            return None
+        partes = _URL_CLOUDINARY.match(url)
+        if partes is None:
+            return {"original": url, "thumbnail": url, "medium": url, "large": url, "optimized": url}
+
+        import cloudinary
+
+        imagen = cloudinary.CloudinaryImage(partes["public_id"], version=partes["version"])
+        opciones = {"cloud_name": partes["cloud"], "secure": True}
+        return {
+            "original": url,
+            "thumbnail": imagen.build_url(**_transformacion("thumbnail"), **opciones),
+            "medium": imagen.build_url(**_transformacion("medium"), **opciones),
+            "large": imagen.build_url(**_transformacion("large"), **opciones),
+            "optimized": imagen.build_url(quality="auto", fetch_format="auto", **opciones),
+        }
+
+    @staticmethod
+    def desde_subida(urls_variantes: Dict[str, str]) -> Dict[str, str]:
+        """PhotoUrls de una subida con variantes WebP (la "original" ya es la large, sin EXIF)"""
+        large = urls_variantes["large"]
+        return {
+            "original": large,
+            "thumbnail": urls_variantes.get("thumbnail", large),
+            "medium": urls_variantes.get("medium", large),
+            "large": large,
+            "optimized": large,
+        }
+
+    @staticmethod
+    def _url_principal(url_foto_cloudinary: Optional[str], foto_principal_url: Optional[str]) -> Optional[str]:
+        return url_foto_cloudinary or foto_principal_url
+
+    @staticmethod
+    def _urls_adicionales(fotos_adicionales: Any) -> List[str]:
+        """fotos_adicionales admite ["url", ...] o [{"url": ...}, ...]"""
+        urls = []
+        for foto in fotos_adicionales or []:
+            url = foto.get("url") if isinstance(foto, dict) else foto
+            if isinstance(url, str) and url:
+                urls.append(url)
+        return urls
+
+    @staticmethod
+    def calcular(url_foto_cloudinary: Optional[str], foto_principal_url: Optional[str],
+                 fotos_adicionales: Any) -> Optional[Dict[str, Any]]:
+        principal = FotoVariantesService.desde_url(
+            FotoVariantesService._url_principal(url_foto_cloudinary, foto_principal_url)
+        )
+        adicionales = [
+            FotoVariantesService.desde_url(url)
+            for url in FotoVariantesService._urls_adicionales(fotos_adicionales)
+        ]
+        if principal is None and not adicionales:
+            return None
+        return {"principal": principal, "adicionales": adicionales}
+
+    @staticmethod
+    def aplicar_subida(db: Session, subida):
+        """Foto principal subida por el pipeline: URL original + variantes WebP (sin commit)"""
+        principal = (
+            FotoVariantesService.desde_subida(subida.urls_variantes)
+            if subida.urls_variantes else FotoVariantesService.desde_url(subida.url_final)
+        )
+        actuales = db.execute(
+            select(Gallo.fotos_variantes).where(Gallo.id == subida.objetivo_id)
+        ).scalar()
+        variantes = {"adicionales": [], **(actuales or {}), "principal": principal}
+        db.execute(
+            update(Gallo.__table__)
+            .where(Gallo.__table__.c.id == subida.objetivo_id)
+            .values(foto_principal_url=principal["original"], fotos_variantes=variantes)
+        )
+
+    # ========================
+    # 🔄 BACKFILL
+    # ========================
+
+    @staticmethod
+    def backfill(db: Session, lote: int = 500, recalcular: bool = False) -> int:
+        """Calcular `fotos_variantes` de gallos con fotos (solo los que no lo tienen, salvo `recalcular`)"""
+        tabla = Gallo.__table__
+        actualizar = (
+            update(tabla)
+            .where(tabla.c.id == bindparam("b_id"))
+            .values(fotos_variantes=bindparam("b_variantes"))
+        )
+        filtro = or_(
+            tabla.c.url_foto_cloudinary.isnot(None),
+            tabla.c.foto_principal_url.isnot(None),
+            tabla.c.fotos_adicionales.isnot(None),
+        )
+        if not recalcular:
+            filtro = filtro & tabla.c.fotos_variantes.is_(None)
+
+        total = 0
+        ultimo_id = 0
+        while True:
+            filas = db.execute(
+                select(tabla.c.id, tabla.c.url_foto_cloudinary, tabla.c.foto_principal_url, tabla.c.fotos_adicionales)
+                .where(filtro, tabla.c.id > ultimo_id)
+                .order_by(tabla.c.id)
+                .limit(lote)
+            ).all()
+            if not filas:
+                break
+            db.execute(actualizar, [
+                {"b_id": fila.id, "b_variantes": FotoVariantesService.calcular(
+                    fila.url_foto_cloudinary, fila.foto_principal_url, fila.fotos_adicionales
+                )}
+                for fila in filas
+            ])
+            db.commit()
+            total += len(filas)
+            ultimo_id = filas[-1].id
+        return total
+
+    # ========================
+    # 🏗️ COLUMNA
+    # ========================
+
+    @staticmethod
+    def asegurar_columna(engine):
+        """Sin migraciones: agregar gallos.fotos_variantes si falta (antes de servir consultas de Gallo)"""
+        with engine.begin() as conn:
+            if not inspect(conn).has_table(Gallo.__tablename__):
+                return
+            existentes = {c["name"] for c in inspect(conn).get_columns(Gallo.__tablename__)}
+            if "fotos_variantes" not in existentes:
+                tipo = Gallo.__table__.c.fotos_variantes.type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {Gallo.__tablename__} ADD COLUMN fotos_variantes {tipo}"))
+                print("✅ Columna gallos.fotos_variantes agregada")
+
+
+# ========================
+# 🔔 EVENTOS: recalcular solo lo que cambió
+# ========================
+
+def _cambio(target: Gallo, columnas) -> bool:
+    return any(get_history(target, columna).has_changes() for columna in columnas)
+
+
+@event.listens_for(Gallo, "before_insert")
+@event.listens_for(Gallo, "before_update")
+def _recalcular_variantes(mapper, connection, target):
+    cambio_principal = _cambio(target, COLUMNAS_PRINCIPAL)
+    cambio_adicionales = _cambio(target, ("fotos_adicionales",))
+    if not (cambio_principal or cambio_adicionales) or _cambio(target, ("fotos_variantes",)):
+        return  # nada que recalcular, o quien escribe ya trae las variantes
+
+    variantes = dict(target.fotos_variantes or {})
+    if cambio_principal:
+        variantes["principal"] = FotoVariantesService.desde_url(
+            FotoVariantesService._url_principal(target.url_foto_cloudinary, target.foto_principal_url)
+        )
+    if cambio_adicionales:
+        variantes["adicionales"] = [
+            FotoVariantesService.desde_url(url)
+            for url in FotoVariantesService._urls_adicionales(target.fotos_adicionales)
+        ]
+    if variantes.get("principal") is None and not variantes.get("adicionales"):
+        target.fotos_variantes = None
+    else:
+        variantes.setdefault("principal", None)
+        variantes.setdefault("adicionales", [])
+        target.fotos_variantes = variantes
+
+
+if __name__ == "__main__":
+    import argparse
+    import app.models  # noqa: F401 - registrar todos los modelos
+    from app.database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Precalcular URLs de variantes de fotos de gallos")
+    parser.add_argument("--lote", type=int, default=500)
+    parser.add_argument("--recalcular", action="store_true", help="también los que ya tienen variantes")
+    args = parser.parse_args()
+
+    FotoVariantesService.asegurar_columna(engine)
+    db = SessionLocal()
+    try:
+        total = FotoVariantesService.backfill(db, lote=args.lote, recalcular=args.recalcular)
+        print(f"✅ Variantes de fotos calculadas: {total} gallos")
+    finally:
+        db.close()
@@ -0,0 +1,224 @@
+# 🔍 app/services/gallo_busqueda_service.py - Búsqueda de gallos con paginación por cursor
+"""
+Implementa `GalloSearchParams` con paginación keyset sobre (user_id, sort_key, id):
+cada página continúa "después de la última fila vista" usando los índices
+compuestos de `gallos`, así que la página 500 cuesta lo mismo que la primera.
+
+El cursor es opaco para el cliente (base64 de un JSON con el orden y la última fila).
+Guarda el valor de la columna tal como lo devuelve la base (en SQLite, el texto
+almacenado): un datetime re-formateado por Python no siempre coincide con lo
+guardado y los empates se saltaban o repetían. Los NULL van al final en orden
+ascendente y al principio en descendente (lo mismo que el índice en PostgreSQL).
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, or_, text, tuple_, literal, type_coerce, String
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.exceptions import ValidationException
+from app.models.gallo_simple import Gallo
+from app.schemas.gallo import GalloSearchParams, GalloSimple, GalloResumen
+from app.services.cierre_genealogico_service import CierreGenealogicoService
+
+_COLUMNAS_ORDEN = {
+    "created_at": Gallo.created_at,
+    "nombre": Gallo.nombre,
+    "codigo_identificacion": Gallo.codigo_identificacion,
+    "id": Gallo.id,
+}
+
+_INDICES_TRIGRAMA = ("nombre", "codigo_identificacion")
+
+
+class GalloBusquedaService:
+
+    # ========================
+    # 🔐 CURSOR OPACO
+    # ========================
+
+    @staticmethod
+    def _codificar_cursor(params: GalloSearchParams, gallo: Gallo, valor: Any) -> str:
+        """`valor`: la columna de orden sin procesar (ver `_valor_crudo`)"""
+        if isinstance(valor, datetime):
+            valor = valor.isoformat()
+        datos = {"s": params.sort_by, "o": params.sort_order, "v": valor, "i": gallo.id}
+        return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode().rstrip("=")
+
+    @staticmethod
+    def _decodificar_cursor(params: GalloSearchParams) -> Tuple[Any, int]:
+        try:
+            relleno = "=" * (-len(params.cursor) % 4)
+            datos = json.loads(base64.urlsafe_b64decode(params.cursor + relleno))
+            valor, ultimo_id = datos["v"], int(datos["i"])
+            if datos["s"] != params.sort_by or datos["o"] != params.sort_order:
+                raise ValueError("orden distinto")
+            if valor is not None and not isinstance(valor, str) and params.sort_by != "id":
+                raise ValueError("valor de orden inválido")
+        except (ValueError, KeyError, TypeError):
+            raise ValidationException("Cursor inválido o de otra búsqueda (vuelva a la primera página)")
+        return valor, ultimo_id
+
+    @staticmethod
+    def _valor_crudo(columna):
+        """La columna sin el procesamiento de tipo: SQLite devuelve el texto guardado tal cual"""
+        return type_coerce(columna, String).label("valor_cursor")
+
+    @staticmethod
+    def _despues_del_cursor(columna, descendente: bool, valor: Optional[str], ultimo_id: int):
+        """Filas posteriores a (valor, ultimo_id) con NULLs al final (asc) o al principio (desc)"""
+        if valor is None:
+            if descendente:
+                return or_(columna.isnot(None), and_(columna.is_(None), Gallo.id < ultimo_id))
+            return and_(columna.is_(None), Gallo.id > ultimo_id)
+
+        # Se compara contra el valor crudo: PostgreSQL convierte el literal al tipo de la columna
+        clave = tuple_(columna, Gallo.id)
+        cursor = tuple_(literal(valor, String), literal(ultimo_id))
+        if descendente:
+            return clave < cursor
+        return or_(clave > cursor, columna.is_(None))
+
+    # ========================
+    # 🧬 GENEALOGÍA EN LISTADOS
+    # ========================
+
+    @staticmethod
+    def _opciones_genealogia(profundidad: int):
+        """selectinload por generación: 2 consultas IN por nivel, sin importar el tamaño de página"""
+        opciones = []
+        for relacion in (Gallo.padre, Gallo.madre):
+            carga = selectinload(relacion)
+            if profundidad > 1:
+                opciones.append(carga.selectinload(Gallo.padre))
+                opciones.append(carga.selectinload(Gallo.madre))
+            else:
+                opciones.append(carga)
+        return opciones
+
+    @staticmethod
+    def _resumen(gallo: Optional[Gallo], profundidad: int) -> Optional[Dict[str, Any]]:
+        """Resumen del progenitor sin tocar relaciones más allá de `profundidad` (evita lazy loads)"""
+        if gallo is None:
+            return None
+        resumen = GalloResumen(
+            id=gallo.id,
+            nombre=gallo.nombre,
+            codigo_identificacion=gallo.codigo_identificacion,
+            color=gallo.color,
+            estado=gallo.estado,
+            foto_principal_url=gallo.foto_principal_url,
+        ).model_dump(mode="json", exclude={"padre", "madre"})
+        if profundidad > 1:
+            resumen["padre"] = GalloBusquedaService._resumen(gallo.padre, profundidad - 1)
+            resumen["madre"] = GalloBusquedaService._resumen(gallo.madre, profundidad - 1)
+        return resumen
+
+    @staticmethod
+    def _serializar(gallo: Gallo, params: GalloSearchParams) -> Dict[str, Any]:
+        datos = GalloSimple.model_validate(gallo).model_dump(mode="json")
+        if params.include_genealogy:
+            datos["padre"] = GalloBusquedaService._resumen(gallo.padre, params.genealogy_depth)
+            datos["madre"] = GalloBusquedaService._resumen(gallo.madre, params.genealogy_depth)
+        return datos
+
+    # ========================
+    # 🔍 BÚSQUEDA
+    # ========================
+
+    @staticmethod
+    def _aplicar_filtros(query, params: GalloSearchParams):
+        if params.search:
+            termino = params.search.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            patron = f"%{termino}%"
+            query = query.filter(or_(
+                Gallo.nombre.ilike(patron, escape="\\"),
+                Gallo.codigo_identificacion.ilike(patron, escape="\\"),
+            ))
+        if params.raza_id is not None:
+            query = query.filter(Gallo.raza_id == str(params.raza_id))
+        if params.estado:
+            query = query.filter(Gallo.estado == params.estado.lower())
+        if params.tiene_foto is not None:
+            con_foto = or_(Gallo.foto_principal_url.isnot(None), Gallo.url_foto_cloudinary.isnot(None))
+            query = query.filter(con_foto if params.tiene_foto else ~con_foto)
+        if params.tiene_padres is not None:
+            con_padres = or_(Gallo.padre_id.isnot(None), Gallo.madre_id.isnot(None))
+            query = query.filter(con_padres if params.tiene_padres else ~con_padres)
+        if params.created_after:
+            query = query.filter(Gallo.created_at >= params.created_after)
+        if (params.descendiente_de is not None or params.ancestro_de is not None) and not CierreGenealogicoService.activo:
+            raise ValidationException("Los filtros de linaje no están disponibles")
+        if params.descendiente_de is not None:
+            query = query.filter(CierreGenealogicoService.filtro_descendientes_de(params.descendiente_de))
+        if params.ancestro_de is not None:
+            query = query.filter(CierreGenealogicoService.filtro_ancestros_de(params.ancestro_de))
+        return query
+
+    @staticmethod
+    def buscar(db: Session, user_id: int, params: GalloSearchParams) -> Dict[str, Any]:
+        """🔥 Una página de gallos del usuario + cursor de la siguiente"""
+        columna = _COLUMNAS_ORDEN[params.sort_by]
+        descendente = params.sort_order == "desc"
+
+        query = GalloBusquedaService._aplicar_filtros(
+            db.query(Gallo).filter(Gallo.user_id == user_id), params
+        )
+
+        if params.cursor:
+            valor, ultimo_id = GalloBusquedaService._decodificar_cursor(params)
+            if params.sort_by == "id":
+                query = query.filter(Gallo.id < ultimo_id if descendente else Gallo.id > ultimo_id)
+            else:
+                query = query.filter(
+                    GalloBusquedaService._despues_del_cursor(columna, descendente, valor, ultimo_id)
+                )
+
+        if params.sort_by == "id":
+            orden = [Gallo.id.desc() if descendente else Gallo.id.asc()]
+        elif descendente:
+            orden = [columna.desc().nulls_first(), Gallo.id.desc()]
+        else:
+            orden = [columna.asc().nulls_last(), Gallo.id.asc()]
+        query = query.order_by(*orden).add_columns(GalloBusquedaService._valor_crudo(columna))
+
+        if params.include_genealogy:
+            query = query.options(*GalloBusquedaService._opciones_genealogia(params.genealogy_depth))
+
+        # Sin cursor se respeta `page` (compatibilidad); con cursor el offset es siempre 0
+        if not params.cursor and params.page > 1:
+            query = query.offset((params.page - 1) * params.limit)
+
+        filas = query.limit(params.limit + 1).all()
+        hay_mas = len(filas) > params.limit
+        filas = filas[:params.limit]
+
+        return {
+            "data": [GalloBusquedaService._serializar(g, params) for g, _ in filas],
+            "next_cursor": GalloBusquedaService._codificar_cursor(params, *filas[-1]) if hay_mas else None,
+            "has_more": hay_mas,
+        }
+
+    # ========================
+    # 🏗️ ÍNDICES
+    # ========================
+
+    @staticmethod
+    def asegurar_indices(engine):
+        """Crear los índices compuestos (y en PostgreSQL los trigrama) si faltan"""
+        with engine.begin() as conn:
+            for indice in Gallo.__table__.indexes:
+                indice.create(bind=conn, checkfirst=True)
+
+        if engine.dialect.name != "postgresql":
+            return
+        # Transacción aparte: CREATE EXTENSION puede requerir permisos que no tengamos
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for campo in _INDICES_TRIGRAMA:
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_gallos_{campo}_trgm "
+                    f"ON gallos USING gin ({campo} gin_trgm_ops)"
+                ))
@@ -0,0 +1,348 @@
+# 📥 app/services/gallo_importacion_service.py - Importación masiva de gallos con pedigrí
+"""
+Importa cientos de gallos (JSON, CSV o NDJSON) en UNA transacción:
+
+1. Valida cada fila como `GalloCreate` y acumula errores por fila.
+2. Resuelve padre/madre por código dentro del lote o contra los gallos del usuario.
+3. Verifica una sola vez el límite `gallos_maximo` de la suscripción.
+4. Inserta todas las filas con un INSERT multi-fila y enlaza padres,
+   madres e `id_gallo_genealogico` con un único UPDATE por lotes.
+"""
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from pydantic import ValidationError
+from sqlalchemy import insert, update, select
+from sqlalchemy.orm import Session
+
+from app.core.exceptions import ValidationException
+from app.models.gallo_simple import Gallo
+from app.schemas.gallo import GalloCreate
+from app.services.genealogia_cache import genealogia_cache
+from app.services.cierre_genealogico_service import CierreGenealogicoService
+from app.services.cuota_service import CuotaService
+
+MAX_FILAS_IMPORTACION = 1000
+
+_CAMPOS_PRINCIPAL = (
+    "nombre", "codigo_identificacion", "fecha_nacimiento", "peso", "altura", "color", "estado",
+    "procedencia", "notas", "color_plumaje", "color_placa", "ubicacion_placa", "color_patas",
+    "criador", "propietario_actual", "observaciones", "numero_registro",
+)
+_CAMPOS_PROGENITOR = ("color", "peso", "procedencia", "notas", "color_plumaje", "color_patas", "criador")
+_VERDADERO = {"true", "1", "si", "sí", "yes", "x"}
+_CAMPOS_BOOLEANOS = ("crear_padre", "crear_madre")
+
+
+class GalloImportacionService:
+
+    # ========================
+    # 📄 PARSEO DE ARCHIVOS
+    # ========================
+
+    @staticmethod
+    def _limpiar_fila(fila: Dict[str, Any]) -> Dict[str, Any]:
+        """Quitar celdas vacías y normalizar booleanos escritos en español"""
+        limpia = {}
+        for clave, valor in fila.items():
+            if clave is None:
+                continue
+            clave = clave.strip()
+            if isinstance(valor, str):
+                valor = valor.strip()
+                if valor == "":
+                    continue
+                if clave in _CAMPOS_BOOLEANOS:
+                    valor = valor.lower() in _VERDADERO
+            limpia[clave] = valor
+        return limpia
+
+    @staticmethod
+    def parsear_csv(archivo) -> Iterable[Dict[str, Any]]:
+        """Leer CSV (con encabezados = campos de GalloCreate) fila por fila"""
+        texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+        for fila in csv.DictReader(texto):
+            yield GalloImportacionService._limpiar_fila(fila)
+
+    @staticmethod
+    def parsear_ndjson(archivo) -> Iterable[Dict[str, Any]]:
+        """Leer NDJSON (un objeto JSON por línea) fila por fila"""
+        for numero, linea in enumerate(io.TextIOWrapper(archivo, encoding="utf-8-sig"), start=1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except json.JSONDecodeError as e:
+                fila = {"__error__": f"JSON inválido en línea {numero}: {e.msg}"}
+            yield fila if isinstance(fila, dict) else {"__error__": f"La línea {numero} no es un objeto"}
+
+    # ========================
+    # 📥 IMPORTACIÓN
+    # ========================
+
+    @staticmethod
+    def _codigos_en_ciclo(padres: Dict[str, List[str]]) -> Set[str]:
+        """Códigos que forman parte de un ciclo en el grafo código → padres del lote (DFS iterativo)"""
+        estado: Dict[str, int] = {}  # 1 = en la pila, 2 = terminado
+        en_ciclo: Set[str] = set()
+        for inicio in padres:
+            if inicio in estado:
+                continue
+            pila = [(inicio, iter(padres.get(inicio, ())))]
+            camino = [inicio]
+            estado[inicio] = 1
+            while pila:
+                codigo, siguientes = pila[-1]
+                siguiente = next(siguientes, None)
+                if siguiente is None:
+                    estado[codigo] = 2
+                    pila.pop()
+                    camino.pop()
+                elif estado.get(siguiente) == 1:
+                    en_ciclo.update(camino[camino.index(siguiente):])
+                elif siguiente not in estado:
+                    estado[siguiente] = 1
+                    pila.append((siguiente, iter(padres.get(siguiente, ()))))
+                    camino.append(siguiente)
+        return en_ciclo
+
+    @staticmethod
+    def importar(db: Session, user_id: int, filas: Iterable[Dict[str, Any]], todo_o_nada: bool = False) -> Dict[str, Any]:
+        """🔥 Importar un lote de gallos en una sola transacción"""
+        errores: List[Dict[str, Any]] = []
+        validos: List[tuple] = []  # (numero_fila, GalloCreate)
+        codigos_lote: Dict[str, int] = {}
+        total_filas = 0
+
+        def registrar_error(numero, codigo, mensaje):
+            errores.append({"fila": numero, "codigo_identificacion": codigo, "error": mensaje})
+
+        # 1️⃣ Validación fila por fila
+        for numero, fila in enumerate(filas, start=1):
+            total_filas = numero
+            if numero > MAX_FILAS_IMPORTACION:
+                raise ValidationException(f"Máximo {MAX_FILAS_IMPORTACION} gallos por importación")
+            codigo = fila.get("codigo_identificacion")
+            if "__error__" in fila:
+                registrar_error(numero, None, fila["__error__"])
+                continue
+            try:
+                gallo = GalloCreate.model_validate(fila)
+            except ValidationError as e:
+                detalle = "; ".join(
+                    f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+                )
+                registrar_error(numero, codigo, detalle)
+                continue
+            if gallo.codigo_identificacion in codigos_lote:
+                registrar_error(
+                    numero, gallo.codigo_identificacion,
+                    f"Código repetido en la fila {codigos_lote[gallo.codigo_identificacion]}"
+                )
+                continue
+            codigos_lote[gallo.codigo_identificacion] = numero
+            validos.append((numero, gallo))
+
+        # 2️⃣ Gallos existentes del usuario referenciados por código o id
+        codigos_referidos = set(codigos_lote)
+        ids_referidos = set()
+        for _, gallo in validos:
+            codigos_referidos.update(c for c in (gallo.padre_codigo, gallo.madre_codigo) if c)
+            ids_referidos.update(i for i in (gallo.padre_id, gallo.madre_id) if i)
+
+        existentes_por_codigo: Dict[str, int] = {}
+        if codigos_referidos:
+            existentes_por_codigo = dict(db.execute(
+                select(Gallo.codigo_identificacion, Gallo.id).where(
+                    Gallo.user_id == user_id,
+                    Gallo.codigo_identificacion.in_(codigos_referidos),
+                )
+            ).all())
+        ids_existentes = set()
+        if ids_referidos:
+            ids_existentes = set(db.execute(
+                select(Gallo.id).where(Gallo.user_id == user_id, Gallo.id.in_(ids_referidos))
+            ).scalars())
+
+        # 3️⃣ Resolución de padres (por id, por código del lote, por código existente o generándolo)
+        principales: List[Dict[str, Any]] = []
+        generados: Dict[str, Dict[str, Any]] = {}  # código → fila a crear
+        for numero, gallo in validos:
+            if gallo.codigo_identificacion in existentes_por_codigo:
+                registrar_error(numero, gallo.codigo_identificacion, "Ya existe un gallo con este código")
+                continue
+
+            enlaces = {}
+            error = None
+            for rol, tipo_registro, estado in (("padre", "padre_generado", "padre"), ("madre", "madre_generada", "madre")):
+                progenitor_id = getattr(gallo, f"{rol}_id")
+                progenitor_codigo = getattr(gallo, f"{rol}_codigo")
+                crear = getattr(gallo, f"crear_{rol}")
+
+                if progenitor_id:
+                    if progenitor_id not in ids_existentes:
+                        error = f"{rol}_id {progenitor_id} no existe"
+                        break
+                    enlaces[rol] = ("existente", progenitor_id)
+                elif progenitor_codigo and progenitor_codigo == gallo.codigo_identificacion:
+                    error = f"El {rol} no puede ser el mismo gallo"
+                    break
+                elif progenitor_codigo and progenitor_codigo in codigos_lote:
+                    enlaces[rol] = ("lote", progenitor_codigo)
+                elif progenitor_codigo and progenitor_codigo in existentes_por_codigo:
+                    enlaces[rol] = ("existente", existentes_por_codigo[progenitor_codigo])
+                elif crear and not progenitor_codigo:
+                    error = f"El código del {rol} es obligatorio si crear_{rol}=True"
+                    break
+                elif crear:
+                    if progenitor_codigo not in generados:
+                        datos = {
+                            campo: getattr(gallo, f"{rol}_{campo}") for campo in _CAMPOS_PROGENITOR
+                        }
+                        raza = getattr(gallo, f"{rol}_raza_id")
+                        generados[progenitor_codigo] = {
+                            **datos,
+                            "user_id": user_id,
+                            "nombre": getattr(gallo, f"{rol}_nombre") or f"{rol.capitalize()} de {gallo.nombre}",
+                            "codigo_identificacion": progenitor_codigo,
+                            "raza_id": str(raza) if raza is not None else None,
+                            "estado": estado,
+                            "tipo_registro": tipo_registro,
+                            "_creado_por": gallo.codigo_identificacion,
+                        }
+                    enlaces[rol] = ("generado", progenitor_codigo)
+                elif progenitor_codigo:
+                    error = f"No se encontró el {rol} con código {progenitor_codigo}"
+                    break
+
+            if error:
+                registrar_error(numero, gallo.codigo_identificacion, error)
+                continue
+
+            datos = {campo: getattr(gallo, campo) for campo in _CAMPOS_PRINCIPAL}
+            principales.append({
+                **datos,
+                "user_id": user_id,
+                "raza_id": str(gallo.raza_id) if gallo.raza_id is not None else None,
+                "tipo_registro": "principal",
+                "_fila": numero,
+                "_enlaces": enlaces,
+            })
+
+        # Padres que se apuntan entre sí dentro del lote: el pedigrí quedaría cíclico
+        en_ciclo = GalloImportacionService._codigos_en_ciclo({
+            p["codigo_identificacion"]: [v for origen, v in p["_enlaces"].values() if origen == "lote"]
+            for p in principales
+        })
+        for principal in [p for p in principales if p["codigo_identificacion"] in en_ciclo]:
+            registrar_error(principal["_fila"], principal["codigo_identificacion"],
+                            "Ciclo genealógico: el gallo sería su propio ancestro")
+            principales.remove(principal)
+
+        # Un código del lote que falló no puede ser padre de otra fila (ni sus descendientes en el lote)
+        codigos_validos = {p["codigo_identificacion"] for p in principales}
+        quitado = True
+        while quitado:
+            quitado = False
+            for principal in list(principales):
+                for rol, (origen, valor) in principal["_enlaces"].items():
+                    if origen == "lote" and valor not in codigos_validos:
+                        registrar_error(principal["_fila"], principal["codigo_identificacion"],
+                                        f"{'La' if rol == 'madre' else 'El'} {rol} {valor} tiene errores en su fila")
+                        principales.remove(principal)
+                        codigos_validos.discard(principal["codigo_identificacion"])
+                        quitado = True
+                        break
+
+        errores.sort(key=lambda e: e["fila"])
+        resultado = {
+            "total_filas": total_filas,
+            "creados": 0,
+            "padres_generados": 0,
+            "errores": errores,
+            "gallos": [],
+        }
+        if not principales or (todo_o_nada and errores):
+            resultado["success"] = False
+            resultado["message"] = "No se importó ningún gallo"
+            return resultado
+
+        # Padres generados que ya no se usan (su fila falló) no se crean; los demás quedan
+        # vinculados a la primera fila válida que los usa (la que los generó pudo fallar)
+        creadores: Dict[str, str] = {}
+        for principal in principales:
+            for origen, valor in principal["_enlaces"].values():
+                if origen == "generado":
+                    creadores.setdefault(valor, principal["codigo_identificacion"])
+        generados = {
+            codigo: {**fila, "_creado_por": creadores[codigo]}
+            for codigo, fila in generados.items() if codigo in creadores
+        }
+
+        # 4️⃣ Límite del plan (una sola verificación para todo el lote)
+        CuotaService.verificar(db, user_id, "gallos", cantidad=len(principales))
+
+        # 5️⃣ INSERT multi-fila de generados + principales
+        a_insertar = list(generados.values()) + principales
+        columnas = [{k: v for k, v in fila.items() if not k.startswith("_")} for fila in a_insertar]
+        try:
+            ids = db.execute(
+                insert(Gallo).returning(Gallo.id, sort_by_parameter_order=True),
+                columnas,
+            ).scalars().all()
+            ids_por_codigo = {fila["codigo_identificacion"]: gid for fila, gid in zip(a_insertar, ids)}
+
+            # 6️⃣ Enlaces genealógicos con un UPDATE por lotes
+            def resolver(enlace):
+                if enlace is None:
+                    return None
+                origen, valor = enlace
+                return valor if origen == "existente" else ids_por_codigo[valor]
+
+            cambios = []
+            for principal in principales:
+                gid = ids_por_codigo[principal["codigo_identificacion"]]
+                cambios.append({
+                    "id": gid,
+                    "padre_id": resolver(principal["_enlaces"].get("padre")),
+                    "madre_id": resolver(principal["_enlaces"].get("madre")),
+                    "id_gallo_genealogico": gid,
+                })
+            for codigo, fila in generados.items():
+                cambios.append({
+                    "id": ids_por_codigo[codigo],
+                    "id_gallo_genealogico": ids_por_codigo[fila["_creado_por"]],
+                })
+            db.execute(update(Gallo), cambios)
+
+            # Inserciones masivas no disparan eventos de mapper: mantener cierre y caché a mano
+            if CierreGenealogicoService.activo:
+                CierreGenealogicoService.aplicar_cambios(db.connection(), ids)
+            CuotaService.ajustar(db.connection(), user_id, "gallos", None, len(principales))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise ValidationException(f"Error importando gallos: {str(e)}")
+        finally:
+            genealogia_cache.invalidar(user_id)
+
+        resultado.update({
+            "success": True,
+            "creados": len(principales),
+            "padres_generados": len(generados),
+            "gallos": [
+                {
+                    "fila": principal["_fila"],
+                    "id": ids_por_codigo[principal["codigo_identificacion"]],
+                    "codigo_identificacion": principal["codigo_identificacion"],
+                    "padre_id": resolver(principal["_enlaces"].get("padre")),
+                    "madre_id": resolver(principal["_enlaces"].get("madre")),
+                }
+                for principal in principales
+            ],
+            "message": f"{len(principales)} gallos importados"
+            + (f", {len(errores)} filas con errores" if errores else ""),
+        })
+        return resultado
@@ -0,0 +1,229 @@
+# 🧠 app/services/genealogia_cache.py - Caché en memoria del grafo genealógico por usuario
+"""
+Mantiene por `user_id` un grafo compacto (arrays de enteros, sin objetos ORM)
+con id → padre_id / madre_id / id_gallo_genealogico y la lista de hijos de
+cada gallo. Se invalida automáticamente con los eventos de SQLAlchemy sobre
+`Gallo` y se desaloja por LRU cuando supera el presupuesto de memoria.
+
+⚠️ La caché es por proceso: con varios workers, cada uno invalida solo lo que
+escribe él mismo (el despliegue actual corre un único proceso uvicorn).
+⚠️ Las actualizaciones masivas (`query(...).update()` / `delete()`) no disparan
+eventos de mapper: quien las use debe llamar `genealogia_cache.invalidar(user_id)`.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event, select, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.gallo_simple import Gallo
+
+# 0 nunca es un id válido: se usa como "sin valor" dentro de los arrays
+SIN_VALOR = 0
+
+
+class GrafoGenealogico:
+    """🧬 Grafo de pedigrí de un usuario en formato CSR (arrays de int32)"""
+
+    __slots__ = ("ids", "padres", "madres", "genealogicos", "hijos_inicio", "hijos", "familias_claves", "familias_ids")
+
+    def __init__(self, filas: List[Tuple[int, Optional[int], Optional[int], Optional[int]]]):
+        # filas: (id, padre_id, madre_id, id_gallo_genealogico) ordenadas por id
+        self.ids = array("i", (f[0] for f in filas))
+        self.padres = array("i", (f[1] or SIN_VALOR for f in filas))
+        self.madres = array("i", (f[2] or SIN_VALOR for f in filas))
+        self.genealogicos = array("i", (f[3] or SIN_VALOR for f in filas))
+
+        # 👶 Hijos: hijos[hijos_inicio[i]:hijos_inicio[i + 1]] son los hijos del gallo i
+        total = len(self.ids)
+        conteo = [0] * (total + 1)
+        enlaces = []
+        for pos in range(total):
+            for progenitor in (self.padres[pos], self.madres[pos]):
+                idx = self.indice(progenitor)
+                if idx >= 0:
+                    conteo[idx + 1] += 1
+                    enlaces.append((idx, pos))
+        for pos in range(total):
+            conteo[pos + 1] += conteo[pos]
+        self.hijos_inicio = array("i", conteo)
+        hijos = array("i", bytes(4 * len(enlaces)))
+        siguiente = list(conteo)
+        for idx, pos in enlaces:
+            hijos[siguiente[idx]] = pos
+            siguiente[idx] += 1
+        self.hijos = hijos
+
+        # 👨‍👩‍👧 Familias por id_gallo_genealogico: posiciones ordenadas por clave
+        orden = sorted((g, pos) for pos, g in enumerate(self.genealogicos) if g != SIN_VALOR)
+        self.familias_claves = array("i", (g for g, _ in orden))
+        self.familias_ids = array("i", (self.ids[pos] for _, pos in orden))
+
+    def indice(self, gallo_id: Optional[int]) -> int:
+        """Posición del gallo en los arrays (-1 si no pertenece al grafo)"""
+        if not gallo_id:
+            return -1
+        pos = bisect_left(self.ids, gallo_id)
+        if pos < len(self.ids) and self.ids[pos] == gallo_id:
+            return pos
+        return -1
+
+    def contiene(self, gallo_id: Optional[int]) -> bool:
+        return self.indice(gallo_id) >= 0
+
+    def padres_de(self, gallo_id: int) -> Tuple[Optional[int], Optional[int]]:
+        """(padre_id, madre_id) tal como están en la BD"""
+        pos = self.indice(gallo_id)
+        if pos < 0:
+            return None, None
+        return self.padres[pos] or None, self.madres[pos] or None
+
+    def hijos_de(self, gallo_id: int) -> List[Tuple[int, str]]:
+        """[(hijo_id, relacion)] con relacion 'hijo_como_padre' / 'hijo_como_madre'"""
+        pos = self.indice(gallo_id)
+        if pos < 0:
+            return []
+        resultado = []
+        for hijo_pos in self.hijos[self.hijos_inicio[pos]:self.hijos_inicio[pos + 1]]:
+            relacion = "hijo_como_padre" if self.padres[hijo_pos] == gallo_id else "hijo_como_madre"
+            resultado.append((self.ids[hijo_pos], relacion))
+        return resultado
+
+    def familia(self, id_gallo_genealogico: int) -> List[int]:
+        """Ids de todos los gallos con el mismo id_gallo_genealogico"""
+        inicio = bisect_left(self.familias_claves, id_gallo_genealogico)
+        fin = inicio
+        while fin < len(self.familias_claves) and self.familias_claves[fin] == id_gallo_genealogico:
+            fin += 1
+        return list(self.familias_ids[inicio:fin])
+
+    @property
+    def bytes_usados(self) -> int:
+        """Memoria aproximada ocupada por los arrays"""
+        return sum(a.itemsize * len(a) for a in (
+            self.ids, self.padres, self.madres, self.genealogicos,
+            self.hijos_inicio, self.hijos, self.familias_claves, self.familias_ids,
+        )) + 512
+
+
+class GenealogiaCache:
+    """🗃️ LRU de grafos por usuario limitado por presupuesto de memoria"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._grafos: "OrderedDict[int, GrafoGenealogico]" = OrderedDict()
+        self._bytes = 0
+        self._generacion = 0  # Cambia con cada invalidación (evita guardar cargas obsoletas)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.desalojos = 0
+
+    @property
+    def habilitado(self) -> bool:
+        return self.max_bytes > 0
+
+    def obtener(self, db: Session, user_id: int) -> GrafoGenealogico:
+        """Grafo del usuario (lo carga con una sola consulta si no está en caché)"""
+        with self._lock:
+            grafo = self._grafos.get(user_id)
+            if grafo is not None:
+                self._grafos.move_to_end(user_id)
+                self.hits += 1
+                return grafo
+            self.misses += 1
+            generacion = self._generacion
+
+        filas = db.execute(
+            select(Gallo.id, Gallo.padre_id, Gallo.madre_id, Gallo.id_gallo_genealogico)
+            .where(Gallo.user_id == user_id)
+            .order_by(Gallo.id)
+        ).all()
+        grafo = GrafoGenealogico(filas)
+
+        with self._lock:
+            if generacion == self._generacion and grafo.bytes_usados <= self.max_bytes:
+                self._guardar(user_id, grafo)
+        return grafo
+
+    def _guardar(self, user_id: int, grafo: GrafoGenealogico):
+        anterior = self._grafos.pop(user_id, None)
+        if anterior is not None:
+            self._bytes -= anterior.bytes_usados
+        self._grafos[user_id] = grafo
+        self._bytes += grafo.bytes_usados
+        while self._bytes > self.max_bytes and self._grafos:
+            _, desalojado = self._grafos.popitem(last=False)
+            self._bytes -= desalojado.bytes_usados
+            self.desalojos += 1
+
+    def invalidar(self, user_id: int):
+        """Descartar el grafo de un usuario"""
+        with self._lock:
+            self._generacion += 1
+            grafo = self._grafos.pop(user_id, None)
+            if grafo is not None:
+                self._bytes -= grafo.bytes_usados
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self._grafos.clear()
+            self._bytes = 0
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "usuarios": len(self._grafos),
+                "bytes_usados": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "desalojos": self.desalojos,
+            }
+
+
+genealogia_cache = GenealogiaCache(settings.GENEALOGIA_CACHE_MB * 1024 * 1024)
+
+
+# ========================
+# 🔔 INVALIDACIÓN POR EVENTOS
+# ========================
+
+def _usuarios_afectados(target: Gallo) -> set:
+    """user_id actual y anterior (si el gallo cambió de dueño)"""
+    usuarios = {target.user_id}
+    historial = inspect(target).attrs.user_id.history
+    usuarios.update(historial.deleted or ())
+    return {u for u in usuarios if u is not None}
+
+
+def _invalidar_por_escritura(mapper, connection, target):
+    usuarios = _usuarios_afectados(target)
+    for user_id in usuarios:
+        genealogia_cache.invalidar(user_id)
+
+    # Repetir al confirmar: otra petición pudo recargar el grafo antes del commit
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("genealogia_invalidar", set()).update(usuarios)
+
+
+def _invalidar_al_terminar(session):
+    for user_id in session.info.pop("genealogia_invalidar", ()):
+        genealogia_cache.invalidar(user_id)
+
+
+for _evento in ("after_insert", "after_update", "after_delete"):
+    event.listen(Gallo, _evento, _invalidar_por_escritura)
+
+def _invalidar_al_revertir(session, previous_transaction):
+    _invalidar_al_terminar(session)
+
+
+event.listen(Session, "after_commit", _invalidar_al_terminar)
+event.listen(Session, "after_soft_rollback", _invalidar_al_revertir)
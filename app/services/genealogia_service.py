@@ -0,0 +1,374 @@
+# 🧬 app/services/genealogia_service.py - Motor de Pedigrí con consultas recursivas
+"""
+Resuelve la genealogía de un gallo recorriendo el grafo en memoria del usuario
+(`genealogia_cache`) y cargando los gallos con un único `IN`. Sin caché, usa
+UNA sola consulta `WITH RECURSIVE` sobre padre_id/madre_id en lugar de cargar
+cada ancestro de forma perezosa.
+"""
+import sqlite3
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy import select, literal, case, cast, null, union_all, and_, or_, func, true, String, Integer
+from sqlalchemy.orm import Session, aliased
+
+from app.models.gallo_simple import Gallo
+from app.schemas.gallo import GalloSimple
+from app.services.genealogia_cache import genealogia_cache
+
+# 🛡️ Tope de generaciones para recorridos "ilimitados" (protege ante ciclos en datos corruptos)
+MAX_GENERACIONES = 50
+
+
+class GenealogiaService:
+
+    @staticmethod
+    def _soporta_cte_recursivo(db: Session) -> bool:
+        """SQLite soporta WITH RECURSIVE desde 3.8.3; PostgreSQL siempre"""
+        dialecto = db.get_bind().dialect.name
+        if dialecto == "sqlite":
+            return sqlite3.sqlite_version_info >= (3, 8, 3)
+        return True
+
+    @staticmethod
+    def _cargar_gallos(db: Session, ids) -> Dict[int, Gallo]:
+        """Cargar gallos por id con una sola consulta IN"""
+        if not ids:
+            return {}
+        return {g.id: g for g in db.query(Gallo).filter(Gallo.id.in_(set(ids))).all()}
+
+    @staticmethod
+    def get_familia_completa(db: Session, gallo: Gallo) -> List[Gallo]:
+        """🔥 Toda la familia por id_gallo_genealogico"""
+        if not gallo.id_gallo_genealogico:
+            return [gallo]
+
+        if genealogia_cache.habilitado:
+            grafo = genealogia_cache.obtener(db, gallo.user_id)
+            ids = grafo.familia(gallo.id_gallo_genealogico)
+            if gallo.id in ids:
+                cargados = GenealogiaService._cargar_gallos(db, ids)
+                return [cargados[i] for i in ids if i in cargados]
+
+        return db.query(Gallo).filter(
+            Gallo.id_gallo_genealogico == gallo.id_gallo_genealogico
+        ).all()
+
+    @staticmethod
+    def get_ancestros(db: Session, gallo: Gallo, max_depth: int = 5) -> List[Dict[str, Any]]:
+        """🌳 Ancestros hasta `max_depth` generaciones
+
+        Devuelve la misma estructura que el recorrido recursivo original
+        ({'gallo', 'relacion', 'nivel'}) y en el mismo orden (padre y su
+        línea primero, luego madre y su línea).
+        """
+        if max_depth <= 0 or (gallo.padre_id is None and gallo.madre_id is None):
+            return []
+
+        if genealogia_cache.habilitado:
+            resultado = GenealogiaService._get_ancestros_en_grafo(db, gallo, max_depth)
+            if resultado is not None:
+                return resultado
+
+        return GenealogiaService._get_ancestros_sql(db, gallo, max_depth)
+
+    @staticmethod
+    def _get_ancestros_en_grafo(db: Session, gallo: Gallo, max_depth: int) -> Optional[List[Dict[str, Any]]]:
+        """Recorrido en memoria; None si el pedigrí sale del grafo del usuario"""
+        grafo = genealogia_cache.obtener(db, gallo.user_id)
+        if not grafo.contiene(gallo.id):
+            return None
+
+        visitados = []  # (gallo_id, relacion, nivel) en preorden
+
+        def recorrer(gallo_id, nivel_actual):
+            if nivel_actual >= max_depth:
+                return True
+            for relacion, pid in zip(('padre', 'madre'), grafo.padres_de(gallo_id)):
+                if pid is None:
+                    continue
+                if not grafo.contiene(pid):
+                    return False
+                visitados.append((pid, relacion, nivel_actual + 1))
+                if not recorrer(pid, nivel_actual + 1):
+                    return False
+            return True
+
+        if not recorrer(gallo.id, 0):
+            return None
+
+        cargados = GenealogiaService._cargar_gallos(db, [v[0] for v in visitados])
+        return [
+            {'gallo': cargados[gid], 'relacion': relacion, 'nivel': nivel}
+            for gid, relacion, nivel in visitados
+            if gid in cargados
+        ]
+
+    @staticmethod
+    def _get_ancestros_sql(db: Session, gallo: Gallo, max_depth: int) -> List[Dict[str, Any]]:
+        """Ancestros en un solo round-trip con WITH RECURSIVE"""
+        if not GenealogiaService._soporta_cte_recursivo(db):
+            return GenealogiaService._get_ancestros_por_niveles(db, gallo, max_depth)
+
+        # Lado del árbol: '0' = padre, '1' = madre (la ruta concatenada ordena en preorden)
+        lados = union_all(
+            select(literal("0", String).label("lado")),
+            select(literal("1", String).label("lado")),
+        ).subquery("lados")
+
+        ancestros = select(
+            literal(gallo.id, Integer).label("gallo_id"),
+            cast(null(), String).label("relacion"),
+            literal(0, Integer).label("nivel"),
+            literal("", String).label("ruta"),
+        ).cte("ancestros", recursive=True)
+
+        hijo = aliased(Gallo, name="hijo")
+        es_padre = lados.c.lado == "0"
+        progenitor_id = case((es_padre, hijo.padre_id), else_=hijo.madre_id)
+
+        ancestros = ancestros.union_all(
+            select(
+                progenitor_id,
+                cast(case((es_padre, "padre"), else_="madre"), String),
+                ancestros.c.nivel + 1,
+                ancestros.c.ruta + lados.c.lado,
+            )
+            .select_from(ancestros)
+            .join(hijo, hijo.id == ancestros.c.gallo_id)
+            .join(lados, true())
+            .where(ancestros.c.nivel < max_depth, progenitor_id.isnot(None))
+        )
+
+        filas = db.execute(
+            select(Gallo, ancestros.c.relacion, ancestros.c.nivel)
+            .join(ancestros, Gallo.id == ancestros.c.gallo_id)
+            .where(ancestros.c.nivel > 0)
+            .order_by(ancestros.c.ruta)
+        ).all()
+
+        return [
+            {'gallo': ancestro, 'relacion': relacion, 'nivel': nivel}
+            for ancestro, relacion, nivel in filas
+        ]
+
+    @staticmethod
+    def _get_ancestros_por_niveles(db: Session, gallo: Gallo, max_depth: int) -> List[Dict[str, Any]]:
+        """🐢 Fallback sin CTE: una consulta IN por generación (max_depth consultas)"""
+        cargados = {gallo.id: gallo}
+        frontera = [gallo.id]
+
+        for _ in range(max_depth):
+            ids_padres = {
+                pid
+                for gid in frontera
+                for pid in (cargados[gid].padre_id, cargados[gid].madre_id)
+                if pid is not None and pid not in cargados
+            }
+            if not ids_padres:
+                break
+            for ancestro in db.query(Gallo).filter(Gallo.id.in_(ids_padres)).all():
+                cargados[ancestro.id] = ancestro
+            frontera = [pid for pid in ids_padres if pid in cargados]
+
+        ancestros = []
+
+        def recorrer(actual, nivel_actual):
+            if nivel_actual >= max_depth:
+                return
+            for relacion, pid in (('padre', actual.padre_id), ('madre', actual.madre_id)):
+                progenitor = cargados.get(pid) if pid is not None else None
+                if progenitor is None:
+                    continue
+                ancestros.append({'gallo': progenitor, 'relacion': relacion, 'nivel': nivel_actual + 1})
+                recorrer(progenitor, nivel_actual + 1)
+
+        recorrer(gallo, 0)
+        return ancestros
+
+    @staticmethod
+    def _consultar_descendientes(
+        db: Session,
+        gallo: Gallo,
+        max_depth: Optional[int] = None,
+        limit_por_nivel: Optional[int] = None,
+        offset_por_nivel: int = 0,
+    ):
+        """Filas (gallo, relacion, nivel, progenitor_id, total_nivel) desde caché o SQL"""
+        if genealogia_cache.habilitado:
+            grafo = genealogia_cache.obtener(db, gallo.user_id)
+            if grafo.contiene(gallo.id):
+                return GenealogiaService._descendientes_en_grafo(
+                    db, grafo, gallo.id, max_depth, limit_por_nivel, offset_por_nivel
+                )
+
+        return GenealogiaService._descendientes_sql(
+            db, gallo.id, max_depth, limit_por_nivel, offset_por_nivel
+        )
+
+    @staticmethod
+    def _descendientes_en_grafo(db: Session, grafo, gallo_id: int, max_depth, limit_por_nivel, offset_por_nivel):
+        """BFS en memoria con la misma semántica que la consulta recursiva"""
+        limite = min(max_depth or MAX_GENERACIONES, MAX_GENERACIONES)
+        vistos = {gallo_id}
+        frontera = [gallo_id]
+        filas = []  # (gallo_id, relacion, nivel, progenitor_id, total_nivel)
+
+        for nivel in range(1, limite + 1):
+            candidatos = {}
+            for progenitor_id in frontera:
+                for hijo_id, relacion in grafo.hijos_de(progenitor_id):
+                    if hijo_id in vistos:
+                        continue
+                    actual = candidatos.get(hijo_id)
+                    # Igual que en SQL: a igual generación gana la línea paterna
+                    if actual is None or (relacion == "hijo_como_padre" and actual[0] != relacion):
+                        candidatos[hijo_id] = (relacion, progenitor_id)
+            if not candidatos:
+                break
+
+            orden = sorted(candidatos.items(), key=lambda c: (c[1][0] != "hijo_como_padre", c[0]))
+            fin = None if limit_por_nivel is None else offset_por_nivel + limit_por_nivel
+            for hijo_id, (relacion, progenitor_id) in orden[offset_por_nivel:fin]:
+                filas.append((hijo_id, relacion, nivel, progenitor_id, len(orden)))
+
+            vistos.update(candidatos)
+            frontera = list(candidatos)
+
+        cargados = GenealogiaService._cargar_gallos(db, [f[0] for f in filas])
+        return [(cargados[f[0]],) + f[1:] for f in filas if f[0] in cargados]
+
+    @staticmethod
+    def _descendientes_sql(
+        db: Session,
+        gallo_id: int,
+        max_depth: Optional[int] = None,
+        limit_por_nivel: Optional[int] = None,
+        offset_por_nivel: int = 0,
+    ):
+        """👶 Descendientes de todas las generaciones en una sola consulta recursiva
+
+        Cada gallo aparece una sola vez (en su generación más cercana) aunque
+        descienda por varias líneas. La paginación se aplica por generación.
+
+        La recursión solo arrastra (gallo_id, nivel) y usa UNION: un gallo
+        alcanzado por padre y madre a la vez se expande una vez por generación,
+        no una vez por camino (en crianza en línea los caminos crecen 2^n).
+        Relación y progenitor se resuelven al final contra la generación anterior.
+        """
+        limite = min(max_depth or MAX_GENERACIONES, MAX_GENERACIONES)
+
+        descendientes = select(
+            literal(gallo_id, Integer).label("gallo_id"),
+            literal(0, Integer).label("nivel"),
+        ).cte("descendientes", recursive=True)
+
+        hijo = aliased(Gallo, name="hijo")
+        descendientes = descendientes.union(
+            select(hijo.id, descendientes.c.nivel + 1)
+            .select_from(descendientes)
+            .join(
+                hijo,
+                or_(hijo.padre_id == descendientes.c.gallo_id, hijo.madre_id == descendientes.c.gallo_id),
+            )
+            .where(descendientes.c.nivel < limite)
+        )
+
+        # Un gallo alcanzado por varias líneas se queda con la generación más cercana
+        cercanos = (
+            select(descendientes.c.gallo_id, func.min(descendientes.c.nivel).label("nivel"))
+            .where(descendientes.c.nivel > 0, descendientes.c.gallo_id != gallo_id)
+            .group_by(descendientes.c.gallo_id)
+            .subquery("cercanos")
+        )
+
+        # Progenitor: el padre o la madre presente en la generación anterior (gana la línea paterna)
+        previo = descendientes.alias("previo")
+        relacion = case(
+            (hijo.padre_id == previo.c.gallo_id, "hijo_como_padre"),
+            else_="hijo_como_madre",
+        )
+        unicos = (
+            select(
+                cercanos.c.gallo_id,
+                previo.c.gallo_id.label("progenitor_id"),
+                relacion.label("relacion"),
+                cercanos.c.nivel,
+                func.row_number().over(
+                    partition_by=cercanos.c.gallo_id,
+                    order_by=relacion.desc(),
+                ).label("rn_gallo"),
+            )
+            .select_from(cercanos)
+            .join(hijo, hijo.id == cercanos.c.gallo_id)
+            .join(
+                previo,
+                and_(
+                    previo.c.nivel == cercanos.c.nivel - 1,
+                    or_(previo.c.gallo_id == hijo.padre_id, previo.c.gallo_id == hijo.madre_id),
+                ),
+            )
+            .subquery("unicos")
+        )
+
+        por_nivel = select(
+            unicos.c.gallo_id,
+            unicos.c.progenitor_id,
+            unicos.c.relacion,
+            unicos.c.nivel,
+            func.row_number().over(
+                partition_by=unicos.c.nivel,
+                order_by=(unicos.c.relacion.desc(), unicos.c.gallo_id),
+            ).label("posicion"),
+            func.count().over(partition_by=unicos.c.nivel).label("total_nivel"),
+        ).where(unicos.c.rn_gallo == 1).subquery("por_nivel")
+
+        consulta = (
+            select(Gallo, por_nivel.c.relacion, por_nivel.c.nivel, por_nivel.c.progenitor_id, por_nivel.c.total_nivel)
+            .join(por_nivel, Gallo.id == por_nivel.c.gallo_id)
+            .where(por_nivel.c.posicion > offset_por_nivel)
+            .order_by(por_nivel.c.nivel, por_nivel.c.posicion)
+        )
+        if limit_por_nivel is not None:
+            consulta = consulta.where(por_nivel.c.posicion <= offset_por_nivel + limit_por_nivel)
+
+        return db.execute(consulta).all()
+
+    @staticmethod
+    def get_descendientes(db: Session, gallo: Gallo, max_depth: Optional[int] = 1) -> List[Dict[str, Any]]:
+        """👶 Descendientes como objetos ORM ({'gallo', 'relacion', 'nivel'})"""
+        filas = GenealogiaService._consultar_descendientes(db, gallo, max_depth=max_depth)
+        return [
+            {'gallo': descendiente, 'relacion': relacion, 'nivel': nivel}
+            for descendiente, relacion, nivel, _, _ in filas
+        ]
+
+    @staticmethod
+    def get_arbol_descendientes(
+        db: Session,
+        gallo: Gallo,
+        max_depth: Optional[int] = None,
+        limit_por_nivel: Optional[int] = None,
+        offset_por_nivel: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """🌳 Árbol de descendientes listo para `ArbolGenealogico.descendientes`
+
+        `max_depth=None` recorre todas las generaciones (hasta MAX_GENERACIONES
+        como protección ante ciclos en datos corruptos).
+        """
+        filas = GenealogiaService._consultar_descendientes(
+            db,
+            gallo,
+            max_depth=max_depth,
+            limit_por_nivel=limit_por_nivel,
+            offset_por_nivel=offset_por_nivel,
+        )
+        return [
+            {
+                'gallo': GalloSimple.model_validate(descendiente).model_dump(),
+                'relacion': relacion,
+                'nivel': nivel,
+                'progenitor_id': progenitor_id,
+                'total_nivel': total_nivel,
+            }
+            for descendiente, relacion, nivel, progenitor_id, total_nivel in filas
+        ]
@@ -0,0 +1,116 @@
+# 🔁 app/services/idempotencia_service.py - Reintentos seguros con Idempotency-Key
+"""
+El cliente manda `Idempotency-Key: <uuid>` al crear un pago. La primera
+respuesta se guarda en `claves_idempotencia` en la MISMA transacción que el
+pago; un reintento con la misma clave (doble toque, red inestable) recibe esa
+respuesta sin crear otra fila. Dos peticiones simultáneas con la misma clave
+chocan en la clave primaria y la segunda devuelve la respuesta de la primera.
+
+Las claves viven `IDEMPOTENCIA_TTL_HORAS` y se purgan por lotes.
+
+Limpieza manual: `python -m app.services.idempotencia_service`
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select, delete, inspect, tuple_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.exceptions import ValidationException
+from app.models.clave_idempotencia import ClaveIdempotencia
+
+MAX_LONGITUD_CLAVE = 100
+
+
+class IdempotenciaService:
+
+    @staticmethod
+    def huella(cuerpo: Any) -> str:
+        """sha256 del cuerpo en JSON canónico (orden de claves estable)"""
+        return hashlib.sha256(
+            json.dumps(cuerpo, sort_keys=True, default=str, separators=(",", ":")).encode()
+        ).hexdigest()
+
+    @staticmethod
+    def validar_clave(clave: Optional[str]) -> Optional[str]:
+        if clave is None:
+            return None
+        clave = clave.strip()
+        if not clave or len(clave) > MAX_LONGITUD_CLAVE:
+            raise ValidationException(f"Idempotency-Key debe tener entre 1 y {MAX_LONGITUD_CLAVE} caracteres")
+        return clave
+
+    @staticmethod
+    def obtener(db: Session, user_id: int, clave: str, operacion: str, huella: str) -> Optional[Dict[str, Any]]:
+        """Respuesta guardada para la clave (None si no existe o expiró)"""
+        registro = db.execute(
+            select(ClaveIdempotencia).where(
+                ClaveIdempotencia.user_id == user_id,
+                ClaveIdempotencia.clave == clave,
+            )
+        ).scalars().first()
+        if registro is None:
+            return None
+        if registro.expira_en <= datetime.utcnow():
+            db.delete(registro)
+            db.flush()
+            return None
+        if registro.operacion != operacion or registro.huella != huella:
+            raise ValidationException(
+                "Idempotency-Key ya usada con otra petición",
+                detail="Genere una clave nueva para cada operación distinta"
+            )
+        return registro.respuesta
+
+    @staticmethod
+    def registrar(db: Session, user_id: int, clave: str, operacion: str, huella: str,
+                  respuesta: Dict[str, Any]):
+        """Guardar la respuesta (sin commit: va en la transacción de la operación)"""
+        db.add(ClaveIdempotencia(
+            user_id=user_id,
+            clave=clave,
+            operacion=operacion,
+            huella=huella,
+            respuesta=respuesta,
+            expira_en=datetime.utcnow() + timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS),
+        ))
+
+    @staticmethod
+    def purgar_expiradas(db: Session, lote: int = 1000) -> int:
+        """Borrar claves vencidas por lotes cortos"""
+        total = 0
+        while True:
+            claves = db.execute(
+                select(ClaveIdempotencia.user_id, ClaveIdempotencia.clave)
+                .where(ClaveIdempotencia.expira_en <= datetime.utcnow())
+                .limit(lote)
+            ).all()
+            if not claves:
+                return total
+            db.execute(delete(ClaveIdempotencia).where(
+                tuple_(ClaveIdempotencia.user_id, ClaveIdempotencia.clave).in_([tuple(c) for c in claves])
+            ))
+            db.commit()
+            total += len(claves)
+
+    @staticmethod
+    def inicializar(engine):
+        """Crear la tabla si falta"""
+        with engine.begin() as conn:
+            if not inspect(conn).has_table(ClaveIdempotencia.__tablename__):
+                ClaveIdempotencia.__table__.create(bind=conn)
+                print(f"✅ Tabla {ClaveIdempotencia.__tablename__} creada")
+
+
+if __name__ == "__main__":
+    import app.models  # noqa: F401 - registrar todos los modelos
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"✅ Claves de idempotencia eliminadas: {IdempotenciaService.purgar_expiradas(db)}")
+    finally:
+        db.close()
@@ -0,0 +1,115 @@
+# 🖼️ app/services/imagen_service.py - Variantes WebP generadas antes de subir
+"""
+Las fotos de celular (4-8 MB) ya no viajan enteras a Cloudinary: el worker de
+subidas genera aquí las variantes de `PhotoUrls` y sube solo esos WebP.
+
+- Decodificación reducida (`draft`): un JPEG se decodifica directo a 1/2, 1/4 u
+  1/8 de su tamaño si la variante más grande lo permite.
+- La orientación EXIF se aplica a los píxeles y luego se descarta todo el
+  metadato (GPS, modelo del celular...).
+- Cada variante se redimensiona desde la anterior (de mayor a menor) y se
+  codifica WebP en un pool de procesos (PIL es CPU puro).
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from app.core.config import settings
+from app.core.exceptions import ValidationException
+
+# nombre → (ancho, alto, recortar): recortar = llenar el cuadro exacto; si no, encajar sin agrandar
+VARIANTES: Dict[str, Tuple[int, int, bool]] = {
+    "large": (1280, 1280, False),
+    "medium": (600, 600, False),
+    "thumbnail": (200, 200, True),
+    "avatar": (200, 200, True),
+}
+VARIANTES_FOTO = ["large", "medium", "thumbnail"]  # la primera es la URL principal
+VARIANTES_AVATAR = ["avatar"]
+
+
+def _generar_variantes(ruta: str, base: str, especificaciones: List[Tuple[str, int, int, bool]],
+                       calidad: int) -> Dict[str, str]:
+    """Escribir `{base}_{nombre}.webp` por variante (se ejecuta en otro proceso: solo rutas y números)"""
+    from PIL import ImageOps
+
+    lado = max(max(ancho, alto) for _, ancho, alto, _ in especificaciones)
+    with Image.open(ruta) as original:
+        original.draft("RGB", (lado, lado))
+        imagen = ImageOps.exif_transpose(original)
+    if imagen.mode not in ("RGB", "RGBA"):
+        con_alfa = "A" in imagen.getbands() or "transparency" in imagen.info
+        imagen = imagen.convert("RGBA" if con_alfa else "RGB")
+    imagen.info.clear()
+
+    rutas = {}
+    fuente = imagen
+    for nombre, ancho, alto, recortar in sorted(especificaciones, key=lambda e: -max(e[1], e[2])):
+        if recortar:
+            salida = ImageOps.fit(fuente, (ancho, alto), Image.LANCZOS)
+        else:
+            salida = fuente.copy()
+            salida.thumbnail((ancho, alto), Image.LANCZOS)
+            fuente = salida  # la siguiente variante parte de esta (menos píxeles que reducir)
+        destino = f"{base}_{nombre}.webp"
+        salida.save(destino, "WEBP", quality=calidad, method=4, exif=b"")
+        rutas[nombre] = destino
+    return rutas
+
+
+class ImagenService:
+    _executor: Optional[ProcessPoolExecutor] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def validar_nombres(nombres: List[str]):
+        desconocidas = [n for n in nombres if n not in VARIANTES]
+        if not nombres or desconocidas:
+            raise ValidationException(f"Variantes de imagen inválidas: {desconocidas or nombres}")
+
+    @staticmethod
+    def validar(ruta: str):
+        """Comprobar que el archivo es una imagen leyendo solo la cabecera (rápido)"""
+        from PIL import UnidentifiedImageError
+
+        try:
+            with Image.open(ruta) as imagen:
+                imagen.size
+        except (UnidentifiedImageError, OSError):
+            raise ValidationException("El archivo debe ser una imagen (JPG, PNG o WebP)")
+
+    @staticmethod
+    def rutas_variantes(ruta: str, nombres: List[str]) -> Dict[str, str]:
+        base = os.path.splitext(ruta)[0]
+        return {nombre: f"{base}_{nombre}.webp" for nombre in nombres}
+
+    @classmethod
+    def _obtener_executor(cls) -> ProcessPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ProcessPoolExecutor(max_workers=max(settings.IMAGEN_WORKERS, 1))
+            return cls._executor
+
+    @classmethod
+    def generar_variantes(cls, ruta: str, nombres: List[str]) -> Dict[str, str]:
+        """Variantes WebP junto al archivo original → {nombre: ruta}. Bloqueante (workers de subidas)"""
+        cls.validar_nombres(nombres)
+        especificaciones = [(nombre, *VARIANTES[nombre]) for nombre in nombres]
+        futuro = cls._obtener_executor().submit(
+            _generar_variantes, ruta, os.path.splitext(ruta)[0], especificaciones, settings.IMAGEN_CALIDAD_WEBP
+        )
+        try:
+            return futuro.result()
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            # Corrupta, formato no soportado o demasiados píxeles: reintentar no sirve
+            raise ValidationException(f"No se pudo procesar la imagen: {e}")
+
+    @classmethod
+    def apagar(cls):
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=False, cancel_futures=True)
+                cls._executor = None
@@ -0,0 +1,190 @@
+# 📋 app/services/plan_registro.py - Catálogo de planes en memoria con versión
+"""
+`planes_catalogo` casi nunca cambia pero se lee en cada listado de planes,
+creación de pago y activación de suscripción. Aquí se carga una vez (solo
+planes activos, por `orden`) en un snapshot inmutable con el JSON ya
+serializado y su ETag, y las lecturas no tocan la BD.
+
+Recarga:
+- Cualquier alta/edición/baja de `PlanCatalogo` por el ORM incrementa
+  `catalogo_versiones['planes']` en la misma transacción y, al confirmar,
+  este proceso recarga su snapshot (con `AsyncSession` no se puede abrir una
+  conexión desde el evento: el snapshot queda marcado como obsoleto y lo
+  recarga la siguiente lectura o el sondeo).
+- Los demás procesos comparan la versión cada `PLANES_VERIFICAR_SEG` segundos
+  (una lectura por clave primaria) y recargan si cambió.
+
+⚠️ Los `query(PlanCatalogo).update()` masivos no disparan eventos: quien los
+use debe llamar `registro_planes.incrementar_version(conn)`.
+"""
+import hashlib
+import json
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from sqlalchemy import event, select, update, inspect
+from sqlalchemy.orm import Session
+
+from app.models.plan_catalogo import PlanCatalogo
+from app.models.catalogo_version import CatalogoVersion
+
+CLAVE_PLANES = "planes"
+version_tabla = CatalogoVersion.__table__
+
+
+class CatalogoPlanes:
+    """Snapshot inmutable del catálogo (se reemplaza entero, nunca se modifica)"""
+
+    __slots__ = ("version", "planes", "_por_codigo", "_json_por_codigo", "json", "etag")
+
+    def __init__(self, version: int, planes: Tuple[Dict[str, Any], ...]):
+        self.version = version
+        self.planes = tuple(MappingProxyType(p) for p in planes)
+        self._por_codigo = {p["codigo"]: p for p in self.planes}
+        self._json_por_codigo = {
+            p["codigo"]: json.dumps({"success": True, "data": dict(p)}, ensure_ascii=False).encode()
+            for p in planes
+        }
+        self.json = json.dumps(
+            {"success": True, "data": [dict(p) for p in planes], "version": version},
+            ensure_ascii=False,
+        ).encode()
+        self.etag = f'"planes-{version}-{hashlib.sha1(self.json).hexdigest()[:16]}"'
+
+    def obtener(self, codigo: str) -> Optional[Mapping[str, Any]]:
+        return self._por_codigo.get(codigo)
+
+    def json_plan(self, codigo: str) -> Optional[bytes]:
+        return self._json_por_codigo.get(codigo)
+
+    def etag_plan(self, codigo: str) -> str:
+        return f'"plan-{codigo}-{self.version}"'
+
+
+class RegistroPlanes:
+    """🗃️ Dueño del snapshot vigente; el reemplazo es una asignación atómica"""
+
+    def __init__(self):
+        self._actual = CatalogoPlanes(0, ())
+        self._lock = threading.Lock()  # Solo serializa recargas, las lecturas no lo usan
+        self._obsoleto = False
+        self.recargas = 0
+
+    @property
+    def actual(self) -> CatalogoPlanes:
+        return self._actual
+
+    @property
+    def cargado(self) -> bool:
+        return self._actual.version > 0
+
+    @property
+    def necesita_carga(self) -> bool:
+        """Sin cargar todavía o marcado como obsoleto por un cambio confirmado"""
+        return self._obsoleto or not self.cargado
+
+    def marcar_obsoleto(self):
+        self._obsoleto = True
+
+    @staticmethod
+    def _leer_version(conn) -> int:
+        version = conn.execute(
+            select(version_tabla.c.version).where(version_tabla.c.clave == CLAVE_PLANES)
+        ).scalar()
+        return version or 0
+
+    @staticmethod
+    def incrementar_version(conn):
+        """Marcar el catálogo como modificado (en la transacción de `conn`)"""
+        resultado = conn.execute(
+            update(version_tabla)
+            .where(version_tabla.c.clave == CLAVE_PLANES)
+            .values(version=version_tabla.c.version + 1)
+        )
+        if resultado.rowcount == 0:
+            conn.execute(version_tabla.insert().values(clave=CLAVE_PLANES, version=2))
+
+    def cargar(self, conn) -> CatalogoPlanes:
+        """Leer versión + planes activos y publicar un snapshot nuevo"""
+        with self._lock:
+            self._obsoleto = False  # Antes de leer: una marca posterior no se pierde
+            version = self._leer_version(conn) or 1
+            with Session(bind=conn) as sesion:
+                planes = sesion.execute(
+                    select(PlanCatalogo)
+                    .where(PlanCatalogo.activo.is_(True))
+                    .order_by(PlanCatalogo.orden, PlanCatalogo.id)
+                ).scalars().all()
+                datos = tuple(p.to_dict() for p in planes)
+            self._actual = CatalogoPlanes(version, datos)
+            self.recargas += 1
+            return self._actual
+
+    def recargar_si_cambio(self, conn) -> bool:
+        """Comparar la versión en la BD con la del snapshot; recargar si difiere u obsoleto"""
+        if not self._obsoleto and (self._leer_version(conn) or 1) == self._actual.version:
+            return False
+        self.cargar(conn)
+        return True
+
+    def inicializar(self, engine):
+        """Crear la tabla de versiones si falta y cargar el catálogo"""
+        with engine.begin() as conn:
+            if not inspect(conn).has_table(version_tabla.name):
+                version_tabla.create(bind=conn)
+            if self._leer_version(conn) == 0:
+                conn.execute(version_tabla.insert().values(clave=CLAVE_PLANES, version=1))
+            self.cargar(conn)
+
+    def estadisticas(self) -> dict:
+        actual = self._actual
+        return {
+            "version": actual.version,
+            "planes": len(actual.planes),
+            "etag": actual.etag,
+            "recargas": self.recargas,
+        }
+
+
+registro_planes = RegistroPlanes()
+
+
+# ========================
+# 🔔 VERSIÓN POR EVENTOS
+# ========================
+
+def _marcar_cambio(mapper, connection, target):
+    if not registro_planes.cargado:
+        return  # La tabla de versiones se crea en el arranque (inicializar)
+    RegistroPlanes.incrementar_version(connection)
+    session = Session.object_session(target)
+    if session is not None:
+        session.info["catalogo_planes_modificado"] = True
+
+
+def _recargar_al_confirmar(session):
+    if not session.info.pop("catalogo_planes_modificado", False):
+        return
+    try:
+        bind = session.get_bind()
+        if bind.dialect.is_async:
+            # Sesión de una AsyncSession: fuera del greenlet no hay E/S posible
+            registro_planes.marcar_obsoleto()
+            return
+        with bind.connect() as conn:
+            registro_planes.cargar(conn)
+    except Exception as e:
+        # El sondeo periódico lo recargará igual
+        print(f"⚠️ No se pudo recargar el catálogo de planes: {e}")
+
+
+def _descartar_al_revertir(session, previous_transaction):
+    session.info.pop("catalogo_planes_modificado", None)
+
+
+for _evento in ("after_insert", "after_update", "after_delete"):
+    event.listen(PlanCatalogo, _evento, _marcar_cambio)
+
+event.listen(Session, "after_commit", _recargar_al_confirmar)
+event.listen(Session, "after_soft_rollback", _descartar_al_revertir)
@@ -0,0 +1,279 @@
+# 📱 app/services/qr_service.py - QR de pago pre-renderizados y cacheados
+"""
+El QR de un pago depende solo de (plan, monto, cuenta Yape): se renderiza una
+vez y se reutiliza para todos los pagos iguales.
+
+- La clave es el sha256 del contenido + parámetros de renderizado (direccionada
+  por contenido: mismo QR → mismo archivo, misma URL, cacheable para siempre).
+- Niveles: memoria (LRU por bytes) → disco (`QR_CACHE_DIR`, LRU por fecha de
+  acceso) → render en un pool de procesos (PIL + qrcode son CPU puro).
+- Renders concurrentes de la misma clave comparten un único futuro.
+- Con Cloudinary configurado el PNG se sube una sola vez (public_id = clave);
+  si no, se sirve desde `/api/v1/pagos/qr/imagen/{clave}.png`. Esa URL es
+  "immutable": si el PNG ya salió de la caché, se vuelve a renderizar desde el
+  `qr_data` del pago con esa `qr_clave` (columna indexada, `contenido_por_clave`).
+
+⚠️ La caché en memoria es por proceso; el disco se comparte entre workers.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.pago_pendiente import PagoPendiente
+
+# Cambiar cualquier parámetro de renderizado cambia todas las claves
+VERSION_RENDER = 1
+RENDER_BOX_SIZE = 10
+RENDER_BORDE = 4
+
+
+def _renderizar_png(contenido: str) -> bytes:
+    """Render determinista (se ejecuta en otro proceso: solo recibe y devuelve bytes/str)"""
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_M
+
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=ERROR_CORRECT_M,
+        box_size=RENDER_BOX_SIZE,
+        border=RENDER_BORDE,
+    )
+    qr.add_data(contenido)
+    qr.make(fit=True)
+    imagen = qr.make_image(fill_color="black", back_color="white")
+    salida = io.BytesIO()
+    imagen.save(salida, format="PNG", optimize=True)
+    return salida.getvalue()
+
+
+class CacheQR:
+    """🗃️ LRU de PNG en memoria con presupuesto en bytes + copia en disco"""
+
+    def __init__(self, max_bytes: int, directorio: str, max_archivos: int):
+        self.max_bytes = max_bytes
+        self.directorio = directorio
+        self.max_archivos = max_archivos
+        self._entradas: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.png")
+
+    def _guardar_memoria(self, clave: str, png: bytes):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._entradas[clave] = png
+            self._bytes += len(png)
+            while self._bytes > self.max_bytes:
+                _, desalojado = self._entradas.popitem(last=False)
+                self._bytes -= len(desalojado)
+
+    def obtener(self, clave: str) -> Optional[bytes]:
+        with self._lock:
+            png = self._entradas.get(clave)
+            if png is not None:
+                self._entradas.move_to_end(clave)
+                self.hits_memoria += 1
+                return png
+        try:
+            with open(self._ruta(clave), "rb") as archivo:
+                png = archivo.read()
+            os.utime(self._ruta(clave))  # "último acceso" para el LRU de disco
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits_disco += 1
+        self._guardar_memoria(clave, png)
+        return png
+
+    def guardar(self, clave: str, png: bytes):
+        self._guardar_memoria(clave, png)
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            temporal = f"{self._ruta(clave)}.{os.getpid()}.tmp"
+            with open(temporal, "wb") as archivo:
+                archivo.write(png)
+            os.replace(temporal, self._ruta(clave))  # Atómico: otro worker nunca lee un PNG a medias
+            self._podar_disco()
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el QR en disco: {e}")
+
+    def _podar_disco(self):
+        archivos = [e for e in os.scandir(self.directorio) if e.name.endswith(".png")]
+        sobrantes = len(archivos) - self.max_archivos
+        if sobrantes <= 0:
+            return
+        for entrada in sorted(archivos, key=lambda e: e.stat().st_mtime)[:sobrantes]:
+            try:
+                os.remove(entrada.path)
+            except OSError:
+                pass
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "en_memoria": len(self._entradas),
+                "bytes_memoria": self._bytes,
+                "max_bytes": self.max_bytes,
+                "directorio": self.directorio,
+                "hits_memoria": self.hits_memoria,
+                "hits_disco": self.hits_disco,
+                "misses": self.misses,
+            }
+
+
+class QRService:
+    cache = CacheQR(settings.QR_CACHE_MB * 1024 * 1024, settings.QR_CACHE_DIR, settings.QR_DISCO_MAX)
+    _executor: Optional[ProcessPoolExecutor] = None
+    _en_curso: Dict[str, "asyncio.Future"] = {}
+    _urls: Dict[str, str] = {}  # clave → URL pública ya subida
+    _contenidos: Dict[str, str] = {}  # clave → contenido (pocos: uno por plan y monto)
+    _lock_contenidos = threading.Lock()  # contenido_por_clave corre en el threadpool
+
+    # ========================
+    # 🔑 CONTENIDO Y CLAVE
+    # ========================
+
+    @staticmethod
+    def contenido_pago(plan_codigo: str, monto: Decimal) -> str:
+        """Texto del QR: cuenta Yape + monto exacto + plan (sin datos del pago individual)"""
+        return "|".join([
+            "YAPE",
+            settings.YAPE_NUMERO,
+            settings.YAPE_TITULAR,
+            f"{Decimal(monto):.2f}",
+            plan_codigo,
+        ])
+
+    @staticmethod
+    def clave(contenido: str) -> str:
+        base = f"v{VERSION_RENDER}:{RENDER_BOX_SIZE}:{RENDER_BORDE}:{contenido}"
+        return hashlib.sha256(base.encode()).hexdigest()[:32]
+
+    # ========================
+    # 🖼️ RENDER
+    # ========================
+
+    @classmethod
+    def _obtener_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(max_workers=max(settings.QR_WORKERS, 1))
+        return cls._executor
+
+    @classmethod
+    async def png(cls, contenido: str) -> bytes:
+        """PNG del contenido: memoria → disco → render (un solo render por clave a la vez)"""
+        clave = cls.clave(contenido)
+        with cls._lock_contenidos:
+            cls._contenidos[clave] = contenido
+        png = await run_in_threadpool(cls.cache.obtener, clave)
+        if png is not None:
+            return png
+
+        futuro = cls._en_curso.get(clave)
+        if futuro is None:
+            loop = asyncio.get_running_loop()
+            futuro = loop.run_in_executor(cls._obtener_executor(), _renderizar_png, contenido)
+            cls._en_curso[clave] = futuro
+            try:
+                png = await futuro
+                await run_in_threadpool(cls.cache.guardar, clave, png)
+            finally:
+                cls._en_curso.pop(clave, None)
+            return png
+        return await asyncio.shield(futuro)
+
+    @classmethod
+    def png_por_clave(cls, clave: str) -> Optional[bytes]:
+        """PNG ya renderizado (para servirlo); None si no existe en memoria ni en disco"""
+        return cls.cache.obtener(clave)
+
+    @classmethod
+    def contenido_por_clave(cls, db: Session, clave: str) -> Optional[str]:
+        """Contenido de una clave ya emitida: memoria o el pago con esa `qr_clave` (índice). Bloqueante"""
+        with cls._lock_contenidos:
+            contenido = cls._contenidos.get(clave)
+        if contenido is not None:
+            return contenido
+        contenido = db.execute(
+            select(PagoPendiente.qr_data).where(PagoPendiente.qr_clave == clave).limit(1)
+        ).scalar()
+        if contenido is not None and cls.clave(contenido) == clave:
+            with cls._lock_contenidos:
+                cls._contenidos[clave] = contenido
+            return contenido
+        return None
+
+    # ========================
+    # 🌐 URL PÚBLICA
+    # ========================
+
+    @staticmethod
+    def cloudinary_configurado() -> bool:
+        return settings.CLOUDINARY_CLOUD_NAME not in ("", "your_cloud_name")
+
+    @classmethod
+    def _subir(cls, clave: str, png: bytes) -> str:
+        import cloudinary.uploader
+
+        resultado = cloudinary.uploader.upload(
+            png,
+            folder="galloapp/qr",
+            public_id=clave,
+            overwrite=False,  # Mismo contenido → mismo archivo: si ya existe, no se vuelve a subir
+            resource_type="image",
+        )
+        return resultado["secure_url"]
+
+    @classmethod
+    async def url(cls, contenido: str, url_local: str) -> str:
+        """URL del QR: Cloudinary (subido una vez por clave) o el endpoint local"""
+        clave = cls.clave(contenido)
+        png = await cls.png(contenido)
+        if not cls.cloudinary_configurado():
+            return url_local
+        url = cls._urls.get(clave)
+        if url is None:
+            try:
+                url = await run_in_threadpool(cls._subir, clave, png)
+                cls._urls[clave] = url
+            except Exception as e:
+                print(f"⚠️ Error subiendo QR a Cloudinary, se sirve local: {e}")
+                return url_local
+        return url
+
+    @classmethod
+    def apagar(cls):
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
+    @classmethod
+    def estadisticas(cls) -> dict:
+        return {
+            **cls.cache.estadisticas(),
+            "workers": settings.QR_WORKERS,
+            "renders_en_curso": len(cls._en_curso),
+            "urls_subidas": len(cls._urls),
+        }
@@ -0,0 +1,175 @@
+# 🔄 app/services/refresh_session_service.py - Rotación de refresh tokens por dispositivo
+"""
+Los refresh tokens viven en `refresh_sessions` (no en `users.refresh_token`):
+
+- login crea una familia nueva por dispositivo (multi-dispositivo real);
+- /auth/refresh marca la sesión como usada y emite otra de la misma familia;
+- presentar una sesión ya usada o revocada revoca toda la familia (reuso = robo);
+- las sesiones vencidas se borran por lotes (`purgar_expiradas`).
+
+Limpieza manual: `python -m app.services.refresh_session_service`
+"""
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import select, update, delete, or_, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.exceptions import AuthenticationException
+from app.core.security import SecurityService
+from app.models.refresh_session import RefreshSession
+from app.models.user import User
+
+# Sesiones usadas/revocadas se conservan un tiempo para detectar reutilización
+RETENCION_SESIONES_INACTIVAS = timedelta(days=1)
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RefreshSessionService:
+
+    # ========================
+    # 🎟️ EMISIÓN Y ROTACIÓN
+    # ========================
+
+    @staticmethod
+    def crear(db: AsyncSession, user_id: int, dispositivo: Optional[str] = None,
+              familia_id: Optional[str] = None) -> Tuple[str, str]:
+        """Emitir refresh token y registrar su sesión (sin commit); devuelve (token, familia_id)"""
+        familia_id = familia_id or str(uuid.uuid4())
+        token = SecurityService.create_refresh_token(
+            data={"sub": str(user_id), "fam": familia_id, "jti": uuid.uuid4().hex}
+        )
+        db.add(RefreshSession(
+            user_id=user_id,
+            token_hash=_hash(token),
+            familia_id=familia_id,
+            dispositivo=(dispositivo or "")[:255] or None,
+            expira_en=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        ))
+        return token, familia_id
+
+    @staticmethod
+    async def rotar(db: AsyncSession, token: str, dispositivo: Optional[str] = None) -> Tuple[int, str, str]:
+        """Consumir `token` y emitir el siguiente de su familia; devuelve (user_id, token, familia_id)"""
+        payload = SecurityService.verify_token(token, "refresh")
+        user_id = int(payload.get("sub"))
+
+        sesion = (await db.execute(
+            select(RefreshSession)
+            .where(RefreshSession.token_hash == _hash(token))
+            .with_for_update()
+        )).scalars().first()
+
+        if sesion is None:
+            return await RefreshSessionService._migrar_token_legado(db, user_id, token, dispositivo)
+
+        if not sesion.vigente:
+            # Reutilización: alguien más tiene este token → cerrar el dispositivo completo
+            await RefreshSessionService._revocar(db, RefreshSession.familia_id == sesion.familia_id)
+            await db.commit()
+            raise AuthenticationException("Refresh token reutilizado, inicia sesión de nuevo")
+
+        if sesion.expira_en <= datetime.utcnow():
+            raise AuthenticationException("Refresh token expirado")
+
+        sesion.usado_en = datetime.utcnow()
+        nuevo, familia_id = RefreshSessionService.crear(
+            db, user_id, dispositivo or sesion.dispositivo, sesion.familia_id
+        )
+        await db.commit()
+        return user_id, nuevo, familia_id
+
+    @staticmethod
+    async def _migrar_token_legado(db: AsyncSession, user_id: int, token: str,
+                                   dispositivo: Optional[str]) -> Tuple[int, str, str]:
+        """Tokens emitidos antes de refresh_sessions: válidos una vez si coinciden con users.refresh_token"""
+        resultado = await db.execute(
+            update(User)
+            .where(User.id == user_id, User.refresh_token == token)
+            .values(refresh_token=None)
+        )
+        if resultado.rowcount != 1:
+            raise AuthenticationException("Refresh token inválido")
+        nuevo, familia_id = RefreshSessionService.crear(db, user_id, dispositivo)
+        await db.commit()
+        return user_id, nuevo, familia_id
+
+    # ========================
+    # 🚫 REVOCACIÓN
+    # ========================
+
+    @staticmethod
+    async def _revocar(db: AsyncSession, condicion):
+        await db.execute(
+            update(RefreshSession)
+            .where(condicion, RefreshSession.revocado_en.is_(None))
+            .values(revocado_en=datetime.utcnow())
+        )
+
+    @staticmethod
+    async def revocar_familia(db: AsyncSession, user_id: int, familia_id: str):
+        """Cerrar la sesión de un dispositivo (sin commit)"""
+        await RefreshSessionService._revocar(
+            db, (RefreshSession.user_id == user_id) & (RefreshSession.familia_id == familia_id)
+        )
+
+    @staticmethod
+    async def revocar_usuario(db: AsyncSession, user_id: int):
+        """Cerrar todas las sesiones del usuario, incluido un token legado (sin commit)"""
+        await RefreshSessionService._revocar(db, RefreshSession.user_id == user_id)
+        await db.execute(
+            update(User)
+            .where(User.id == user_id, User.refresh_token.isnot(None))
+            .values(refresh_token=None)
+        )
+
+    # ========================
+    # 🧹 LIMPIEZA
+    # ========================
+
+    @staticmethod
+    async def purgar_expiradas(db: AsyncSession, lote: int = 1000) -> int:
+        """Borrar sesiones vencidas o inactivas por lotes cortos (no bloquea la tabla)"""
+        ahora = datetime.utcnow()
+        limite_inactivas = ahora - RETENCION_SESIONES_INACTIVAS
+        condicion = or_(
+            RefreshSession.expira_en <= ahora,
+            RefreshSession.usado_en <= limite_inactivas,
+            RefreshSession.revocado_en <= limite_inactivas,
+        )
+        total = 0
+        while True:
+            ids = (await db.execute(
+                select(RefreshSession.id).where(condicion).limit(lote)
+            )).scalars().all()
+            if not ids:
+                return total
+            await db.execute(delete(RefreshSession).where(RefreshSession.id.in_(ids)))
+            await db.commit()
+            total += len(ids)
+
+    @staticmethod
+    def inicializar(engine):
+        """Crear la tabla si falta"""
+        with engine.begin() as conn:
+            if not inspect(conn).has_table(RefreshSession.__tablename__):
+                RefreshSession.__table__.create(bind=conn)
+                print(f"✅ Tabla {RefreshSession.__tablename__} creada")
+
+
+if __name__ == "__main__":
+    import asyncio
+    import app.models  # noqa: F401 - registrar todos los modelos
+    from app.database import AsyncSessionLocal
+
+    async def _main():
+        async with AsyncSessionLocal() as db:
+            return await RefreshSessionService.purgar_expiradas(db)
+
+    print(f"✅ Sesiones de refresh eliminadas: {asyncio.run(_main())}")
@@ -0,0 +1,377 @@
+# 📤 app/services/subida_service.py - Subidas de archivos en segundo plano
+"""
+Antes, avatar y comprobantes se subían a Cloudinary dentro de la petición
+(varios segundos con fotos de celular). Ahora:
+
+1. El endpoint copia el archivo a `SUBIDAS_STAGING_DIR` (en bloques, sin
+   cargarlo entero en memoria) y registra una `Subida`.
+2. El destino (p. ej. `Profile.avatar_url`) queda apuntando a la URL pendiente
+   `/api/v1/subidas/{id}`, que sirve el archivo local mientras tanto.
+3. Un pool de hilos sube el archivo con el backend de `almacenamiento.py`,
+   con reintentos y espera exponencial. Si la subida pide `variantes`, antes se
+   generan los WebP redimensionados (`imagen_service.py`) y se suben solo esos.
+4. Al terminar, el destino pasa a la URL definitiva SOLO si sigue apuntando a la
+   URL pendiente (un avatar más nuevo no se pisa) y se borra el staging.
+   Si falla definitivamente, el destino vuelve al valor que tenía antes.
+
+⚠️ El staging debe ser un disco compartido por todos los procesos de la app.
+Varias réplicas pueden encolar la misma subida: `_reclamar` garantiza que una
+sola la procese. Las subidas interrumpidas se retoman al arrancar.
+"""
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import select, update, inspect, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.exceptions import NotFoundException, ValidationException
+from app.models.subida import Subida, EstadoSubida
+from app.models.profile import Profile
+from app.models.pago_pendiente import PagoPendiente
+from app.models.gallo_simple import Gallo
+from app.services.almacenamiento import obtener_almacenamiento
+from app.services.imagen_service import ImagenService
+from app.services.foto_variantes_service import FotoVariantesService
+
+# objetivo → (modelo, columna de búsqueda, columna con la URL)
+DESTINOS = {
+    "avatar": (Profile, Profile.user_id, Profile.avatar_url),
+    "comprobante": (PagoPendiente, PagoPendiente.id, PagoPendiente.comprobante_url),
+    "gallo_foto": (Gallo, Gallo.id, Gallo.url_foto_cloudinary),
+}
+# objetivo → otras columnas que el endpoint también apunta a la URL pendiente
+COLUMNAS_EXTRA = {
+    "gallo_foto": (Gallo.foto_principal_url,),
+}
+# objetivo → escritura extra cuando el destino sí tomó la URL definitiva (misma transacción)
+AL_COMPLETAR = {
+    "gallo_foto": FotoVariantesService.aplicar_subida,
+}
+# extensión permitida → Content-Type con el que se sirve el staging
+TIPOS_CONTENIDO = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".heic": "image/heic",
+    ".gif": "image/gif",
+    ".pdf": "application/pdf",
+}
+EXTENSIONES = set(TIPOS_CONTENIDO)
+BLOQUE = 1024 * 1024
+MINUTOS_SUBIENDO_HUERFANA = 10  # 'subiendo' más antigua que esto: el proceso murió
+
+
+class SubidaService:
+
+    _pool: Optional[ThreadPoolExecutor] = None
+    _lock = threading.Lock()
+    _apagado = False
+
+    # ========================
+    # 📥 STAGING
+    # ========================
+
+    @staticmethod
+    def _extension(nombre: Optional[str], content_type: Optional[str]) -> str:
+        extension = os.path.splitext(nombre or "")[1].lower()
+        if extension in EXTENSIONES:
+            return extension
+        adivinada = next((ext for ext, tipo in TIPOS_CONTENIDO.items() if tipo == content_type), None)
+        return adivinada or ".bin"
+
+    @staticmethod
+    def tipo_contenido(ruta: str) -> str:
+        """Content-Type por la extensión que eligió `_extension` (lo que mande el cliente no cuenta)"""
+        return TIPOS_CONTENIDO.get(os.path.splitext(ruta)[1].lower(), "application/octet-stream")
+
+    @staticmethod
+    def guardar_en_staging(origen: Union[BinaryIO, bytes], nombre: Optional[str] = None,
+                           content_type: Optional[str] = None) -> Tuple[str, str]:
+        """Copiar el archivo a staging → (subida_id, ruta). Bloqueante: usar en threadpool"""
+        os.makedirs(settings.SUBIDAS_STAGING_DIR, exist_ok=True)
+        subida_id = uuid.uuid4().hex
+        ruta = os.path.join(settings.SUBIDAS_STAGING_DIR, subida_id + SubidaService._extension(nombre, content_type))
+        maximo = settings.SUBIDAS_MAX_MB * 1024 * 1024
+        try:
+            with open(ruta, "wb") as destino:
+                if isinstance(origen, (bytes, bytearray)):
+                    if len(origen) > maximo:
+                        raise ValidationException(f"El archivo no puede superar {settings.SUBIDAS_MAX_MB} MB")
+                    destino.write(origen)
+                else:
+                    total = 0
+                    while True:
+                        bloque = origen.read(BLOQUE)
+                        if not bloque:
+                            break
+                        total += len(bloque)
+                        if total > maximo:
+                            raise ValidationException(f"El archivo no puede superar {settings.SUBIDAS_MAX_MB} MB")
+                        destino.write(bloque)
+        except Exception:
+            SubidaService._borrar_archivo(ruta)
+            raise
+        return subida_id, ruta
+
+    @staticmethod
+    def crear(db: Session, subida_id: str, ruta: str, user_id: int, objetivo: str, objetivo_id: int,
+              carpeta: str, public_id: str, url_pendiente: str,
+              opciones: Optional[Dict[str, Any]] = None, variantes: Optional[List[str]] = None) -> Subida:
+        """Registrar la subida ANTES de apuntar el destino a `url_pendiente` (sin commit: misma transacción)"""
+        if objetivo not in DESTINOS:
+            raise ValidationException(f"Destino de subida desconocido: {objetivo}")
+        if variantes:
+            ImagenService.validar_nombres(variantes)
+            ImagenService.validar(ruta)  # solo la cabecera: el procesado pesado va en el worker
+        subida = Subida(
+            id=subida_id,
+            user_id=user_id,
+            objetivo=objetivo,
+            objetivo_id=objetivo_id,
+            carpeta=carpeta,
+            public_id=public_id,
+            opciones=opciones,
+            variantes=variantes or None,
+            ruta_staging=ruta,
+            content_type=SubidaService.tipo_contenido(ruta),
+            url_pendiente=url_pendiente,
+            valores_anteriores=SubidaService._valores_actuales(db, objetivo, objetivo_id),
+            estado=EstadoSubida.PENDIENTE,
+            intentos=0,
+        )
+        db.add(subida)
+        return subida
+
+    @staticmethod
+    def _columnas(objetivo: str):
+        return (DESTINOS[objetivo][2],) + COLUMNAS_EXTRA.get(objetivo, ())
+
+    @staticmethod
+    def _valores_actuales(db: Session, objetivo: str, objetivo_id: int) -> Optional[Dict[str, Any]]:
+        """Valores del destino a restaurar si la subida falla"""
+        columnas = SubidaService._columnas(objetivo)
+        fila = db.execute(select(*columnas).where(DESTINOS[objetivo][1] == objetivo_id)).first()
+        if fila is None:
+            return None
+        if fila[0]:
+            # Apunta a otra subida sin terminar (será descartada): restaurar lo anterior a ella
+            previa = db.execute(
+                select(Subida.valores_anteriores).where(Subida.url_pendiente == fila[0])
+            ).first()
+            if previa is not None:
+                return previa[0]
+        return {columna.key: valor for columna, valor in zip(columnas, fila)}
+
+    @staticmethod
+    def descartar_staging(ruta: str):
+        """Borrar un archivo de staging cuya subida no llegó a registrarse"""
+        SubidaService._borrar_archivo(ruta)
+
+    # ========================
+    # ⚙️ WORKERS
+    # ========================
+
+    @staticmethod
+    def _obtener_pool() -> ThreadPoolExecutor:
+        with SubidaService._lock:
+            if SubidaService._pool is None:
+                SubidaService._pool = ThreadPoolExecutor(
+                    max_workers=max(1, settings.SUBIDAS_WORKERS), thread_name_prefix="subidas"
+                )
+            return SubidaService._pool
+
+    @staticmethod
+    def encolar(subida_id: str, retraso: float = 0):
+        """Programar la subida (tras el commit que la registró)"""
+        if SubidaService._apagado:
+            return  # queda 'pendiente' en la BD: se retoma al arrancar
+        if retraso > 0:
+            temporizador = threading.Timer(retraso, SubidaService.encolar, args=(subida_id,))
+            temporizador.daemon = True
+            temporizador.start()
+            return
+        SubidaService._obtener_pool().submit(SubidaService._procesar, subida_id)
+
+    @staticmethod
+    def _sesion() -> Session:
+        from app.database import SessionLocal
+        return SessionLocal()
+
+    @staticmethod
+    def _reclamar(db: Session, subida_id: str) -> bool:
+        """pendiente → subiendo de forma atómica (una sola réplica procesa cada subida)"""
+        resultado = db.execute(
+            update(Subida)
+            .where(Subida.id == subida_id, Subida.estado == EstadoSubida.PENDIENTE)
+            .values(estado=EstadoSubida.SUBIENDO, intentos=Subida.intentos + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return resultado.rowcount == 1
+
+    @staticmethod
+    def _procesar(subida_id: str):
+        db = SubidaService._sesion()
+        try:
+            if not SubidaService._reclamar(db, subida_id):
+                return
+            subida = db.get(Subida, subida_id)
+            modelo, clave, columna = DESTINOS[subida.objetivo]
+
+            actual = db.execute(select(columna).where(clave == subida.objetivo_id)).scalar()
+            if actual != subida.url_pendiente:
+                # Reemplazado o eliminado mientras esperaba: no subir nada
+                subida.estado = EstadoSubida.DESCARTADA
+                db.commit()
+                SubidaService._limpiar_staging(subida)
+                return
+
+            try:
+                urls = SubidaService._subir_archivos(subida)
+            except ValidationException as e:
+                SubidaService._registrar_fallo(db, subida, e, reintentar=False)
+                return
+            except Exception as e:
+                SubidaService._registrar_fallo(db, subida, e)
+                return
+            url = urls[subida.variantes[0]] if subida.variantes else urls[None]
+
+            resultado = db.execute(
+                update(modelo)
+                .where(clave == subida.objetivo_id, columna == subida.url_pendiente)
+                .values({columna.key: url})
+                .execution_options(synchronize_session=False)
+            )
+            subida.estado = EstadoSubida.COMPLETADA
+            subida.url_final = url
+            subida.urls_variantes = urls if subida.variantes else None
+            subida.error = None
+            if resultado.rowcount and subida.objetivo in AL_COMPLETAR:
+                AL_COMPLETAR[subida.objetivo](db, subida)
+            db.commit()
+            SubidaService._limpiar_staging(subida)
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Error procesando subida {subida_id}: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def _subir_archivos(subida: Subida) -> Dict[Optional[str], str]:
+        """Subir el original ({None: url}) o sus variantes WebP ({"large": url, ...})"""
+        almacenamiento = obtener_almacenamiento()
+        if not subida.variantes:
+            return {None: almacenamiento.subir(subida.ruta_staging, subida.carpeta, subida.public_id, subida.opciones)}
+
+        archivos = ImagenService.generar_variantes(subida.ruta_staging, subida.variantes)
+        return {
+            nombre: almacenamiento.subir(ruta, subida.carpeta, f"{subida.public_id}_{nombre}", subida.opciones)
+            for nombre, ruta in archivos.items()
+        }
+
+    @staticmethod
+    def _registrar_fallo(db: Session, subida: Subida, error: Exception, reintentar: bool = True):
+        """Reintentar con espera exponencial; agotados los intentos queda 'fallida' (el staging se conserva)"""
+        subida.error = str(error)[:1000]
+        if reintentar and subida.intentos < settings.SUBIDAS_REINTENTOS:
+            subida.estado = EstadoSubida.PENDIENTE
+            db.commit()
+            SubidaService.encolar(subida.id, retraso=2 ** subida.intentos)
+        else:
+            subida.estado = EstadoSubida.FALLIDA
+            SubidaService._restaurar_destino(db, subida)
+            db.commit()
+            print(f"❌ Subida {subida.id} fallida tras {subida.intentos} intentos: {subida.error}")
+
+    @staticmethod
+    def _restaurar_destino(db: Session, subida: Subida):
+        """Fallida: el destino vuelve a su valor previo (o NULL) si aún apunta a la URL pendiente
+
+        Por ORM para que los eventos del modelo (p. ej. variantes de fotos) se recalculen.
+        """
+        modelo, clave, columna = DESTINOS[subida.objetivo]
+        destino = db.execute(select(modelo).where(clave == subida.objetivo_id)).scalars().first()
+        if destino is None or getattr(destino, columna.key) != subida.url_pendiente:
+            return
+        anteriores = subida.valores_anteriores or {}
+        for columna_destino in SubidaService._columnas(subida.objetivo):
+            setattr(destino, columna_destino.key, anteriores.get(columna_destino.key))
+
+    @staticmethod
+    def _limpiar_staging(subida: Subida):
+        SubidaService._borrar_archivo(subida.ruta_staging)
+        for ruta in ImagenService.rutas_variantes(subida.ruta_staging, subida.variantes or []).values():
+            SubidaService._borrar_archivo(ruta)
+
+    @staticmethod
+    def _borrar_archivo(ruta: str):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+    # ========================
+    # 🔎 CONSULTAS
+    # ========================
+
+    @staticmethod
+    def obtener(db: Session, subida_id: str, user_id: Optional[int] = None) -> Subida:
+        subida = db.get(Subida, subida_id) if len(subida_id) == 32 else None
+        if subida is None or (user_id is not None and subida.user_id != user_id):
+            raise NotFoundException("Archivo no encontrado")
+        return subida
+
+    # ========================
+    # 🏗️ ARRANQUE Y APAGADO
+    # ========================
+
+    @staticmethod
+    def inicializar(engine) -> int:
+        """Crear la tabla si falta y retomar las subidas pendientes → cantidad encolada"""
+        SubidaService._apagado = False
+        with engine.begin() as conn:
+            if not inspect(conn).has_table(Subida.__tablename__):
+                Subida.__table__.create(bind=conn)
+                print(f"✅ Tabla {Subida.__tablename__} creada")
+            else:
+                SubidaService._agregar_columnas_faltantes(conn)
+            conn.execute(
+                update(Subida)
+                .where(
+                    Subida.estado == EstadoSubida.SUBIENDO,
+                    Subida.updated_at < datetime.utcnow() - timedelta(minutes=MINUTOS_SUBIENDO_HUERFANA),
+                )
+                .values(estado=EstadoSubida.PENDIENTE)
+            )
+            pendientes = conn.execute(
+                select(Subida.id).where(Subida.estado == EstadoSubida.PENDIENTE)
+            ).scalars().all()
+        for subida_id in pendientes:
+            SubidaService.encolar(subida_id)
+        return len(pendientes)
+
+    @staticmethod
+    def _agregar_columnas_faltantes(conn):
+        """Sin migraciones: columnas nuevas del modelo se agregan con ALTER TABLE (todas admiten NULL)"""
+        existentes = {c["name"] for c in inspect(conn).get_columns(Subida.__tablename__)}
+        for columna in Subida.__table__.columns:
+            if columna.name not in existentes:
+                tipo = columna.type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {Subida.__tablename__} ADD COLUMN {columna.name} {tipo}"))
+                print(f"✅ Columna {Subida.__tablename__}.{columna.name} agregada")
+
+    @staticmethod
+    def apagar(esperar: bool = False):
+        """Cerrar el pool; lo que no alcanzó a subir queda 'pendiente' para el próximo arranque"""
+        with SubidaService._lock:
+            SubidaService._apagado = True
+            if SubidaService._pool is not None:
+                SubidaService._pool.shutdown(wait=esperar, cancel_futures=not esperar)
+                SubidaService._pool = None
+        ImagenService.apagar()
@@ -0,0 +1,232 @@
+# 💳 app/services/suscripcion_cache.py - Caché del plan vigente por usuario
+"""
+Resuelve una sola vez "¿qué plan tiene este usuario hoy?" (tipo, límites,
+es_premium, vencimiento) y lo guarda por `user_id` con un TTL que nunca pasa
+del último día de `fecha_fin`: una suscripción vencida no sobrevive en caché.
+
+En un fallo de caché la consulta usa el índice parcial
+`ix_suscripciones_user_activas` (solo filas con status = 'active').
+
+Se invalida con los eventos de SQLAlchemy sobre `Suscripcion` y cuando un
+`PagoPendiente` pasa a aprobado (también al confirmar la transacción).
+
+⚠️ La caché es por proceso (igual que la de usuarios y la del grafo genealógico).
+⚠️ Los `query(Suscripcion).update()` masivos no disparan eventos de mapper:
+quien los use debe llamar `suscripcion_cache.invalidar(user_id)` o `limpiar()`.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.suscripcion import Suscripcion
+from app.models.pago_pendiente import PagoPendiente, EstadoPago
+
+_columnas = Suscripcion.__table__.c
+
+
+class PlanVigente(NamedTuple):
+    """Derechos resueltos del usuario (inmutable, seguro de compartir entre requests)"""
+    suscripcion_id: Optional[int]
+    plan_type: str
+    plan_name: str
+    es_premium: bool
+    fecha_fin: Optional[date]
+    gallos_maximo: int
+    topes_por_gallo: int
+    peleas_por_gallo: int
+    vacunas_por_gallo: int
+
+    @classmethod
+    def desde_suscripcion(cls, suscripcion: Suscripcion) -> "PlanVigente":
+        return cls(
+            suscripcion_id=suscripcion.id,
+            plan_type=suscripcion.plan_type,
+            plan_name=suscripcion.plan_name,
+            es_premium=bool(suscripcion.es_premium),
+            fecha_fin=suscripcion.fecha_fin,
+            gallos_maximo=suscripcion.gallos_maximo,
+            topes_por_gallo=suscripcion.topes_por_gallo,
+            peleas_por_gallo=suscripcion.peleas_por_gallo,
+            vacunas_por_gallo=suscripcion.vacunas_por_gallo,
+        )
+
+    @classmethod
+    def gratuito(cls) -> "PlanVigente":
+        """Plan por defecto cuando no hay suscripción activa (defaults del modelo)"""
+        return cls(
+            suscripcion_id=None,
+            plan_type=_columnas.plan_type.default.arg,
+            plan_name=_columnas.plan_name.default.arg,
+            es_premium=False,
+            fecha_fin=None,
+            gallos_maximo=_columnas.gallos_maximo.default.arg,
+            topes_por_gallo=_columnas.topes_por_gallo.default.arg,
+            peleas_por_gallo=_columnas.peleas_por_gallo.default.arg,
+            vacunas_por_gallo=_columnas.vacunas_por_gallo.default.arg,
+        )
+
+    def to_dict(self) -> dict:
+        datos = self._asdict()
+        datos["fecha_fin"] = self.fecha_fin.isoformat() if self.fecha_fin else None
+        return datos
+
+
+def _segundos_hasta_vencer(fecha_fin: Optional[date]) -> Optional[float]:
+    """Segundos hasta el fin del día `fecha_fin` (la suscripción vale todo ese día)"""
+    if fecha_fin is None:
+        return None
+    return (datetime.combine(fecha_fin + timedelta(days=1), datetime.min.time()) - datetime.now()).total_seconds()
+
+
+class SuscripcionCache:
+    """🗃️ LRU con TTL de planes vigentes"""
+
+    def __init__(self, ttl_segundos: int, max_entradas: int):
+        self.ttl = ttl_segundos
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[int, Tuple[float, PlanVigente]]" = OrderedDict()
+        self._generacion = 0  # Cambia con cada invalidación (evita guardar cargas obsoletas)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def habilitado(self) -> bool:
+        return self.ttl > 0 and self.max_entradas > 0
+
+    def obtener(self, user_id: int) -> Tuple[Optional[PlanVigente], int]:
+        """(plan vigente o None, generación a pasar a `guardar` tras leer la BD)"""
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is not None:
+                expira, plan = entrada
+                if expira > time.monotonic():
+                    self._entradas.move_to_end(user_id)
+                    self.hits += 1
+                    return plan, self._generacion
+                del self._entradas[user_id]
+            self.misses += 1
+            return None, self._generacion
+
+    def guardar(self, user_id: int, plan: PlanVigente, generacion: int):
+        """Guardar si nadie invalidó mientras se leía la BD; el TTL se recorta a fecha_fin"""
+        if not self.habilitado:
+            return
+        ttl = self.ttl
+        restantes = _segundos_hasta_vencer(plan.fecha_fin)
+        if restantes is not None:
+            ttl = min(ttl, restantes)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if generacion == self._generacion:
+                self._entradas[user_id] = (time.monotonic() + ttl, plan)
+                self._entradas.move_to_end(user_id)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+
+    def invalidar(self, user_id: int):
+        with self._lock:
+            self._generacion += 1
+            self._entradas.pop(user_id, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self._entradas.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "usuarios": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+suscripcion_cache = SuscripcionCache(settings.SUSCRIPCION_CACHE_TTL, settings.SUSCRIPCION_CACHE_MAX)
+
+
+def plan_vigente(db: Session, user_id: int) -> PlanVigente:
+    """🔥 Plan del usuario hoy: de la caché o de la suscripción activa más reciente"""
+    plan, generacion = suscripcion_cache.obtener(user_id)
+    if plan is not None:
+        return plan
+
+    suscripcion = db.execute(
+        select(Suscripcion)
+        .where(
+            Suscripcion.user_id == user_id,
+            Suscripcion.status == "active",
+            or_(Suscripcion.fecha_fin.is_(None), Suscripcion.fecha_fin >= date.today()),
+        )
+        .order_by(Suscripcion.created_at.desc())
+        .limit(1)
+    ).scalars().first()
+
+    plan = PlanVigente.desde_suscripcion(suscripcion) if suscripcion else PlanVigente.gratuito()
+    suscripcion_cache.guardar(user_id, plan, generacion)
+    return plan
+
+
+def asegurar_indices(engine):
+    """Crear el índice parcial de suscripciones activas si falta"""
+    with engine.begin() as conn:
+        for indice in Suscripcion.__table__.indexes:
+            indice.create(bind=conn, checkfirst=True)
+
+
+# ========================
+# 🔔 INVALIDACIÓN POR EVENTOS
+# ========================
+
+def _marcar(target_user_id: Optional[int], target):
+    if target_user_id is None:
+        return
+    suscripcion_cache.invalidar(target_user_id)
+
+    # Repetir al confirmar: otra petición pudo recargar el plan antes del commit
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("planes_invalidar", set()).add(target_user_id)
+
+
+def _invalidar_suscripcion(mapper, connection, target):
+    _marcar(target.user_id, target)
+    # Si la suscripción cambió de dueño, el anterior también pierde su plan
+    historial = inspect(target).attrs.user_id.history
+    for anterior in historial.deleted or ():
+        _marcar(anterior, target)
+
+
+def _invalidar_pago_aprobado(mapper, connection, target):
+    historial = inspect(target).attrs.estado.history
+    if historial.has_changes() and target.estado == EstadoPago.APROBADO:
+        _marcar(target.user_id, target)
+
+
+def _invalidar_al_terminar(session):
+    for user_id in session.info.pop("planes_invalidar", ()):
+        suscripcion_cache.invalidar(user_id)
+
+
+def _invalidar_al_revertir(session, previous_transaction):
+    _invalidar_al_terminar(session)
+
+
+for _evento in ("after_insert", "after_update", "after_delete"):
+    event.listen(Suscripcion, _evento, _invalidar_suscripcion)
+
+for _evento in ("after_insert", "after_update"):
+    event.listen(PagoPendiente, _evento, _invalidar_pago_aprobado)
+
+event.listen(Session, "after_commit", _invalidar_al_terminar)
+event.listen(Session, "after_soft_rollback", _invalidar_al_revertir)
@@ -0,0 +1,178 @@
+# ⏰ app/services/vencimiento_service.py - Barrido de suscripciones vencidas
+"""
+`Suscripcion.esta_activa` evalúa el vencimiento solo al leer; en la BD las
+filas siguen con status = 'active' después de `fecha_fin`. Este barrido, por
+lotes y con UPDATEs por conjunto:
+
+1. Marca como 'expired' las suscripciones activas con `fecha_fin` < hoy.
+2. A los usuarios que se quedan sin suscripción vigente les crea una
+   suscripción gratuita con los límites del `PlanCatalogo` 'gratuito' y
+   pone `users.is_premium = false`.
+3. Inserta de una vez las `NotificacionAdmin` USUARIO_PREMIUM_VENCIDO.
+
+Cada lote se confirma por separado y en PostgreSQL usa SKIP LOCKED, así que
+dos procesos pueden barrer a la vez sin pisarse.
+
+Manual: `python -m app.services.vencimiento_service`
+"""
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update, insert, and_, or_
+from sqlalchemy.orm import Session
+
+from app.core.usuario_cache import usuario_cache
+from app.models.user import User
+from app.models.suscripcion import Suscripcion
+from app.models.plan_catalogo import PlanCatalogo
+from app.models.notificacion_admin import NotificacionAdmin, TipoNotificacion, PrioridadNotificacion
+from app.services.suscripcion_cache import suscripcion_cache, PlanVigente
+from app.services.plan_registro import registro_planes
+
+PLAN_GRATUITO = "gratuito"
+
+
+class VencimientoService:
+    # Último resultado (lo expone /metrics/vencimientos)
+    ultimo_reporte: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def _valores_gratuito(db: Session) -> Dict[str, Any]:
+        """Columnas de la suscripción gratuita: del catálogo en memoria, o los defaults del modelo"""
+        if registro_planes.cargado:
+            plan = registro_planes.actual.obtener(PLAN_GRATUITO)
+        else:
+            fila = db.execute(select(PlanCatalogo).where(PlanCatalogo.codigo == PLAN_GRATUITO)).scalars().first()
+            plan = fila.to_dict() if fila else None
+        if plan is not None:
+            return {
+                "plan_type": plan["codigo"],
+                "plan_name": plan["nombre"],
+                "precio": plan["precio"],
+                **plan["limites"],
+            }
+        defecto = PlanVigente.gratuito()
+        return {
+            "plan_type": defecto.plan_type,
+            "plan_name": defecto.plan_name,
+            "precio": 0,
+            "gallos_maximo": defecto.gallos_maximo,
+            "topes_por_gallo": defecto.topes_por_gallo,
+            "peleas_por_gallo": defecto.peleas_por_gallo,
+            "vacunas_por_gallo": defecto.vacunas_por_gallo,
+        }
+
+    @staticmethod
+    def _vigente(hoy: date):
+        return and_(
+            Suscripcion.status == "active",
+            or_(Suscripcion.fecha_fin.is_(None), Suscripcion.fecha_fin >= hoy),
+        )
+
+    @staticmethod
+    def _procesar_lote(db: Session, hoy: date, lote: int, gratuito: Dict[str, Any],
+                       admins: List[int]) -> Optional[Dict[str, int]]:
+        """Un lote en una transacción; None cuando ya no quedan vencidas"""
+        vencidas = db.execute(
+            select(Suscripcion.id, Suscripcion.user_id, Suscripcion.plan_type, Suscripcion.fecha_fin)
+            .where(Suscripcion.status == "active", Suscripcion.fecha_fin < hoy)
+            .order_by(Suscripcion.id)
+            .limit(lote)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not vencidas:
+            return None
+
+        db.execute(
+            update(Suscripcion)
+            .where(Suscripcion.id.in_([v.id for v in vencidas]))
+            .values(status="expired")
+        )
+
+        # Usuarios del lote que ya no tienen ninguna suscripción vigente
+        afectados = {v.user_id for v in vencidas}
+        con_vigente = set(db.execute(
+            select(Suscripcion.user_id).where(Suscripcion.user_id.in_(afectados), VencimientoService._vigente(hoy))
+        ).scalars())
+        degradados = sorted(afectados - con_vigente)
+
+        if degradados:
+            db.execute(insert(Suscripcion), [
+                {**gratuito, "user_id": user_id, "status": "active", "fecha_inicio": hoy, "fecha_fin": None}
+                for user_id in degradados
+            ])
+            db.execute(
+                update(User)
+                .where(User.id.in_(degradados), User.is_premium.is_(True))
+                .values(is_premium=False)
+            )
+
+        notificaciones = [
+            {
+                "admin_id": admin_id,
+                "tipo": TipoNotificacion.USUARIO_PREMIUM_VENCIDO.value,
+                "titulo": "Suscripción vencida",
+                "mensaje": f"El plan {v.plan_type} del usuario {v.user_id} venció el {v.fecha_fin.isoformat()}",
+                "data": {"user_id": v.user_id, "suscripcion_id": v.id, "plan_type": v.plan_type},
+                "prioridad": PrioridadNotificacion.NORMAL.value,
+            }
+            for v in vencidas
+            for admin_id in admins
+        ]
+        if notificaciones:
+            db.execute(insert(NotificacionAdmin), notificaciones)
+
+        db.commit()
+
+        # UPDATE/INSERT por conjunto no disparan eventos de mapper: invalidar a mano
+        for user_id in afectados:
+            suscripcion_cache.invalidar(user_id)
+            usuario_cache.invalidar(user_id)
+
+        return {
+            "suscripciones_vencidas": len(vencidas),
+            "usuarios_degradados": len(degradados),
+            "notificaciones": len(notificaciones),
+        }
+
+    @staticmethod
+    def barrer(db: Session, lote: int = 500) -> Dict[str, Any]:
+        """🔥 Vencer suscripciones atrasadas por lotes; devuelve conteos y duración"""
+        inicio = time.perf_counter()
+        hoy = date.today()
+        reporte = {"suscripciones_vencidas": 0, "usuarios_degradados": 0, "notificaciones": 0, "lotes": 0}
+
+        gratuito = VencimientoService._valores_gratuito(db)
+        admins = list(db.execute(
+            select(User.id).where(User.es_admin.is_(True), User.recibe_notificaciones_admin.is_(True))
+        ).scalars())
+
+        try:
+            while True:
+                resultado = VencimientoService._procesar_lote(db, hoy, lote, gratuito, admins)
+                if resultado is None:
+                    break
+                reporte["lotes"] += 1
+                for clave, valor in resultado.items():
+                    reporte[clave] += valor
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            reporte["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+            reporte["ejecutado_en"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            VencimientoService.ultimo_reporte = reporte
+
+        return reporte
+
+
+if __name__ == "__main__":
+    import app.models  # noqa: F401 - registrar todos los modelos
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"✅ Barrido de vencimientos: {VencimientoService.barrer(db)}")
+    finally:
+        db.close()
@@ -0,0 +1,320 @@
+# 🧾 app/services/verificacion_pagos_service.py - Cola de verificación de pagos para admins
+"""
+Flujo pensado para días de promoción con cientos de comprobantes Yape:
+
+- `cola`: pagos pendiente/verificando por orden de llegada con paginación
+  keyset sobre (created_at, id), servida por el índice parcial
+  `ix_pagos_pendientes_cola`.
+- `tomar`: reserva los siguientes N pagos pendientes para un admin
+  (pendiente → verificando) con FOR UPDATE SKIP LOCKED: dos admins nunca
+  reciben el mismo pago. La reserva vence a los `PAGOS_RESERVA_MIN` minutos
+  (admin que cerró la pestaña): después otro admin puede volver a tomarlo.
+- `resolver_lote`: aprueba o rechaza hasta cientos de pagos en UNA
+  transacción; al aprobar activa las suscripciones correspondientes.
+  Los pagos bloqueados por otro admin o ya resueltos se devuelven como omitidos;
+  los de un plan que ya no está en el catálogo quedan en la cola (`sin_plan`).
+"""
+import base64
+import json
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, insert, tuple_, func, or_, and_, inspect, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.exceptions import ValidationException
+from app.core.usuario_cache import usuario_cache
+from app.models.user import User
+from app.models.pago_pendiente import PagoPendiente, EstadoPago
+from app.models.comprobante_pago import ComprobantePago
+from app.models.suscripcion import Suscripcion
+from app.services.plan_registro import registro_planes
+from app.services.qr_service import QRService
+from app.services.suscripcion_cache import suscripcion_cache
+
+ESTADOS_EN_COLA = (EstadoPago.PENDIENTE.value, EstadoPago.VERIFICANDO.value)
+MAX_LOTE = 500
+
+
+class VerificacionPagosService:
+
+    # ========================
+    # 🔐 CURSOR OPACO
+    # ========================
+
+    @staticmethod
+    def _codificar_cursor(pago: PagoPendiente) -> str:
+        datos = {"c": pago.created_at.isoformat() if pago.created_at else None, "i": pago.id}
+        return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode().rstrip("=")
+
+    @staticmethod
+    def _decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            relleno = "=" * (-len(cursor) % 4)
+            datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+            return datetime.fromisoformat(datos["c"]), int(datos["i"])
+        except (ValueError, KeyError, TypeError):
+            raise ValidationException("Cursor inválido (vuelva a la primera página)")
+
+    @staticmethod
+    def _serializar(pago: PagoPendiente, email: Optional[str], similar_a: Optional[int] = None) -> Dict[str, Any]:
+        datos = pago.to_dict()
+        datos["usuario_email"] = email
+        datos["comprobante_similar_a_pago_id"] = similar_a  # captura parecida a la de otro pago: revisar
+        return datos
+
+    @staticmethod
+    def _consulta_cola():
+        return (
+            select(PagoPendiente, User.email, ComprobantePago.similar_a_pago_id)
+            .join(User, User.id == PagoPendiente.user_id)
+            .outerjoin(ComprobantePago, ComprobantePago.pago_id == PagoPendiente.id)
+        )
+
+    # ========================
+    # 📋 COLA
+    # ========================
+
+    @staticmethod
+    def cola(db: Session, limite: int = 50, cursor: Optional[str] = None,
+             estado: Optional[str] = None) -> Dict[str, Any]:
+        """Página de la cola (más antiguos primero) + cursor de la siguiente"""
+        estados = (estado,) if estado else ESTADOS_EN_COLA
+        if any(e not in ESTADOS_EN_COLA for e in estados):
+            raise ValidationException(f"Estado inválido para la cola. Use: {', '.join(ESTADOS_EN_COLA)}")
+
+        query = VerificacionPagosService._consulta_cola().where(PagoPendiente.estado.in_(estados))
+        if cursor:
+            creado, ultimo_id = VerificacionPagosService._decodificar_cursor(cursor)
+            query = query.where(tuple_(PagoPendiente.created_at, PagoPendiente.id) > (creado, ultimo_id))
+
+        filas = db.execute(
+            query.order_by(PagoPendiente.created_at, PagoPendiente.id).limit(limite + 1)
+        ).all()
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+
+        return {
+            "data": [VerificacionPagosService._serializar(*fila) for fila in filas],
+            "next_cursor": VerificacionPagosService._codificar_cursor(filas[-1][0]) if hay_mas else None,
+            "has_more": hay_mas,
+        }
+
+    @staticmethod
+    def resumen(db: Session) -> Dict[str, int]:
+        """Cantidad de pagos por estado dentro de la cola"""
+        conteos = dict(db.execute(
+            select(PagoPendiente.estado, func.count())
+            .where(PagoPendiente.estado.in_(ESTADOS_EN_COLA))
+            .group_by(PagoPendiente.estado)
+        ).all())
+        return {estado: conteos.get(estado, 0) for estado in ESTADOS_EN_COLA}
+
+    # ========================
+    # ✋ RESERVA
+    # ========================
+
+    @staticmethod
+    def _reserva_vencida(ahora: datetime):
+        """Pagos en verificación cuya reserva ya venció (o sin fecha: reservados antes de existir el vencimiento)"""
+        limite = ahora - timedelta(minutes=settings.PAGOS_RESERVA_MIN)
+        return and_(
+            PagoPendiente.estado == EstadoPago.VERIFICANDO.value,
+            or_(PagoPendiente.tomado_at.is_(None), PagoPendiente.tomado_at < limite),
+        )
+
+    @staticmethod
+    def tomar(db: Session, admin_id: int, cantidad: int = 20) -> List[Dict[str, Any]]:
+        """Reservar los siguientes pagos pendientes (o de reserva vencida) para `admin_id`"""
+        ahora = datetime.utcnow()
+        ids = db.execute(
+            select(PagoPendiente.id)
+            .where(or_(
+                PagoPendiente.estado == EstadoPago.PENDIENTE.value,
+                VerificacionPagosService._reserva_vencida(ahora),
+            ))
+            .order_by(PagoPendiente.created_at, PagoPendiente.id)
+            .limit(cantidad)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            db.rollback()
+            return []
+
+        db.execute(
+            update(PagoPendiente)
+            .where(PagoPendiente.id.in_(ids))
+            .values(
+                estado=EstadoPago.VERIFICANDO.value,
+                verificado_por=admin_id,
+                tomado_at=ahora,
+                intentos=func.coalesce(PagoPendiente.intentos, 0) + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        filas = db.execute(
+            VerificacionPagosService._consulta_cola()
+            .where(PagoPendiente.id.in_(ids))
+            .order_by(PagoPendiente.created_at, PagoPendiente.id)
+        ).all()
+        return [VerificacionPagosService._serializar(*fila) for fila in filas]
+
+    # ========================
+    # ✅ RESOLUCIÓN POR LOTES
+    # ========================
+
+    @staticmethod
+    def _activar_suscripciones(db: Session, aprobados: List[Any], hoy: date) -> int:
+        """Una suscripción nueva por usuario (plan del pago más reciente, días acumulados)
+
+        Todos los planes deben estar en el catálogo (resolver_lote deja fuera los que no).
+        """
+        por_usuario: Dict[int, List[Any]] = {}
+        for pago in aprobados:
+            por_usuario.setdefault(pago.user_id, []).append(pago)
+
+        # Renovación: la nueva empieza a contar desde el vencimiento vigente más lejano
+        vencimientos = dict(db.execute(
+            select(Suscripcion.user_id, func.max(Suscripcion.fecha_fin))
+            .where(
+                Suscripcion.user_id.in_(por_usuario),
+                Suscripcion.status == "active",
+                Suscripcion.fecha_fin >= hoy,
+            )
+            .group_by(Suscripcion.user_id)
+        ).all())
+
+        db.execute(
+            update(Suscripcion)
+            .where(Suscripcion.user_id.in_(por_usuario), Suscripcion.status == "active")
+            .values(status="inactive")
+            .execution_options(synchronize_session=False)
+        )
+
+        nuevas = []
+        for user_id, pagos in por_usuario.items():
+            planes = [registro_planes.actual.obtener(p.plan_codigo) for p in pagos]
+            plan = planes[-1]  # pagos ordenados por llegada: el último define el plan
+            inicio = max(vencimientos.get(user_id) or hoy, hoy)
+            nuevas.append({
+                "user_id": user_id,
+                "plan_type": plan["codigo"],
+                "plan_name": plan["nombre"],
+                "precio": plan["precio"],
+                "status": "active",
+                "fecha_inicio": hoy,
+                "fecha_fin": inicio + timedelta(days=sum(p["duracion_dias"] for p in planes)),
+                **plan["limites"],
+            })
+        db.execute(insert(Suscripcion), nuevas)
+
+        db.execute(
+            update(User)
+            .where(User.id.in_(por_usuario))
+            .values(is_premium=True)
+            .execution_options(synchronize_session=False)
+        )
+        return len(nuevas)
+
+    @staticmethod
+    def resolver_lote(db: Session, admin_id: int, pago_ids: List[int], aprobar: bool,
+                      notas: Optional[str] = None) -> Dict[str, Any]:
+        """🔥 Aprobar o rechazar un lote de pagos en una sola transacción"""
+        pago_ids = list(dict.fromkeys(pago_ids))
+        if not pago_ids:
+            raise ValidationException("Indique al menos un pago")
+        if len(pago_ids) > MAX_LOTE:
+            raise ValidationException(f"Máximo {MAX_LOTE} pagos por lote")
+        if aprobar and registro_planes.necesita_carga:
+            registro_planes.cargar(db.connection())
+
+        # Solo pagos en cola, libres, reservados por este mismo admin o de reserva vencida
+        pagos = db.execute(
+            select(PagoPendiente.id, PagoPendiente.user_id, PagoPendiente.plan_codigo)
+            .where(
+                PagoPendiente.id.in_(pago_ids),
+                PagoPendiente.estado.in_(ESTADOS_EN_COLA),
+                or_(
+                    PagoPendiente.estado == EstadoPago.PENDIENTE.value,
+                    PagoPendiente.verificado_por.is_(None),
+                    PagoPendiente.verificado_por == admin_id,
+                    VerificacionPagosService._reserva_vencida(datetime.utcnow()),
+                ),
+            )
+            .order_by(PagoPendiente.created_at, PagoPendiente.id)
+            .with_for_update(skip_locked=True)
+        ).all()
+        omitidos = [pid for pid in pago_ids if pid not in {p.id for p in pagos}]
+
+        # Aprobar un plan que ya no está en el catálogo no puede activar nada: queda en la cola
+        sin_plan = []
+        if aprobar:
+            sin_plan = [p.id for p in pagos if registro_planes.actual.obtener(p.plan_codigo) is None]
+            pagos = [p for p in pagos if p.id not in set(sin_plan)]
+        procesados = [p.id for p in pagos]
+
+        if not pagos:
+            db.rollback()
+            return {"procesados": [], "omitidos": omitidos, "sin_plan": sin_plan, "suscripciones_activadas": 0}
+
+        hoy = date.today()
+        try:
+            db.execute(
+                update(PagoPendiente)
+                .where(PagoPendiente.id.in_(procesados))
+                .values(
+                    estado=(EstadoPago.APROBADO if aprobar else EstadoPago.RECHAZADO).value,
+                    verificado_por=admin_id,
+                    fecha_verificacion=datetime.utcnow(),
+                    notas_admin=func.coalesce(notas, PagoPendiente.notas_admin),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            activadas = VerificacionPagosService._activar_suscripciones(db, pagos, hoy) if aprobar else 0
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        # UPDATE/INSERT por conjunto no disparan eventos de mapper: invalidar a mano
+        if aprobar:
+            for user_id in {p.user_id for p in pagos}:
+                suscripcion_cache.invalidar(user_id)
+                usuario_cache.invalidar(user_id)
+
+        return {"procesados": procesados, "omitidos": omitidos, "sin_plan": sin_plan,
+                "suscripciones_activadas": activadas}
+
+    @staticmethod
+    def asegurar_indices(engine):
+        """Crear el índice parcial de la cola si falta (los únicos los crea ComprobanteService)
+
+        Sin migraciones: también agrega pagos_pendientes.tomado_at y qr_clave si
+        faltan, y completa qr_clave de los pagos anteriores a la columna.
+        """
+        with engine.begin() as conn:
+            if not inspect(conn).has_table(PagoPendiente.__tablename__):
+                return
+            existentes = {c["name"] for c in inspect(conn).get_columns(PagoPendiente.__tablename__)}
+            for nombre in ("tomado_at", "qr_clave"):
+                if nombre not in existentes:
+                    tipo = PagoPendiente.__table__.c[nombre].type.compile(dialect=conn.dialect)
+                    conn.execute(text(f"ALTER TABLE {PagoPendiente.__tablename__} ADD COLUMN {nombre} {tipo}"))
+                    print(f"✅ Columna pagos_pendientes.{nombre} agregada")
+            for indice in PagoPendiente.__table__.indexes:
+                if not indice.unique:
+                    indice.create(bind=conn, checkfirst=True)
+            # Pocos contenidos distintos (uno por plan y monto): una pasada por contenido
+            for qr_data in conn.execute(
+                select(PagoPendiente.qr_data)
+                .where(PagoPendiente.qr_clave.is_(None), PagoPendiente.qr_data.isnot(None))
+                .distinct()
+            ).scalars().all():
+                conn.execute(
+                    update(PagoPendiente)
+                    .where(PagoPendiente.qr_clave.is_(None), PagoPendiente.qr_data == qr_data)
+                    .values(qr_clave=QRService.clave(qr_data))
+                )